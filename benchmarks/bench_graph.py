@@ -0,0 +1,205 @@
+"""
+Benchmarks graph ingestion and queries on seeded synthetic graphs (see benchmarks/synthetic_graph.py).
+
+    python -m benchmarks.bench_graph [--nodes N [N ...]] [--avg-degree D] [--queries N] [--baseline FILE]
+
+For every graph size, a fresh database is filled with a power-law graph: the first --ingest-sample
+edges one at a time through add_edge_if_not_exists, the rest through add_edges_bulk. Then
+get_node_by_name, get_node_centric_data (depths 1-3), get_path_graph_data, the DOT/Mermaid
+generators and /api/graph (through FastAPI's TestClient) are timed on seeded random nodes. Each size
+runs in its own process, inside the benchmark directory (importing linkbase initializes linkbase.db in
+the working directory), so caches and connections never carry over. Prints one JSON document with
+latency statistics per operation; with --baseline, each operation also gets its median from a
+previous run's output and the ratio of the two.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synthetic_graph import generate_graph
+
+BULK_BATCH_SIZE = 10000
+
+def _stats(timings: List[float]) -> Dict[str, Any]:
+    ordered = sorted(timings)
+    return {
+        "count": len(ordered),
+        "total_seconds": round(sum(ordered), 6),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else None,
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3) if ordered else None,
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 3) if ordered else None,
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else None,
+    }
+
+def _time_each(operation: Callable, arguments: List[tuple]) -> Dict[str, Any]:
+    timings = []
+    for args in arguments:
+        started = time.perf_counter()
+        operation(*args)
+        timings.append(time.perf_counter() - started)
+    return _stats(timings)
+
+def _ingest(db_tools, node_rows, edges, ingest_sample: int) -> Dict[str, Any]:
+    results = {"add_edge_if_not_exists": _time_each(db_tools.add_edge_if_not_exists, edges[:ingest_sample])}
+    started = time.perf_counter()
+    for start in range(0, len(node_rows), BULK_BATCH_SIZE):
+        db_tools.add_edges_bulk([], node_labels=dict(node_rows[start:start + BULK_BATCH_SIZE]))
+    for start in range(ingest_sample, len(edges), BULK_BATCH_SIZE):
+        db_tools.add_edges_bulk(edges[start:start + BULK_BATCH_SIZE])
+    elapsed = time.perf_counter() - started
+    rows = len(node_rows) + max(len(edges) - ingest_sample, 0)
+    results["add_edges_bulk"] = {"rows": rows, "total_seconds": round(elapsed, 6), "rows_per_second": round(rows / elapsed) if elapsed else None}
+    return results
+
+def _bench_api(samples: List[str], pairs: List[tuple], full_graph: bool, repeat: int) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+    from linkbase import web_server
+
+    client = TestClient(web_server.app) # Not entered as a context manager, so no background jobs start
+    def get(params: Dict[str, Any]) -> None:
+        response = client.get("/api/graph", params=params)
+        response.raise_for_status()
+
+    requests = {
+        "api_graph_page": [({"limit": 1000},)] * repeat,
+        "api_graph_center_depth_2": [({"center_node": name, "node_centric_depth": 2},) for name in samples],
+        "api_graph_path": [({"start_node": start, "end_node": end, "path_max_depth": 4},) for start, end in pairs],
+    }
+    if full_graph:
+        requests["api_graph_full"] = [({},)] * repeat
+    results = {}
+    # Every request computes its response; the cache is measured separately below
+    web_server.graph_response_cache = web_server.GraphResponseCache(max_entries=0, max_bytes=0)
+    for name, arguments in requests.items():
+        results[name] = _time_each(get, arguments)
+    web_server.graph_response_cache = web_server.GraphResponseCache(max_entries=128, max_bytes=64 * 1024 * 1024)
+    get({"limit": 1000})
+    results["api_graph_page_cached"] = _time_each(get, [({"limit": 1000},)] * repeat)
+    return results
+
+def run_size(
+    nodes: int, avg_degree: float = 3.0, node_labels: int = 10, edge_labels: int = 20, seed: int = 42,
+    queries: int = 200, repeat: int = 3, ingest_sample: int = 1000, full_graph_limit: int = 100000,
+    db_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Builds one synthetic graph in a new database under db_dir (a temporary directory by default) and times every operation on it."""
+    from linkbase import db_tools
+
+    started = time.perf_counter()
+    node_rows, edges = generate_graph(nodes, avg_degree, node_labels, edge_labels, seed=seed)
+    generated_seconds = time.perf_counter() - started
+
+    work_dir = db_dir or tempfile.mkdtemp(prefix="linkbase_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    db_tools.DB_FILE = os.path.join(work_dir, f"bench_{nodes}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_tools.DB_FILE + suffix):
+            os.remove(db_tools.DB_FILE + suffix)
+    try:
+        db_tools.initialize_database()
+        results = _ingest(db_tools, node_rows, edges, ingest_sample)
+
+        from linkbase import graph_tools
+        rng = random.Random(seed)
+        names = [name for name, _ in node_rows]
+        samples = rng.sample(names, min(queries, len(names)))
+        pairs = [tuple(rng.sample(names, 2)) for _ in range(max(queries // 10, 1))] if len(names) > 1 else []
+        results["get_node_by_name"] = _time_each(db_tools.get_node_by_name, [(name,) for name in samples])
+        for depth in (1, 2, 3):
+            results[f"get_node_centric_data_depth_{depth}"] = _time_each(graph_tools.get_node_centric_data, [(name, depth) for name in samples])
+        results["get_path_graph_data"] = _time_each(graph_tools.get_path_graph_data, [(start, end, 4) for start, end in pairs])
+        results["generate_node_centric_dot_graph"] = _time_each(graph_tools.generate_node_centric_dot_graph, [(name, 2) for name in samples])
+        results["generate_node_centric_mermaid_graph"] = _time_each(graph_tools.generate_node_centric_mermaid_graph, [(name, 2) for name in samples])
+        results["generate_paths_dot_graph"] = _time_each(graph_tools.generate_paths_dot_graph, [(start, end, 4) for start, end in pairs])
+        full_graph = nodes <= full_graph_limit # The whole graph as one string or response is skipped for large graphs
+        if full_graph:
+            results["generate_dot_graph"] = _time_each(graph_tools.generate_dot_graph, [()] * repeat)
+            results["generate_mermaid_graph"] = _time_each(graph_tools.generate_mermaid_graph, [()] * repeat)
+        results.update(_bench_api(samples, pairs, full_graph, repeat))
+    finally:
+        db_tools.close_all_connections()
+        if db_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "nodes": len(node_rows), "edges": len(edges), "generate_seconds": round(generated_seconds, 3),
+        "results": results,
+    }
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Adds baseline_p50_ms and p50_ratio (this run / baseline) to every result that the baseline run of the same size has."""
+    baseline_runs = {run["nodes"]: run["results"] for run in baseline.get("runs", [])}
+    for run in report["runs"]:
+        previous = baseline_runs.get(run["nodes"], {})
+        for name, result in run["results"].items():
+            baseline_p50 = previous.get(name, {}).get("p50_ms")
+            if baseline_p50 is not None and result.get("p50_ms") is not None:
+                result["baseline_p50_ms"] = baseline_p50
+                result["p50_ratio"] = round(result["p50_ms"] / baseline_p50, 3) if baseline_p50 else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 10000], help="Graph sizes to run (1000 to 1000000)")
+    parser.add_argument("--avg-degree", type=float, default=3.0, help="Average node degree of the generated graphs")
+    parser.add_argument("--node-labels", type=int, default=10, help="Size of the node label vocabulary")
+    parser.add_argument("--edge-labels", type=int, default=20, help="Size of the edge label vocabulary")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=200, help="Sampled nodes per query benchmark (a tenth as many node pairs for paths)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the whole-graph benchmarks")
+    parser.add_argument("--ingest-sample", type=int, default=1000, help="Edges inserted one at a time before the bulk load")
+    parser.add_argument("--full-graph-limit", type=int, default=100000, help="Largest graph for which whole-graph DOT/Mermaid and /api/graph are timed")
+    parser.add_argument("--db-dir", help="Keep the benchmark databases in this directory instead of a temporary one")
+    parser.add_argument("--baseline", help="JSON output of a previous run to compare medians with")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS) # Run one size in this process
+    args = parser.parse_args()
+
+    options = dict(
+        avg_degree=args.avg_degree, node_labels=args.node_labels, edge_labels=args.edge_labels, seed=args.seed,
+        queries=args.queries, repeat=args.repeat, ingest_sample=args.ingest_sample,
+        full_graph_limit=args.full_graph_limit, db_dir=args.db_dir,
+    )
+    if args.single:
+        print(json.dumps(run_size(args.nodes[0], **options)))
+        return
+    work_dir = os.path.abspath(args.db_dir or tempfile.mkdtemp(prefix="linkbase_bench_"))
+    os.makedirs(work_dir, exist_ok=True)
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")])))
+    runs = []
+    try:
+        for nodes in args.nodes:
+            child_args = [sys.executable, "-m", "benchmarks.bench_graph", "--single", "--nodes", str(nodes), "--db-dir", work_dir]
+            for name, value in options.items():
+                if value is not None and name != "db_dir":
+                    child_args += [f"--{name.replace('_', '-')}", str(value)]
+            completed = subprocess.run(child_args, stdout=subprocess.PIPE, check=True, text=True, cwd=work_dir, env=env)
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    finally:
+        if not args.db_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    report = {
+        "benchmark": "graph", "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+        "graph_snapshot": os.environ.get("LINKBASE_GRAPH_SNAPSHOT", ""), "options": options, "runs": runs,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare_with_baseline(report, json.load(f))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmarks HTML text extraction over the saved pages in benchmarks/fixtures.
+
+    python -m benchmarks.bench_html_extract [--fixtures DIR] [--scale N] [--repeat N]
+
+Every fixture is run through each extractor in web_tools.HTML_TEXT_EXTRACTORS, fed in download-sized
+chunks, and through the previous BeautifulSoup implementation as a baseline. --scale repeats each
+page's <body> N times to simulate large pages. Prints one JSON document with the best time, throughput
+and peak traced memory per fixture and extractor, and whether the text matches the baseline.
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+from linkbase import web_tools
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BASELINE = "beautifulsoup"
+
+def _baseline_extract(content: bytes) -> str:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.decompose()
+    lines = (line.strip() for line in soup.get_text().splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+def _scaled(html: bytes, scale: int) -> bytes:
+    lowered = html.lower()
+    start = html.find(b">", lowered.find(b"<body")) + 1
+    end = lowered.rfind(b"</body>")
+    if scale <= 1 or start <= 0 or end < start:
+        return html
+    return html[:start] + html[start:end] * scale + html[end:]
+
+def _extractors():
+    extractors = {BASELINE: _baseline_extract}
+    for name in web_tools.HTML_TEXT_EXTRACTORS:
+        def extract(content: bytes, name=name) -> str:
+            chunks = [content[i:i + web_tools._STREAM_CHUNK_SIZE] for i in range(0, len(content), web_tools._STREAM_CHUNK_SIZE)]
+            return web_tools.extract_text(chunks, web_tools.sniff_encoding(content[:4096]), name)
+        extractors[name] = extract
+    return extractors
+
+def run(fixtures_dir: str = FIXTURES_DIR, scale: int = 1, repeat: int = 5) -> dict:
+    extractors = _extractors()
+    results = []
+    for file_name in sorted(os.listdir(fixtures_dir)):
+        if not file_name.endswith((".html", ".htm")):
+            continue
+        with open(os.path.join(fixtures_dir, file_name), "rb") as f:
+            content = _scaled(f.read(), scale)
+        baseline_text = None
+        for name, extract in extractors.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                text = extract(content)
+                timings.append(time.perf_counter() - started)
+            tracemalloc.start()
+            extract(content)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            if baseline_text is None:
+                baseline_text = text
+            best = min(timings)
+            results.append({
+                "fixture": file_name, "extractor": name, "bytes": len(content), "text_chars": len(text),
+                "best_seconds": round(best, 6), "mb_per_second": round(len(content) / best / 1e6, 2) if best else None,
+                "peak_memory_bytes": peak, "matches_baseline": text == baseline_text,
+            })
+    return {"benchmark": "html_extract", "scale": scale, "repeat": repeat, "default_parser": web_tools.HTML_PARSER, "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory of saved .html pages")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat each page's body this many times")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per fixture and extractor (the best is kept)")
+    args = parser.parse_args()
+    print(json.dumps(run(args.fixtures, args.scale, args.repeat), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Seeded synthetic knowledge graphs for the benchmarks.
+
+Degrees follow a power law (Chung-Lu model: edge endpoints are drawn with probability proportional
+to a Zipf weight per node), so a few hub nodes carry most edges, as in extracted knowledge graphs.
+Node and edge labels come from vocabularies of configurable size, also drawn Zipf-distributed.
+The same arguments always produce the same graph.
+"""
+import itertools
+import random
+from typing import List, Tuple
+
+NODE_LABEL_WORDS = (
+    "Person", "Organization", "City", "Country", "Company", "Product", "Event", "Concept",
+    "Technology", "Publication", "Award", "Location", "Language", "Discipline", "Species",
+)
+EDGE_LABEL_WORDS = (
+    "is_in", "works_for", "founded", "part_of", "located_in", "born_in", "created", "member_of",
+    "related_to", "authored", "uses", "owns", "influenced", "won", "studied_at", "produces",
+)
+_SYLLABLES = ("ka", "lo", "mi", "ren", "tor", "val", "zen", "qua", "bri", "dex", "sol", "nar", "pet", "lum", "vor", "ash")
+
+def _vocabulary(words: Tuple[str, ...], size: int) -> List[str]:
+    return [words[i] if i < len(words) else f"{words[i % len(words)]}_{i // len(words)}" for i in range(size)]
+
+def _zipf_cum_weights(count: int, exponent: float) -> List[float]:
+    return list(itertools.accumulate((rank + 1) ** -exponent for rank in range(count)))
+
+def generate_graph(
+    nodes: int, avg_degree: float = 3.0, node_labels: int = 10, edge_labels: int = 20,
+    degree_exponent: float = 2.5, seed: int = 42,
+) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str, str]]]:
+    """
+    Returns (nodes, edges): (name, label) pairs with unique names, and unique (source name, target name,
+    label) triples without self-loops, about nodes * avg_degree / 2 of them. degree_exponent is the
+    exponent of the degree distribution's power law (> 2).
+    """
+    rng = random.Random(seed)
+    names = [
+        f"{''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))} {index}"
+        for index in range(nodes)
+    ]
+    rng.shuffle(names) # Hubs get random ids instead of the lowest ones
+    node_vocabulary = _vocabulary(NODE_LABEL_WORDS, node_labels)
+    node_rows = list(zip(names, rng.choices(node_vocabulary, cum_weights=_zipf_cum_weights(node_labels, 1.0), k=nodes)))
+
+    target_edges = int(nodes * avg_degree / 2)
+    endpoint_weights = _zipf_cum_weights(nodes, 1.0 / (degree_exponent - 1.0))
+    edge_vocabulary = _vocabulary(EDGE_LABEL_WORDS, edge_labels)
+    edge_weights = _zipf_cum_weights(edge_labels, 1.0)
+    edges = {}
+    while len(edges) < target_edges and nodes > 1:
+        batch = target_edges - len(edges)
+        sources = rng.choices(range(nodes), cum_weights=endpoint_weights, k=batch)
+        targets = rng.choices(range(nodes), cum_weights=endpoint_weights, k=batch)
+        for source, target, label in zip(sources, targets, rng.choices(edge_vocabulary, cum_weights=edge_weights, k=batch)):
+            if source != target:
+                edges.setdefault((names[source], names[target], label), None)
+        if len(edges) >= nodes * (nodes - 1) * edge_labels: # Every possible triple is taken
+            break
+    return node_rows, list(edges)
@@ -4,8 +4,10 @@ from google.adk.agents import LlmAgent
 from dotenv import load_dotenv
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.agents import LlmAgent
-from .web_tools import get_text_from_url
-from .db_tools import initialize_database, execute_sql, get_db_schema
+from .web_tools import get_text_from_url, get_text_from_urls
+from .pipeline import ingest_url
+from .db_tools import initialize_database, execute_sql, get_db_schema, add_graph_batch
+from .entity_resolution import find_duplicate_nodes, merge_nodes, install_insert_hook
 from .graph_tools import generate_dot_graph, generate_mermaid_graph, generate_node_centric_dot_graph, generate_node_centric_mermaid_graph, generate_paths_dot_graph, generate_paths_mermaid_graph # Added path graph tools
 
 # Get a logger for this module
@@ -17,13 +19,14 @@ load_dotenv()
 logger.debug(".env file loaded.")
 
 initialize_database()  
+install_insert_hook() # Nodes created by add_graph_batch, ingest_url or get_or_create_node are checked for near-duplicate names
 try:
     root_agent = LlmAgent(
         # model=LiteLlm(model="ollama/qwen3:30b"),
         model='gemini-2.5-pro-preview-05-06',
         name='linkbase',
-        instruction="You are an AI assistant that constructs a knowledge graph. Your primary role is to identify NLP entities (nodes) and infer their relationships (edges) from the overall context of provided text. You will process text, typically from URLs, extract these entities and relationships, and then store them in a structured database to build and expand the knowledge graph. Emphasize clarity in node/edge definitions and ensure connections accurately reflect the contextual meaning. You can generate full graph visualizations, visualizations centered on a specific node (showing its direct outgoing connections), or visualizations showing paths between two specified nodes (all in DOT or Mermaid format).",
-        tools=[get_text_from_url, execute_sql, get_db_schema, generate_dot_graph, generate_mermaid_graph, generate_node_centric_dot_graph, generate_node_centric_mermaid_graph, generate_paths_dot_graph, generate_paths_mermaid_graph],
+        instruction="You are an AI assistant that constructs a knowledge graph. Your primary role is to identify NLP entities (nodes) and infer their relationships (edges) from the overall context of provided text. You will process text, typically from URLs (fetch several URLs at once with get_text_from_urls; for long pages use ingest_url, which extracts and stores a whole page in parallel chunks), extract these entities and relationships, and then store them in a structured database to build and expand the knowledge graph. Store everything you extract from a text with a single add_graph_batch call listing all entities and relations, rather than issuing one execute_sql INSERT per node or edge; check its per-item results and resubmit only the skipped items after fixing them. After ingesting, call find_duplicate_nodes and use merge_nodes to merge nodes that name the same entity (e.g. 'nyc' and 'new york city'), keeping the most complete name. Emphasize clarity in node/edge definitions and ensure connections accurately reflect the contextual meaning. You can generate full graph visualizations, visualizations centered on a specific node (showing its direct outgoing connections), or visualizations showing paths between two specified nodes (all in DOT or Mermaid format).",
+        tools=[get_text_from_url, get_text_from_urls, ingest_url, add_graph_batch, find_duplicate_nodes, merge_nodes, execute_sql, get_db_schema, generate_dot_graph, generate_mermaid_graph, generate_node_centric_dot_graph, generate_node_centric_mermaid_graph, generate_paths_dot_graph, generate_paths_mermaid_graph],
     )
 except Exception as e:
     logger.error(f"Unexpected error': {e}")
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from linkbase.db_tools import interrupt_thread_connections
+from linkbase.logger_config import app_logger
+
+# Blocking SQLite and graph work runs on this many dedicated threads (each keeps its own pooled
+# connection), so slow queries queue up behind each other instead of stalling the event loop.
+DB_EXECUTOR_WORKERS = int(os.environ.get("LINKBASE_DB_WORKERS", "4"))
+DISCONNECT_POLL_SECONDS = 0.25
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_task_state = threading.local()
+
+class RequestCancelled(Exception):
+    """Raised by run_db_task when the client disconnected before the task finished."""
+
+class _DbTask:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cancelled = False
+        self.thread: Optional[threading.Thread] = None
+
+    def cancel(self) -> None:
+        with self.lock:
+            self.cancelled = True
+            # Only interrupt while the task still owns its worker, never the worker's next task.
+            if self.thread is not None:
+                interrupt_thread_connections(self.thread)
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="linkbase-db")
+            app_logger.info(f"Started database executor with {DB_EXECUTOR_WORKERS} workers.")
+        return _executor
+
+def _run_task(task: _DbTask, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    with task.lock:
+        if task.cancelled:
+            raise RequestCancelled()
+        task.thread = threading.current_thread()
+    _task_state.task = task
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _task_state.task = None
+        with task.lock:
+            task.thread = None
+
+def is_task_cancelled() -> bool:
+    """True inside a run_db_task worker whose client has gone away; long Python loops should bail out."""
+    task = getattr(_task_state, "task", None)
+    return task is not None and task.cancelled
+
+async def run_db_task(request, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs the blocking func(*args, **kwargs) on the database executor and awaits its result without
+    blocking the event loop. While waiting, polls whether the client behind request (a Starlette
+    Request) disconnected; if so, the task is cancelled (dropped if still queued, its running SQLite
+    statement interrupted, is_task_cancelled() set) and RequestCancelled is raised.
+    """
+    task = _DbTask()
+    future = asyncio.get_running_loop().run_in_executor(_get_executor(), _run_task, task, func, args, kwargs)
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return future.result()
+        if await request.is_disconnected():
+            task.cancel(); future.cancel()
+            # The abandoned task may still finish or fail; retrieve its outcome so it is not reported as unhandled.
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            app_logger.info(f"Client disconnected from {request.url.path}; cancelled {getattr(func, '__name__', func)}.")
+            raise RequestCancelled()
+
+def shutdown_db_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+class BackgroundJob:
+    """
+    Runs func on a daemon thread of its own, every interval seconds once start()ed and whenever
+    request() is called; requests made while it runs coalesce into one more run. Keeps whole-graph
+    recomputations (layout, metrics) off the request path, where they would hold an executor slot.
+    """
+    def __init__(self, name: str, func: Callable[[], Any]):
+        self.name = name
+        self.func = func
+        self._interval = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self._interval if self._interval > 0 else None)
+            if self._stop.is_set():
+                return
+            self._wake.clear()
+            try:
+                self.func()
+            except Exception as e: # Keep the thread alive; the next run retries
+                app_logger.error(f"Background job {self.name} failed: {e}")
+
+    def start(self, interval: float = 0.0) -> None:
+        """Starts the thread if it is not running; interval <= 0 runs func only when requested."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._interval = interval
+            self._stop.clear(); self._wake.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def request(self) -> None:
+        """Asks for a run as soon as possible without waiting for it, starting the thread if needed."""
+        self.start()
+        self._wake.set()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set(); self._wake.set()
+        if thread is not None:
+            thread.join(timeout=5)
@@ -1,10 +1,278 @@
 import sqlite3
 import os
-from typing import Tuple, List, Union, Optional # Added Optional
+import json
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Tuple, List, Union, Optional, Dict, Any, Iterable, Iterator, Callable # Added Optional
 from linkbase.logger_config import app_logger
+from linkbase import instrumentation
 
 DB_FILE = "linkbase.db" # Define the database file name
 
+# Pragmas applied once to every connection handed out by _get_connection().
+# journal_mode=WAL is persistent in the database file; the others are per-connection.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",  # 256 MiB of memory-mapped I/O
+    "PRAGMA cache_size=-65536",  # Negative value is in KiB, i.e. a 64 MiB page cache
+    "PRAGMA temp_store=MEMORY",
+)
+SQLITE_BUSY_TIMEOUT_SECONDS = 30.0
+
+# Schema migrations applied in order by initialize_database(). PRAGMA user_version records how
+# many have already run, so databases created by older versions are upgraded in place on startup.
+SCHEMA_MIGRATIONS: List[Tuple[str, Tuple[str, ...]]] = [
+    (
+        "Add indexed case-insensitive lookup key nodes.name_key",
+        (
+            # Virtual generated column: maintained by SQLite itself, so rows inserted through
+            # raw execute_sql calls stay consistent without any triggers.
+            "ALTER TABLE nodes ADD COLUMN name_key TEXT GENERATED ALWAYS AS (lower(name)) VIRTUAL",
+            "CREATE INDEX IF NOT EXISTS idx_nodes_name_key ON nodes(name_key)",
+        ),
+    ),
+    (
+        "Index edges.target_id for inbound traversal",
+        # Outbound traversal already uses the UNIQUE(source_id, target_id, label) index.
+        ("CREATE INDEX IF NOT EXISTS idx_edges_target_id ON edges(target_id)",),
+    ),
+    (
+        "Count in-place updates of nodes and edges in change_counters",
+        # Appends are visible through the id watermarks; these counters let in-memory readers
+        # (graph_snapshot) notice UPDATEs, such as a relabelled node, without rescanning tables.
+        (
+            "CREATE TABLE IF NOT EXISTS change_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0)",
+            "INSERT OR IGNORE INTO change_counters (name, value) VALUES ('node_updates', 0), ('edge_updates', 0)",
+            "CREATE TRIGGER IF NOT EXISTS nodes_count_updates AFTER UPDATE ON nodes BEGIN "
+            "UPDATE change_counters SET value = value + 1 WHERE name = 'node_updates'; END",
+            "CREATE TRIGGER IF NOT EXISTS edges_count_updates AFTER UPDATE ON edges BEGIN "
+            "UPDATE change_counters SET value = value + 1 WHERE name = 'edge_updates'; END",
+        ),
+    ),
+    (
+        "Store precomputed layout coordinates in node_positions",
+        # Maintained by graph_layout. layout_state (a single row) records the graph state the
+        # positions were computed for, so appended nodes can be placed incrementally.
+        (
+            "CREATE TABLE IF NOT EXISTS node_positions (node_id INTEGER PRIMARY KEY, x REAL NOT NULL, y REAL NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS layout_state ("
+            "id INTEGER PRIMARY KEY CHECK (id = 1), layout_version INTEGER NOT NULL, "
+            "node_watermark INTEGER NOT NULL, node_count INTEGER NOT NULL, "
+            "edge_watermark INTEGER NOT NULL, edge_count INTEGER NOT NULL, edge_updates INTEGER NOT NULL, "
+            "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+        ),
+    ),
+    (
+        "Record the provenance of edges in sources and source_edges",
+        # Maintained by add_source_graph_batch. content_hash is NULL until a source has been
+        # extracted completely; the first trigger drops links to edges deleted by any other means.
+        # Replacing a source's edges deletes and inserts in one transaction, which can leave the
+        # edge count unchanged, so deletions also bump edge_updates for graph_snapshot and graph_layout.
+        (
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT UNIQUE NOT NULL, content_hash TEXT, "
+            "extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+            "CREATE TABLE IF NOT EXISTS source_edges ("
+            "source_id INTEGER NOT NULL REFERENCES sources(id), edge_id INTEGER NOT NULL REFERENCES edges(id), "
+            "PRIMARY KEY (source_id, edge_id)) WITHOUT ROWID",
+            "CREATE INDEX IF NOT EXISTS idx_source_edges_edge_id ON source_edges(edge_id)",
+            "CREATE TRIGGER IF NOT EXISTS edges_delete_provenance AFTER DELETE ON edges BEGIN "
+            "DELETE FROM source_edges WHERE edge_id = old.id; END",
+            "CREATE TRIGGER IF NOT EXISTS edges_count_deletes AFTER DELETE ON edges BEGIN "
+            "UPDATE change_counters SET value = value + 1 WHERE name = 'edge_updates'; END",
+        ),
+    ),
+    (
+        "Index node names and labels for substring search in nodes_fts",
+        # External-content FTS5 table (the text is read from nodes) with the trigram tokenizer,
+        # which matches any substring of at least 3 characters, case-insensitively. The triggers
+        # keep it in sync with every write, including raw execute_sql ones.
+        (
+            "CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5(name, label, content='nodes', content_rowid='id', tokenize='trigram')",
+            "CREATE TRIGGER IF NOT EXISTS nodes_fts_insert AFTER INSERT ON nodes BEGIN "
+            "INSERT INTO nodes_fts (rowid, name, label) VALUES (new.id, new.name, new.label); END",
+            "CREATE TRIGGER IF NOT EXISTS nodes_fts_delete AFTER DELETE ON nodes BEGIN "
+            "INSERT INTO nodes_fts (nodes_fts, rowid, name, label) VALUES ('delete', old.id, old.name, old.label); END",
+            "CREATE TRIGGER IF NOT EXISTS nodes_fts_update AFTER UPDATE OF name, label ON nodes BEGIN "
+            "INSERT INTO nodes_fts (nodes_fts, rowid, name, label) VALUES ('delete', old.id, old.name, old.label); "
+            "INSERT INTO nodes_fts (rowid, name, label) VALUES (new.id, new.name, new.label); END",
+            "INSERT INTO nodes_fts (nodes_fts) VALUES ('rebuild')",
+        ),
+    ),
+    (
+        "Store materialized node metrics in node_metrics",
+        # Maintained by graph_analytics. metrics_state (a single row) records the graph state the
+        # metrics were computed for; the indexes serve top-N queries by the main sort keys.
+        (
+            "CREATE TABLE IF NOT EXISTS node_metrics ("
+            "node_id INTEGER PRIMARY KEY, in_degree INTEGER NOT NULL, out_degree INTEGER NOT NULL, degree INTEGER NOT NULL, "
+            "pagerank REAL NOT NULL, component INTEGER NOT NULL, component_size INTEGER NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS idx_node_metrics_pagerank ON node_metrics(pagerank)",
+            "CREATE INDEX IF NOT EXISTS idx_node_metrics_degree ON node_metrics(degree)",
+            "CREATE INDEX IF NOT EXISTS idx_node_metrics_component ON node_metrics(component)",
+            "CREATE TABLE IF NOT EXISTS metrics_state ("
+            "id INTEGER PRIMARY KEY CHECK (id = 1), metrics_version INTEGER NOT NULL, "
+            "node_watermark INTEGER NOT NULL, node_count INTEGER NOT NULL, "
+            "edge_watermark INTEGER NOT NULL, edge_count INTEGER NOT NULL, edge_updates INTEGER NOT NULL, "
+            "computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+        ),
+    ),
+]
+
+# One long-lived connection per (thread, database file). FastAPI runs sync code in a
+# threadpool whose worker threads are reused, so each worker keeps its own connection.
+_thread_local = threading.local()
+# Registry of every pooled connection so they can be closed on shutdown or once their
+# owning thread has exited. Entries are (weakref to owning thread, db path, connection).
+_connection_registry: List[Tuple[weakref.ref, str, sqlite3.Connection]] = []
+_connection_registry_lock = threading.Lock()
+# Bumped by close_all_connections() so threads discard their cached (closed) connections.
+_pool_generation = 0
+
+def _configure_connection(conn: sqlite3.Connection) -> None:
+    """Applies SQLITE_PRAGMAS to a freshly opened connection."""
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+
+def _prune_dead_connections() -> None:
+    """Closes pooled connections whose owning thread is no longer alive. Caller holds the registry lock."""
+    alive = []
+    for thread_ref, db_path, conn in _connection_registry:
+        thread = thread_ref()
+        if thread is not None and thread.is_alive():
+            alive.append((thread_ref, db_path, conn))
+        else:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                app_logger.warning(f"Error closing connection to '{db_path}' of exited thread: {e}")
+    _connection_registry[:] = alive
+
+def _get_connection(db_file: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Returns the calling thread's pooled connection to db_file (DB_FILE by default),
+    opening and configuring it on first use. Connections stay open for the life of the thread.
+    """
+    db_path = os.path.abspath(db_file if db_file is not None else DB_FILE)
+    connections = getattr(_thread_local, "connections", None)
+    if connections is None or getattr(_thread_local, "generation", None) != _pool_generation:
+        connections = _thread_local.connections = {}
+        _thread_local.generation = _pool_generation
+    conn = connections.get(db_path)
+    if conn is not None:
+        return conn
+
+    # check_same_thread=False only so close_all_connections() can close it from another
+    # thread; the connection itself is never shared between threads.
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+    _configure_connection(conn)
+    connections[db_path] = conn
+    with _connection_registry_lock:
+        _prune_dead_connections()
+        _connection_registry.append((weakref.ref(threading.current_thread()), db_path, conn))
+        open_count = len(_connection_registry)
+    instrumentation.record_connection_opened("pooled")
+    app_logger.info("Opened pooled SQLite connection to '%s' for thread '%s' (%d open).", db_path, threading.current_thread().name, open_count)
+    return conn
+
+instrumentation.SQL_POOLED_CONNECTIONS.function = lambda: len(_connection_registry)
+
+def interrupt_thread_connections(thread: threading.Thread) -> int:
+    """
+    Aborts whatever statement is running on thread's pooled connections; the interrupted call fails
+    with "interrupted". Safe to call from any thread. Returns the number of connections signalled.
+    """
+    interrupted = 0
+    with _connection_registry_lock:
+        for thread_ref, _, conn in _connection_registry:
+            if thread_ref() is thread:
+                conn.interrupt()
+                interrupted += 1
+    return interrupted
+
+# Dedicated read-only connection used solely for PRAGMA data_version. data_version only changes
+# for commits made by *other* connections, so a connection that never writes observes every
+# commit: from any pooled connection in this process and from other processes alike.
+_version_probe: Optional[Tuple[str, sqlite3.Connection]] = None
+_version_probe_lock = threading.Lock()
+
+def get_data_version() -> int:
+    """
+    Returns a counter that changes whenever anything commits to DB_FILE. Values are only
+    comparable within one process; use them to invalidate in-memory caches and snapshots.
+    """
+    global _version_probe
+    db_path = os.path.abspath(DB_FILE)
+    with _version_probe_lock:
+        if _version_probe is None or _version_probe[0] != db_path:
+            if _version_probe is not None:
+                _version_probe[1].close()
+            _version_probe = (db_path, sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False))
+        return _version_probe[1].execute("PRAGMA data_version").fetchone()[0]
+
+@contextmanager
+def _write_transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Yields the thread's pooled connection inside a BEGIN IMMEDIATE transaction, committing on
+    success and rolling back on any exception. IMMEDIATE takes the write lock up front, so
+    statements inside the block never race another writer between a lookup and an insert.
+    """
+    conn = _get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+@contextmanager
+def streaming_connection() -> Iterator[sqlite3.Connection]:
+    """
+    Yields a dedicated, configured connection holding one read transaction, so every query run on
+    it sees the same database state. Unlike pooled connections it may be used from whichever thread
+    resumes a streaming generator (e.g. a StreamingResponse), and it is closed when the block exits.
+    """
+    conn = sqlite3.connect(os.path.abspath(DB_FILE), timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+    instrumentation.record_connection_opened("streaming")
+    try:
+        _configure_connection(conn)
+        conn.execute("BEGIN")
+        yield conn
+    finally:
+        conn.close()
+
+def iter_rows(conn: sqlite3.Connection, sql_command: str, params: Optional[List[str]] = None, batch_size: int = 1000) -> Iterator[Tuple]:
+    """Lazily runs a query and yields its rows, fetching batch_size rows at a time instead of the whole result."""
+    cursor = conn.execute(sql_command, params if params is not None else [])
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+def close_all_connections() -> None:
+    """Closes every pooled connection, e.g. on application shutdown or before deleting DB_FILE."""
+    global _pool_generation, _version_probe
+    with _version_probe_lock:
+        if _version_probe is not None:
+            _version_probe[1].close()
+            _version_probe = None
+    with _connection_registry_lock:
+        _pool_generation += 1
+        for _, db_path, conn in _connection_registry:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                app_logger.warning(f"Error closing connection to '{db_path}': {e}")
+        _connection_registry.clear()
+
 def initialize_database():
     """
     Checks if the SQLite database exists. If not, creates it with
@@ -12,7 +280,7 @@ def initialize_database():
     """
     db_exists = os.path.exists(DB_FILE)
 
-    conn = sqlite3.connect(DB_FILE)
+    conn = _get_connection()
     cursor = conn.cursor()
 
     if not db_exists:
@@ -43,7 +311,25 @@ def initialize_database():
     else:
         app_logger.info(f"Database '{DB_FILE}' already exists.")
 
-    conn.close()
+    _apply_schema_migrations(conn)
+
+def _apply_schema_migrations(conn: sqlite3.Connection) -> None:
+    """Runs the SCHEMA_MIGRATIONS not yet recorded in PRAGMA user_version, each in its own transaction."""
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, (description, statements) in enumerate(SCHEMA_MIGRATIONS, start=1):
+        if version <= current_version:
+            continue
+        app_logger.info(f"Applying schema migration {version} to '{DB_FILE}': {description}.")
+        try:
+            conn.execute("BEGIN")
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            app_logger.error(f"Schema migration {version} failed on '{DB_FILE}': {e}")
+            raise
 
 def get_db_schema():
     """
@@ -53,10 +339,9 @@ def get_db_schema():
         A string containing the SQL CREATE statements for all tables
         in the database, or an error message string if an exception occurs.
     """
-    conn = None
     try:
         app_logger.info(f"Retrieving schema for database '{DB_FILE}'.")
-        conn = sqlite3.connect(DB_FILE)
+        conn = _get_connection()
         cursor = conn.cursor()
 
         # Get all tables
@@ -89,9 +374,6 @@ def get_db_schema():
     except Exception as e:
         app_logger.error(f"Unexpected error while retrieving schema for '{DB_FILE}': {e}")
         return f"An unexpected error occurred while retrieving schema: {e}"
-    finally:
-        if conn:
-            conn.close()
 
 def execute_sql(sql_command: str, params: Optional[List[str]] = None) -> Union[List[Tuple], int, str]:  
     """
@@ -102,45 +384,53 @@ def execute_sql(sql_command: str, params: Optional[List[str]] = None) -> Union[L
         params: An optional list of string parameters to use with the SQL command. Defaults to None.
 
     Returns:
-        A list of tuples containing the results for SELECT queries,
+        A list of tuples containing the results for queries that return rows
+        (SELECT, WITH ... SELECT, PRAGMA, ... RETURNING),
         the number of affected rows for DML queries (INSERT, UPDATE, DELETE),
         or an error message string if an exception occurs.
     """
     conn = None
+    # Duration, rows and failures go to instrumentation (the /metrics endpoint and the slow-query log)
+    started = time.perf_counter() if instrumentation.TIMING_ENABLED else None
     try:
         # If params is None, use an empty list for the database call.
         db_params = params if params is not None else []
-        app_logger.debug(f"Executing SQL on '{DB_FILE}': {sql_command} with params: {db_params}")
-        conn = sqlite3.connect(DB_FILE)
+        app_logger.debug("Executing SQL on '%s': %s with params: %s", DB_FILE, sql_command, db_params)
+        conn = _get_connection()
         cursor = conn.cursor()
 
         cursor.execute(sql_command, db_params)
 
-        # For SELECT statements, fetch and return results
-        if sql_command.strip().upper().startswith("SELECT"):
+        # For statements that produce a result set (SELECT, WITH RECURSIVE, RETURNING, ...), fetch and return results
+        if cursor.description is not None:
             results = cursor.fetchall()
             conn.commit() # Commit even for SELECT in case of any implicit changes or functions
-            app_logger.info(f"SELECT query executed successfully on '{DB_FILE}'. Rows returned: {len(results)}")
+            if started is not None:
+                instrumentation.record_statement(sql_command, time.perf_counter() - started, len(results))
+            app_logger.debug("SELECT query executed successfully on '%s'. Rows returned: %d", DB_FILE, len(results))
             return results
         else:
             # For DML statements (INSERT, UPDATE, DELETE, etc.), commit and return row count
             affected_rows = cursor.rowcount
             conn.commit()
-            app_logger.info(f"DML query executed successfully on '{DB_FILE}'. Rows affected: {affected_rows}")
+            if started is not None:
+                instrumentation.record_statement(sql_command, time.perf_counter() - started, max(affected_rows, 0))
+            app_logger.debug("DML query executed successfully on '%s'. Rows affected: %d", DB_FILE, affected_rows)
             return affected_rows
     except sqlite3.Error as e:
         app_logger.error(f"SQLite error executing SQL on '{DB_FILE}': {sql_command} - {e}")
         if conn:
             conn.rollback() # Rollback changes if an error occurs
+        if started is not None:
+            instrumentation.record_statement(sql_command, time.perf_counter() - started, 0, failed=True)
         return f"SQLite error: {e}"
     except Exception as e:
         app_logger.error(f"Unexpected error executing SQL on '{DB_FILE}': {sql_command} - {e}")
         if conn:
             conn.rollback()
+        if started is not None:
+            instrumentation.record_statement(sql_command, time.perf_counter() - started, 0, failed=True)
         return f"An unexpected error occurred: {e}"
-    finally:
-        if conn:
-            conn.close()
 
 def _normalize_text(text: Optional[str]) -> Optional[str]:
     """Basic text normalization: lowercase and strip whitespace."""
@@ -155,9 +445,9 @@ def get_node_by_name(name: str) -> Optional[dict]:
         app_logger.warning("Attempted to get node with empty or None name.")
         return None
         
-    # Use LOWER() for case-insensitive matching on the 'name' column.
-    # normalized_name is already lowercased by _normalize_text.
-    sql = "SELECT id, name, label FROM nodes WHERE LOWER(name) = ?"
+    # name_key is the indexed generated column lower(name), so this is a case-insensitive
+    # index search rather than a full scan. normalized_name is already lowercased by _normalize_text.
+    sql = "SELECT id, name, label FROM nodes WHERE name_key = ?"
     result = execute_sql(sql, [normalized_name])
     if isinstance(result, list) and result:
         node_data = result[0]
@@ -166,6 +456,115 @@ def get_node_by_name(name: str) -> Optional[dict]:
         app_logger.error(f"Error in get_node_by_name for '{normalized_name}': {result}")
     return None
 
+# Substring matches on names (best FTS5 rank first) and then on labels (in any order: a label shared
+# by many nodes would otherwise rank every one of them) fill the results left after prefix matches.
+_SEARCH_FTS_SQL = (
+    "SELECT n.id, n.name, n.label FROM (SELECT rowid FROM nodes_fts WHERE nodes_fts MATCH ?1 ORDER BY rank LIMIT CAST(?2 AS INTEGER)) AS f "
+    "JOIN nodes n ON n.id = f.rowid;",
+    "SELECT n.id, n.name, n.label FROM (SELECT rowid FROM nodes_fts WHERE nodes_fts MATCH ?1 LIMIT CAST(?2 AS INTEGER)) AS f "
+    "JOIN nodes n ON n.id = f.rowid;",
+)
+
+def search_nodes(query: str, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+    """
+    Finds nodes whose name or label contains query (case-insensitive). Names starting with query
+    come first in name order (so an exact match leads), then other names containing it, then labels.
+    Queries shorter than the 3-character trigrams only match name prefixes.
+    Returns a list of {"id", "name", "label"} dicts, or None on a database error.
+    """
+    key = _normalize_text(query)
+    if not key:
+        return []
+    # Every step stops after the rows still needed: a range scan of the name_key index, then nodes_fts
+    result = execute_sql(
+        "SELECT id, name, label FROM nodes WHERE name_key >= ?1 AND name_key < ?1 || char(1114111) "
+        "ORDER BY name_key LIMIT CAST(?2 AS INTEGER);",
+        [key, str(limit)]
+    )
+    phrase = '"' + key.replace('"', '""') + '"' # Quoted, so query is matched as a literal substring
+    for column, sql in zip(("name", "label"), _SEARCH_FTS_SQL):
+        if isinstance(result, str) or len(result) >= limit or len(key) < 3:
+            break
+        matches = execute_sql(sql, ["{" + column + "} : " + phrase, str(limit + len(result))])
+        if isinstance(matches, str):
+            result = matches
+            break
+        found = {row[0] for row in result}
+        result += [row for row in matches if row[0] not in found][:limit - len(result)]
+    if isinstance(result, str):
+        app_logger.error(f"Error searching nodes for '{query}': {result}")
+        return None
+    return [{"id": row[0], "name": row[1], "label": row[2]} for row in result]
+
+# Tables derived from the whole graph (node_positions, node_metrics) record the graph state they were
+# computed from in a single-row state table (layout_state, metrics_state) holding a version and
+# GRAPH_STATE_FIELDS. Appends show up as ids above the watermarks; deletions change the counts
+# without moving the watermarks, and in-place edge updates bump edge_updates.
+GRAPH_STATE_FIELDS = ("node_watermark", "node_count", "edge_watermark", "edge_count", "edge_updates")
+GRAPH_UNCHANGED = "unchanged"
+GRAPH_APPENDED = "appended"
+GRAPH_CHANGED = "changed"
+_GRAPH_STATE_SQL = """
+SELECT (SELECT coalesce(max(id), 0) FROM nodes), (SELECT count(*) FROM nodes),
+       (SELECT coalesce(max(id), 0) FROM edges), (SELECT count(*) FROM edges),
+       (SELECT value FROM change_counters WHERE name = 'edge_updates');
+"""
+
+def get_graph_change(state_table: str, version_column: str, detect_appends: bool = True) -> Optional[Tuple[str, Optional[Tuple], Tuple, int]]:
+    """
+    Compares the graph with the state recorded in state_table when its derived data was last computed.
+
+    Returns:
+        (change, stored, current, new_nodes), or None on a database error. change is GRAPH_UNCHANGED,
+        GRAPH_APPENDED (nodes and edges were only inserted since; checked only with detect_appends) or
+        GRAPH_CHANGED. stored is the state table's (version, *GRAPH_STATE_FIELDS) row, or None if
+        nothing was computed yet; current holds GRAPH_STATE_FIELDS now; new_nodes counts the
+        appended nodes (0 unless GRAPH_APPENDED).
+    """
+    current = execute_sql(_GRAPH_STATE_SQL, [])
+    stored = execute_sql(f"SELECT {version_column}, {', '.join(GRAPH_STATE_FIELDS)} FROM {state_table} WHERE id = 1;", [])
+    if isinstance(current, str) or isinstance(stored, str):
+        app_logger.error(f"Cannot check the graph state recorded in {state_table}: {current if isinstance(current, str) else stored}")
+        return None
+    current = current[0]; stored = stored[0] if stored else None
+    if stored is not None and stored[1:] == current:
+        return GRAPH_UNCHANGED, stored, current, 0
+    if stored is None or not detect_appends or stored[5] != current[4]:
+        return GRAPH_CHANGED, stored, current, 0
+    new_counts = execute_sql(
+        "SELECT (SELECT count(*) FROM nodes WHERE id > CAST(?1 AS INTEGER)), (SELECT count(*) FROM edges WHERE id > CAST(?2 AS INTEGER));",
+        [str(stored[1]), str(stored[3])]
+    )
+    if isinstance(new_counts, str):
+        app_logger.error(f"Cannot check the graph state recorded in {state_table}: {new_counts}")
+        return None
+    new_nodes, new_edges = new_counts[0]
+    # Rows at or below the watermarks are all still there only if the counts grew by exactly the appended rows
+    if current[1] == stored[2] + new_nodes and current[3] == stored[4] + new_edges:
+        return GRAPH_APPENDED, stored, current, new_nodes
+    return GRAPH_CHANGED, stored, current, 0
+
+# Callables run with (node id, normalized name) after get_or_create_node or a graph batch
+# (add_graph_batch, add_source_graph_batch) creates a node, e.g. the duplicate check of
+# entity_resolution. add_edges_bulk, the loader for large imports, skips them. A failing hook is
+# logged and never fails the insert.
+_node_insert_hooks: List[Callable[[int, str], None]] = []
+
+def register_node_insert_hook(hook: Callable[[int, str], None]) -> None:
+    if hook not in _node_insert_hooks:
+        _node_insert_hooks.append(hook)
+
+def unregister_node_insert_hook(hook: Callable[[int, str], None]) -> None:
+    if hook in _node_insert_hooks:
+        _node_insert_hooks.remove(hook)
+
+def _run_node_insert_hooks(node_id: int, normalized_name: str) -> None:
+    for hook in list(_node_insert_hooks):
+        try:
+            hook(node_id, normalized_name)
+        except Exception as e:
+            app_logger.error(f"Node insert hook {getattr(hook, '__name__', hook)} failed for node '{normalized_name}': {e}")
+
 def get_or_create_node(name: str, label: Optional[str] = None) -> Optional[int]:
     """
     Retrieves a node by its normalized name. If it doesn't exist, creates it.
@@ -183,21 +582,22 @@ def get_or_create_node(name: str, label: Optional[str] = None) -> Optional[int]:
     existing_node = get_node_by_name(normalized_name) # Uses normalized name
 
     if existing_node:
-        app_logger.info(f"Node '{normalized_name}' found with ID {existing_node['id']}.")
+        app_logger.debug("Node '%s' found with ID %s.", normalized_name, existing_node['id'])
         # Optionally, update label if provided and different (normalized comparison)
         if normalized_label is not None and _normalize_text(existing_node.get('label')) != normalized_label:
-            app_logger.info(f"Updating label for node '{normalized_name}' from '{existing_node.get('label')}' to '{label}'.")
+            app_logger.info("Updating label for node '%s' from '%s' to '%s'.", normalized_name, existing_node.get('label'), label)
             update_sql = "UPDATE nodes SET label = ? WHERE id = ?"
             execute_sql(update_sql, [label, str(existing_node['id'])])  
         return existing_node['id']
     else:
-        app_logger.info(f"Node '{normalized_name}' not found. Creating new node.")
+        app_logger.debug("Node '%s' not found. Creating new node.", normalized_name)
         insert_sql = "INSERT INTO nodes (name, label) VALUES (?, ?)"
         result = execute_sql(insert_sql, [normalized_name, label]) 
         if isinstance(result, int) and result > 0:
             new_node_data = get_node_by_name(normalized_name)
             if new_node_data:
-                app_logger.info(f"Node '{normalized_name}' created with ID {new_node_data['id']}.")
+                app_logger.info("Node '%s' created with ID %s.", normalized_name, new_node_data['id'])
+                _run_node_insert_hooks(new_node_data['id'], normalized_name)
                 return new_node_data['id']
             else:
                 app_logger.error(f"Failed to retrieve newly created node '{normalized_name}'.")
@@ -231,7 +631,7 @@ def add_edge_if_not_exists(source_name: str, target_name: str, label: Optional[s
     result = execute_sql(insert_sql, [str(source_id), str(target_id), normalized_label])
 
     if isinstance(result, str) and "UNIQUE constraint failed" in result:
-        app_logger.info(f"Edge from '{normalized_source_name}' to '{normalized_target_name}' with label '{label}' likely already exists due to UNIQUE constraint.")
+        app_logger.debug("Edge from '%s' to '%s' with label '%s' likely already exists due to UNIQUE constraint.", normalized_source_name, normalized_target_name, label)
         # Try to fetch the existing edge ID
         fetch_sql = "SELECT id FROM edges WHERE source_id = ? AND target_id = ? AND "
         fetch_params = [str(source_id), str(target_id)]
@@ -258,7 +658,7 @@ def add_edge_if_not_exists(source_name: str, target_name: str, label: Optional[s
         new_edge_id_result = execute_sql(fetch_sql, fetch_params)
         if isinstance(new_edge_id_result, list) and new_edge_id_result:
             new_edge_id = new_edge_id_result[0][0]
-            app_logger.info(f"Edge from '{normalized_source_name}' to '{normalized_target_name}' with label '{label}' created/found with ID {new_edge_id}.")
+            app_logger.info("Edge from '%s' to '%s' with label '%s' created/found with ID %s.", normalized_source_name, normalized_target_name, label, new_edge_id)
             return new_edge_id
         else:
             app_logger.warning(f"Edge from '{normalized_source_name}' to '{normalized_target_name}' with label '{label}' was inserted (or ignored), but could not retrieve its ID. This might happen if it was ignored and the fetch query is too strict.")
@@ -267,7 +667,7 @@ def add_edge_if_not_exists(source_name: str, target_name: str, label: Optional[s
             return None
             
     elif isinstance(result, int) and result == 0: # INSERT OR IGNORE did nothing, edge already exists
-        app_logger.info(f"Edge from '{normalized_source_name}' to '{normalized_target_name}' with label '{label}' already exists (INSERT OR IGNORE).")
+        app_logger.debug("Edge from '%s' to '%s' with label '%s' already exists (INSERT OR IGNORE).", normalized_source_name, normalized_target_name, label)
         fetch_sql = "SELECT id FROM edges WHERE source_id = ? AND target_id = ? AND "
         fetch_params = [str(source_id), str(target_id)]
         if label is None:
@@ -285,6 +685,292 @@ def add_edge_if_not_exists(source_name: str, target_name: str, label: Optional[s
         app_logger.error(f"Failed to add edge from '{normalized_source_name}' to '{normalized_target_name}' with label '{label}'. execute_sql result: {result}")
         return None
 
+def _resolve_node_rows(conn: sqlite3.Connection, normalized_names: List[str]) -> Dict[str, Tuple[int, Optional[str]]]:
+    """Maps each normalized name to (id, label) of its existing node in one indexed query. Missing names are absent."""
+    found: Dict[str, Tuple[int, Optional[str]]] = {}
+    if not normalized_names:
+        return found
+    # ORDER BY id mirrors get_node_by_name, which returns the oldest of any case-variant duplicates.
+    rows = conn.execute(
+        "SELECT j.value, n.id, n.label FROM json_each(?) j JOIN nodes n ON n.name_key = j.value ORDER BY n.id",
+        [json.dumps(normalized_names)],
+    )
+    for name, node_id, label in rows:
+        found.setdefault(name, (node_id, label))
+    return found
+
+def _bulk_upsert_graph(
+    conn: sqlite3.Connection,
+    node_labels: Dict[str, Optional[str]],
+    edge_keys: List[Tuple[str, str, Optional[str]]],
+) -> Tuple[Dict[str, int], List[int], List[Tuple[int, str]]]:
+    """
+    Resolves or inserts every node and edge using the given connection, which must already be
+    inside a transaction. Names and edge labels must be normalized; node labels are stored as given.
+
+    Args:
+        node_labels: Normalized node name -> label (None leaves an existing label untouched).
+            Must contain every name referenced by edge_keys.
+        edge_keys: Unique (normalized source name, normalized target name, normalized label) keys.
+
+    Returns:
+        A (name -> node id) map, the edge ids aligned with edge_keys, and (id, name) of the nodes
+        inserted, for running the node insert hooks once the transaction has committed.
+    """
+    names = list(node_labels)
+    existing = _resolve_node_rows(conn, names)
+
+    # Same rule as get_or_create_node: update an existing label only when it differs after normalization.
+    label_updates = [
+        (label, node_id)
+        for name, (node_id, current_label) in existing.items()
+        if (label := node_labels[name]) is not None and _normalize_text(current_label) != _normalize_text(label)
+    ]
+    if label_updates:
+        conn.executemany("UPDATE nodes SET label = ? WHERE id = ?", label_updates)
+
+    missing = [name for name in names if name not in existing]
+    created: List[Tuple[int, str]] = []
+    if missing:
+        conn.executemany(
+            "INSERT INTO nodes (name, label) VALUES (?, ?) ON CONFLICT(name) DO NOTHING",
+            [(name, node_labels[name]) for name in missing],
+        )
+        inserted = _resolve_node_rows(conn, missing)
+        created = [(row[0], name) for name, row in inserted.items()]
+        existing.update(inserted)
+    node_ids = {name: row[0] for name, row in existing.items()}
+
+    id_keys = [(node_ids[source], node_ids[target], label) for source, target, label in edge_keys]
+    edge_ids: List[Optional[int]] = [None] * len(id_keys)
+    if id_keys:
+        # "label IS ?" so NULL labels match; the UNIQUE constraint treats NULLs as distinct.
+        rows = conn.execute(
+            """
+            SELECT j.key, e.id FROM json_each(?) j
+            JOIN edges e ON e.source_id = json_extract(j.value, '$[0]')
+                        AND e.target_id = json_extract(j.value, '$[1]')
+                        AND e.label IS json_extract(j.value, '$[2]')
+            """,
+            [json.dumps(id_keys)],
+        )
+        for index, edge_id in rows:
+            edge_ids[index] = edge_id
+    insert_sql = (
+        "INSERT INTO edges (source_id, target_id, label) VALUES (?, ?, ?) "
+        "ON CONFLICT(source_id, target_id, label) DO NOTHING RETURNING id"
+    )
+    for index, key in enumerate(id_keys):
+        if edge_ids[index] is None:
+            # The write lock is held for the whole transaction, so RETURNING always yields the new row.
+            edge_ids[index] = conn.execute(insert_sql, key).fetchone()[0]
+    return node_ids, edge_ids, created
+
+def add_edges_bulk(
+    triples: Iterable[Tuple[str, str, Optional[str]]],
+    node_labels: Optional[Dict[str, Optional[str]]] = None,
+) -> Optional[List[Optional[int]]]:
+    """
+    Bulk counterpart of add_edge_if_not_exists: resolves or creates all nodes and edges in a single
+    transaction instead of several connect/query/commit cycles per triple.
+    Node names and edge labels are normalized exactly as in get_or_create_node and add_edge_if_not_exists.
+
+    Args:
+        triples: (source name, target name, edge label) tuples. The label may be None.
+        node_labels: Optional mapping of node name -> label. Nodes listed here are created even if
+            no triple references them, and existing labels are updated as in get_or_create_node.
+
+    Returns:
+        The edge IDs aligned with the input triples (None for a triple with an empty source or
+        target name), or None if the transaction failed and was rolled back.
+    """
+    normalized_labels: Dict[str, Optional[str]] = {}
+    for name, label in (node_labels or {}).items():
+        normalized_name = _normalize_text(name)
+        if normalized_name:
+            normalized_labels[normalized_name] = label
+        else:
+            app_logger.warning(f"Skipping node label for empty node name {name!r} in bulk insert.")
+
+    triple_keys: List[Optional[Tuple[str, str, Optional[str]]]] = []
+    for source_name, target_name, label in triples:
+        key = (_normalize_text(source_name), _normalize_text(target_name), _normalize_text(label))
+        if not key[0] or not key[1]:
+            app_logger.warning(f"Skipping triple with empty node name in bulk insert: {(source_name, target_name, label)!r}")
+            triple_keys.append(None)
+            continue
+        normalized_labels.setdefault(key[0], None)
+        normalized_labels.setdefault(key[1], None)
+        triple_keys.append(key)
+
+    unique_keys = list(dict.fromkeys(key for key in triple_keys if key is not None))
+    try:
+        with _write_transaction() as conn:
+            _, edge_ids, _ = _bulk_upsert_graph(conn, normalized_labels, unique_keys)
+    except sqlite3.Error as e:
+        app_logger.error(f"SQLite error during bulk insert of {len(unique_keys)} edges into '{DB_FILE}': {e}")
+        return None
+
+    edge_id_by_key = dict(zip(unique_keys, edge_ids))
+    app_logger.info("Bulk insert resolved %d nodes and %d unique edges in one transaction.", len(normalized_labels), len(unique_keys))
+    return [edge_id_by_key[key] if key is not None else None for key in triple_keys]
+
+def add_graph_batch(entities: List[Dict[str, str]], relations: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Stores a whole batch of extracted entities (nodes) and relations (edges) in one atomic write.
+    Use this once per processed text instead of one execute_sql INSERT per node or edge.
+
+    Args:
+        entities: Nodes to create or update, e.g. [{"name": "Marie Curie", "label": "Person"}].
+            "label" is optional; an existing node's label is updated when a different one is given.
+        relations: Edges to create, e.g. [{"source": "Marie Curie", "target": "Radium", "label": "discovered"}].
+            "label" is optional. Source and target nodes are created if they do not exist yet.
+
+    Returns:
+        A dict with "status" ("success" or "error") and per-item "entities" and "relations" result
+        lists in input order. Each item result has "index" and "status": "stored" with the node or
+        edge "id", or "skipped" with an "error" explaining why it was invalid. Invalid items are
+        skipped; if the write itself fails nothing is stored and "error" describes the failure.
+    """
+    return _store_graph_batch(entities, relations)
+
+def _link_source_edges(conn: sqlite3.Connection, url: str, content_hash: Optional[str], edge_ids: List[int], replace: bool) -> Tuple[int, int]:
+    """
+    Records url in sources and links it to edge_ids inside the caller's transaction. With replace, the
+    source's other links are dropped and those edges deleted unless another source links them.
+    Returns the source id and the number of deleted edges.
+    """
+    conn.execute(
+        "INSERT INTO sources (url, content_hash, extracted_at) VALUES (?, ?, CURRENT_TIMESTAMP) "
+        "ON CONFLICT(url) DO UPDATE SET content_hash = excluded.content_hash, extracted_at = excluded.extracted_at",
+        (url, content_hash),
+    )
+    source_id = conn.execute("SELECT id FROM sources WHERE url = ?", (url,)).fetchone()[0]
+    removed_edges = 0
+    if replace:
+        stale = [
+            row[0] for row in conn.execute(
+                "SELECT edge_id FROM source_edges WHERE source_id = ? AND edge_id NOT IN (SELECT value FROM json_each(?))",
+                (source_id, json.dumps(edge_ids)),
+            )
+        ]
+        if stale:
+            conn.execute("DELETE FROM source_edges WHERE source_id = ? AND edge_id IN (SELECT value FROM json_each(?))", (source_id, json.dumps(stale)))
+            removed_edges = conn.execute(
+                "DELETE FROM edges WHERE id IN (SELECT value FROM json_each(?)) AND NOT EXISTS (SELECT 1 FROM source_edges se WHERE se.edge_id = edges.id)",
+                (json.dumps(stale),),
+            ).rowcount
+    conn.executemany("INSERT OR IGNORE INTO source_edges (source_id, edge_id) VALUES (?, ?)", [(source_id, edge_id) for edge_id in set(edge_ids)])
+    return source_id, removed_edges
+
+def get_source(url: str) -> Optional[Dict[str, Any]]:
+    """Retrieves the provenance record of a source (id, url, content_hash, extracted_at, edge_count), or None."""
+    result = execute_sql(
+        "SELECT s.id, s.url, s.content_hash, s.extracted_at, (SELECT count(*) FROM source_edges se WHERE se.source_id = s.id) "
+        "FROM sources s WHERE s.url = ?;",
+        [url],
+    )
+    if isinstance(result, list) and result:
+        source_id, source_url, content_hash, extracted_at, edge_count = result[0]
+        return {"id": source_id, "url": source_url, "content_hash": content_hash, "extracted_at": extracted_at, "edge_count": edge_count}
+    if isinstance(result, str):
+        app_logger.error(f"Error fetching source '{url}': {result}")
+    return None
+
+def add_source_graph_batch(
+    url: str, content_hash: Optional[str], entities: List[Dict[str, str]], relations: List[Dict[str, str]], replace: bool = True
+) -> Dict[str, Any]:
+    """
+    add_graph_batch for everything extracted from one source (e.g. a URL), recording its provenance in
+    the same transaction: the source's content_hash and extraction time, and links to the batch's edges.
+
+    Args:
+        url: Identifies the source.
+        content_hash: Hash of the extracted content, or None if the extraction was incomplete
+            (so an unchanged source is still extracted again next time).
+        replace: The batch is the source's complete extraction. Edges linked to the source before but
+            not produced now are unlinked, and deleted when no other source links them. Without
+            replace, links are only added.
+
+    Returns:
+        add_graph_batch's result, plus "source": {"id", "removed_edges"} on success.
+    """
+    return _store_graph_batch(entities, relations, provenance=(url, content_hash, replace))
+
+def _store_graph_batch(
+    entities: List[Dict[str, str]], relations: List[Dict[str, str]], provenance: Optional[Tuple[str, Optional[str], bool]] = None
+) -> Dict[str, Any]:
+    entity_results: List[Dict[str, Any]] = []
+    relation_results: List[Dict[str, Any]] = []
+    node_labels: Dict[str, Optional[str]] = {}
+    entity_names: List[Optional[str]] = []
+    relation_keys: List[Optional[Tuple[str, str, Optional[str]]]] = []
+
+    for index, entity in enumerate(entities or []):
+        name = _normalize_text(entity.get("name")) if isinstance(entity, dict) and isinstance(entity.get("name"), str) else None
+        label = entity.get("label") if isinstance(entity, dict) else None
+        if not name:
+            entity_results.append({"index": index, "status": "skipped", "error": "Entity needs a non-empty 'name' string."})
+            entity_names.append(None)
+            continue
+        if label is not None and not isinstance(label, str):
+            label = str(label)
+        # A later mention without a label must not erase a label given earlier in the same batch.
+        if label is not None or name not in node_labels:
+            node_labels[name] = label
+        entity_names.append(name)
+        entity_results.append({"index": index, "status": "stored"})
+
+    for index, relation in enumerate(relations or []):
+        if not isinstance(relation, dict):
+            relation_keys.append(None)
+            relation_results.append({"index": index, "status": "skipped", "error": "Relation must be an object with 'source' and 'target'."})
+            continue
+        source, target, label = relation.get("source"), relation.get("target"), relation.get("label")
+        key = (
+            _normalize_text(source) if isinstance(source, str) else None,
+            _normalize_text(target) if isinstance(target, str) else None,
+            _normalize_text(str(label)) if label is not None else None,
+        )
+        if not key[0] or not key[1]:
+            relation_keys.append(None)
+            relation_results.append({"index": index, "status": "skipped", "error": "Relation needs non-empty 'source' and 'target' strings."})
+            continue
+        node_labels.setdefault(key[0], None)
+        node_labels.setdefault(key[1], None)
+        relation_keys.append(key)
+        relation_results.append({"index": index, "status": "stored"})
+
+    unique_keys = list(dict.fromkeys(key for key in relation_keys if key is not None))
+    try:
+        with _write_transaction() as conn:
+            node_ids, edge_ids, created = _bulk_upsert_graph(conn, node_labels, unique_keys)
+            if provenance is not None:
+                url, content_hash, replace = provenance
+                source_id, removed_edges = _link_source_edges(conn, url, content_hash, edge_ids, replace)
+    except sqlite3.Error as e:
+        app_logger.error(f"SQLite error storing graph batch ({len(node_labels)} nodes, {len(unique_keys)} edges) in '{DB_FILE}': {e}")
+        for result in entity_results + relation_results:
+            if result["status"] == "stored":
+                result["status"] = "failed"
+        return {"status": "error", "error": f"SQLite error: {e}. Nothing was stored.", "entities": entity_results, "relations": relation_results}
+
+    for node_id, name in created: # After the commit, so hooks see the new rows
+        _run_node_insert_hooks(node_id, name)
+    edge_id_by_key = dict(zip(unique_keys, edge_ids))
+    for result, name in zip(entity_results, entity_names):
+        if name is not None:
+            result["id"] = node_ids[name]
+    for result, key in zip(relation_results, relation_keys):
+        if key is not None:
+            result["id"] = edge_id_by_key[key]
+    app_logger.info(f"Graph batch stored: {len(node_labels)} nodes and {len(unique_keys)} unique edges.")
+    result = {"status": "success", "entities": entity_results, "relations": relation_results}
+    if provenance is not None:
+        app_logger.info(f"Linked source '{provenance[0]}' to {len(unique_keys)} edges; removed {removed_edges} stale edges.")
+        result["source"] = {"id": source_id, "removed_edges": removed_edges}
+    return result
+
 if __name__ == '__main__':
     app_logger.info("Starting db_tools.py script for advanced demonstration.")
     initialize_database()
@@ -309,6 +995,13 @@ if __name__ == '__main__':
     app_logger.info(f"Edge IDs: E1={edge1_id}, E2={edge2_id}, E3={edge3_id} (should be same as E2), E4={edge4_id}, E5={edge5_id} (should be same as E1)")
     app_logger.info(f"Edge with no label ID1: {edge_no_label_id}, ID2: {edge_no_label_id2} (should be same)")
 
+    app_logger.info("\n--- Demonstrating Bulk Edge Creation ---")
+    bulk_edge_ids = add_edges_bulk(
+        [("Oakland", "California", "is_in_state"), ("San Francisco", "California", "IS_IN_STATE"), ("Oakland", "San Francisco", None)],
+        node_labels={"Oakland": "City"},
+    )
+    app_logger.info(f"Bulk edge IDs: {bulk_edge_ids} (second should be same as E2)")
+
     app_logger.info("\n--- Final DB Schema ---")
     schema = get_db_schema()
     app_logger.info(f"Schema:\n{schema}")
@@ -0,0 +1,485 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError: # Entity resolution is optional; without NumPy no duplicates are proposed
+    np = None
+
+from linkbase.db_tools import (
+    execute_sql, _write_transaction, _normalize_text,
+    register_node_insert_hook, unregister_node_insert_hook,
+)
+from linkbase.logger_config import app_logger
+
+# Offline entity resolution: near-duplicate node names ("new york city", "new-york city", "NYC") are
+# found with a MinHash LSH index over character 3-grams of the names, so candidates come from shared
+# LSH buckets instead of comparing every pair of nodes. Candidates are verified with the exact 3-gram
+# Jaccard similarity, or as an acronym of a multi-word name. merge_node_ids() folds duplicates into one
+# node by rewriting their edges in a single transaction.
+#
+# The index is kept in memory, built on first use and caught up with new nodes through the node id
+# watermark. With install_insert_hook(), every node created by get_or_create_node is checked against
+# it as it is inserted.
+RESOLUTION_AVAILABLE = np is not None
+DUPLICATE_THRESHOLD = float(os.environ.get("LINKBASE_DUPLICATE_THRESHOLD", "0.7")) # 3-gram Jaccard similarity
+MINHASH_PERMUTATIONS = 32
+LSH_BANDS = 8 # Of MINHASH_PERMUTATIONS // LSH_BANDS rows each: pairs above ~0.6 similarity share a band
+LSH_MAX_BUCKET = 64 # Larger buckets (very common n-gram patterns) propose no pairs, keeping this sub-quadratic
+_ROWS_PER_BAND = MINHASH_PERMUTATIONS // LSH_BANDS
+_ACRONYM_COLUMN = LSH_BANDS # Extra bucket column keyed by acronym; 0 means the name has none
+_MERSENNE_PRIME = (1 << 31) - 1
+_PENDING_LIMIT = 512 # Nodes added since the last sort; queries scan them linearly
+# Bucket pairs whose signature estimate falls this far below the threshold skip the exact comparison
+# (the estimate's standard deviation is at most 0.09 with 32 permutations)
+_ESTIMATE_MARGIN = 0.2
+_ESTIMATE_BLOCK = 1 << 18
+_RECENT_CANDIDATES = 1000
+_SEED = 7
+
+_rng = np.random.default_rng(_SEED) if np is not None else None
+_HASH_A = _rng.integers(1, _MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64) if np is not None else None
+_HASH_B = _rng.integers(0, _MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64) if np is not None else None
+_WORD_RE = re.compile(r"[^\W_]+")
+
+_index: Optional["MinHashIndex"] = None
+_index_lock = threading.RLock()
+_recent_candidates: deque = deque(maxlen=_RECENT_CANDIDATES)
+
+def _resolution_key(name: str) -> str:
+    """Lowercased words of name separated by single spaces, so punctuation and spacing don't matter."""
+    return " ".join(_WORD_RE.findall(name.lower())) or name.lower().strip() or name
+
+def _ngrams(key: str) -> set:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _acronym_key(key: str) -> Optional[str]:
+    # Initials of multi-word names, and short single words that may be such initials
+    words = key.split(" ")
+    if len(words) >= 2:
+        return "".join(word[0] for word in words)
+    if 2 <= len(key) <= 6 and key.isalpha():
+        return key
+    return None
+
+def _similarity(grams: set, other_grams: set) -> float:
+    return len(grams & other_grams) / len(grams | other_grams)
+
+def _is_acronym(key: str, other: str) -> bool:
+    """Whether one key is a single word spelling the initials of the other, multi-word key."""
+    if " " in key:
+        key, other = other, key
+    return " " not in key and " " in other and _acronym_key(other) == key
+
+def _signatures(keys: List[str]):
+    """
+    MinHash signatures of the keys' 3-grams, computed for all keys at once: a (len(keys),
+    MINHASH_PERMUTATIONS) uint32 array. The share of equal columns estimates Jaccard similarity.
+    """
+    n = len(keys)
+    signatures = np.zeros((n, MINHASH_PERMUTATIONS), dtype=np.uint32)
+    if n == 0:
+        return signatures
+    padded = [f" {key} " for key in keys]
+    owner = np.repeat(np.arange(n), np.fromiter(map(len, padded), dtype=np.int64, count=n))
+    codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    # Three 21-bit code points make one 63-bit n-gram id; only n-grams inside a single key count
+    starts = np.flatnonzero(owner[:-2] == owner[2:])
+    grams = (codes[starts] << np.uint64(42)) | (codes[starts + 1] << np.uint64(21)) | codes[starts + 2]
+    grams = (grams * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(33) # Mixed down to 31 bits
+    offsets = np.searchsorted(owner[starts], np.arange(n)) # Padding gives every key at least one n-gram
+    for permutation in range(MINHASH_PERMUTATIONS):
+        signatures[:, permutation] = np.minimum.reduceat((_HASH_A[permutation] * grams + _HASH_B[permutation]) % np.uint64(_MERSENNE_PRIME), offsets)
+    return signatures
+
+def _bucket_keys(keys: List[str], signatures):
+    """(len(keys), LSH_BANDS + 1) uint64 array of LSH bucket keys: one per signature band, then the acronym key."""
+    buckets = np.zeros((len(keys), LSH_BANDS + 1), dtype=np.uint64)
+    for band in range(LSH_BANDS):
+        band_key = np.full(len(keys), band + 1, dtype=np.uint64)
+        for permutation in range(band * _ROWS_PER_BAND, (band + 1) * _ROWS_PER_BAND):
+            band_key = band_key * np.uint64(0x100000001B3) ^ signatures[:, permutation]
+        buckets[:, band] = band_key
+    for row, key in enumerate(keys):
+        acronym = _acronym_key(key)
+        if acronym:
+            buckets[row, _ACRONYM_COLUMN] = int.from_bytes(hashlib.blake2b(acronym.encode("utf-8"), digest_size=8).digest(), "little") or 1
+    return buckets
+
+class MinHashIndex:
+    """
+    MinHash signatures and LSH buckets of node names. Every bucket column is kept sorted for binary
+    search; nodes added since the last sort wait in small pending arrays. Not thread-safe: use it
+    under _index_lock.
+    """
+    def __init__(self):
+        self.node_ids: List[int] = []
+        self.keys: List[str] = []
+        self.node_watermark = 0
+        self.node_count = 0
+        self._removed: set = set()
+        self._sorted_keys = [np.zeros(0, dtype=np.uint64) for _ in range(LSH_BANDS + 1)]
+        self._sorted_rows = [np.zeros(0, dtype=np.int64) for _ in range(LSH_BANDS + 1)]
+        self._signatures = np.zeros((0, MINHASH_PERMUTATIONS), dtype=np.uint32)
+        self._pending_signatures = np.zeros((0, MINHASH_PERMUTATIONS), dtype=np.uint32)
+        self._pending_buckets = np.zeros((0, LSH_BANDS + 1), dtype=np.uint64)
+
+    def add(self, node_ids: List[int], names: List[str]) -> None:
+        keys = [_resolution_key(name) for name in names]
+        self.node_ids.extend(node_ids)
+        self.keys.extend(keys)
+        signatures = _signatures(keys)
+        self._pending_signatures = np.concatenate((self._pending_signatures, signatures))
+        self._pending_buckets = np.concatenate((self._pending_buckets, _bucket_keys(keys, signatures)))
+        self.node_count += len(node_ids)
+        if node_ids:
+            self.node_watermark = max(self.node_watermark, max(node_ids))
+        if len(self._pending_buckets) > _PENDING_LIMIT:
+            self._compact()
+
+    def discard(self, node_ids: List[int]) -> None:
+        self._removed.update(node_ids)
+        self.node_count -= len(node_ids)
+
+    def _compact(self) -> None:
+        sorted_count = len(self._sorted_rows[0])
+        buckets = np.zeros((sorted_count, LSH_BANDS + 1), dtype=np.uint64)
+        for column in range(LSH_BANDS + 1):
+            buckets[self._sorted_rows[column], column] = self._sorted_keys[column]
+        buckets = np.concatenate((buckets, self._pending_buckets))
+        self._signatures = np.concatenate((self._signatures, self._pending_signatures))
+        self._pending_signatures = self._pending_signatures[:0]
+        self._pending_buckets = self._pending_buckets[:0]
+        for column in range(LSH_BANDS + 1):
+            order = np.argsort(buckets[:, column], kind="stable")
+            self._sorted_rows[column] = order
+            self._sorted_keys[column] = buckets[order, column]
+
+    def _candidate_rows(self, buckets) -> set:
+        rows = set()
+        for column in range(LSH_BANDS + 1):
+            value = buckets[column]
+            if column == _ACRONYM_COLUMN and value == 0:
+                continue
+            low = np.searchsorted(self._sorted_keys[column], value, side="left")
+            high = np.searchsorted(self._sorted_keys[column], value, side="right")
+            if high - low <= LSH_MAX_BUCKET:
+                rows.update(self._sorted_rows[column][low:high].tolist())
+        matches = (self._pending_buckets[:, :LSH_BANDS] == buckets[:LSH_BANDS]).any(axis=1)
+        if buckets[_ACRONYM_COLUMN]:
+            matches |= self._pending_buckets[:, _ACRONYM_COLUMN] == buckets[_ACRONYM_COLUMN]
+        rows.update((np.flatnonzero(matches) + len(self._sorted_rows[0])).tolist())
+        return rows
+
+    def query(self, name: str, threshold: float = DUPLICATE_THRESHOLD, exclude: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Indexed nodes whose names probably denote the same entity as name, most similar first."""
+        key = _resolution_key(name)
+        grams = _ngrams(key)
+        matches = []
+        for row in self._candidate_rows(_bucket_keys([key], _signatures([key]))[0]):
+            node_id = self.node_ids[row]
+            if node_id == exclude or node_id in self._removed:
+                continue
+            similarity = _similarity(grams, _ngrams(self.keys[row]))
+            if similarity >= threshold or _is_acronym(key, self.keys[row]):
+                reason = "similar_name" if similarity >= threshold else "acronym"
+                matches.append({"id": node_id, "similarity": round(similarity, 3), "reason": reason})
+        return sorted(matches, key=lambda m: (-m["similarity"], m["id"]))
+
+    def _bucket_pairs(self, column: int):
+        """
+        Row pairs of every bucket in column holding 2 to LSH_MAX_BUCKET rows, as lower_row * n + higher_row
+        codes, and the number of larger buckets.
+        """
+        sorted_keys, sorted_rows = self._sorted_keys[column], self._sorted_rows[column]
+        n = len(sorted_rows)
+        starts = np.concatenate(([0], np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1)) if n else np.zeros(0, dtype=np.int64)
+        lengths = np.diff(np.append(starts, n))
+        if column == _ACRONYM_COLUMN: # Names without an acronym all share key 0
+            keep = sorted_keys[starts] != 0
+            starts, lengths = starts[keep], lengths[keep]
+        codes = []
+        # Buckets of equal size are expanded together: row offsets of all pairs within one bucket,
+        # added to the start of every bucket of that size
+        for length in np.unique(lengths[(lengths >= 2) & (lengths <= LSH_MAX_BUCKET)]).tolist():
+            bucket_starts = starts[lengths == length][:, None]
+            first_offsets, second_offsets = np.triu_indices(length, 1)
+            first, second = sorted_rows[bucket_starts + first_offsets], sorted_rows[bucket_starts + second_offsets]
+            codes.append((np.minimum(first, second) * n + np.maximum(first, second)).ravel())
+        return codes, int((lengths > LSH_MAX_BUCKET).sum())
+
+    def candidate_pairs(self, threshold: float = DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+        """Every pair of indexed nodes sharing a bucket that passes verification, most similar first."""
+        self._compact()
+        n = len(self.node_ids)
+        band_codes, acronym_codes = [], []
+        skipped = 0
+        for column in range(LSH_BANDS + 1):
+            codes, large_buckets = self._bucket_pairs(column)
+            (acronym_codes if column == _ACRONYM_COLUMN else band_codes).extend(codes)
+            skipped += large_buckets
+        if skipped:
+            app_logger.info(f"Skipped {skipped} LSH buckets with more than {LSH_MAX_BUCKET} names.")
+
+        node_ids = np.asarray(self.node_ids, dtype=np.int64)
+        removed = np.fromiter(self._removed, dtype=np.int64, count=len(self._removed))
+        results: Dict[int, Dict[str, Any]] = {}
+        grams: Dict[int, set] = {}
+        for codes, reason in ((band_codes, "similar_name"), (acronym_codes, "acronym")):
+            codes = np.sort(np.concatenate(codes)) if codes else np.zeros(0, dtype=np.int64)
+            codes = codes[np.append(True, codes[1:] != codes[:-1])] if len(codes) else codes
+            first, second = codes // n, codes % n
+            live = ~(np.isin(node_ids[first], removed) | np.isin(node_ids[second], removed))
+            first, second = first[live], second[live]
+            if reason == "similar_name": # Only pairs whose estimated similarity is near the threshold are compared exactly
+                estimated = np.concatenate([
+                    (self._signatures[first[i:i + _ESTIMATE_BLOCK]] == self._signatures[second[i:i + _ESTIMATE_BLOCK]]).mean(axis=1)
+                    for i in range(0, len(first), _ESTIMATE_BLOCK)
+                ] or [np.zeros(0)])
+                close = estimated >= threshold - _ESTIMATE_MARGIN
+                first, second = first[close], second[close]
+            for i, j in zip(first.tolist(), second.tolist()):
+                code = i * n + j
+                if code in results or (reason == "acronym" and not _is_acronym(self.keys[i], self.keys[j])):
+                    continue
+                for row in (i, j):
+                    if row not in grams:
+                        grams[row] = _ngrams(self.keys[row])
+                similarity = _similarity(grams[i], grams[j])
+                if reason == "acronym" or similarity >= threshold:
+                    results[code] = {"ids": (self.node_ids[i], self.node_ids[j]), "similarity": round(similarity, 3), "reason": reason}
+        return sorted(results.values(), key=lambda r: (-r["similarity"], r["ids"]))
+
+def _load_index(check_deletions: bool = True) -> Optional[MinHashIndex]:
+    """
+    The process-wide index, built on first use and caught up with nodes inserted since; call under
+    _index_lock. check_deletions counts the indexed nodes still present, so deletions by other means
+    than merge_node_ids trigger a rebuild; the insert hook skips that full count.
+    """
+    global _index
+    if not RESOLUTION_AVAILABLE:
+        return None
+    rebuild = _index is None
+    if not rebuild and check_deletions:
+        state = execute_sql("SELECT count(*) FROM nodes WHERE id <= CAST(? AS INTEGER);", [str(_index.node_watermark)])
+        if isinstance(state, str):
+            app_logger.error(f"Cannot check the entity resolution index: {state}")
+            return None
+        rebuild = state[0][0] != _index.node_count
+    rows = execute_sql("SELECT id, name FROM nodes WHERE id > CAST(? AS INTEGER) ORDER BY id;", ["0" if rebuild else str(_index.node_watermark)])
+    if isinstance(rows, str):
+        app_logger.error(f"Cannot load node names for entity resolution: {rows}")
+        return None
+    index = MinHashIndex() if rebuild else _index
+    if rows:
+        index.add([row[0] for row in rows], [row[1] for row in rows])
+    if rebuild:
+        app_logger.info(f"Built the entity resolution index over {len(rows)} node names.")
+    _index = index
+    return index
+
+def find_similar_nodes(name: str, threshold: float = DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+    """Existing nodes whose names probably denote the same entity as name, as {"id", "similarity", "reason"} dicts."""
+    with _index_lock:
+        index = _load_index()
+        return index.query(name, threshold) if index is not None else []
+
+def find_duplicate_candidates(threshold: float = DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+    """All pairs of nodes that are probably duplicates, as {"ids", "similarity", "reason"} dicts, most similar first."""
+    with _index_lock:
+        index = _load_index()
+        return index.candidate_pairs(threshold) if index is not None else []
+
+def check_new_node(node_id: int, name: str) -> None:
+    """Node insert hook: logs existing nodes the new one probably duplicates and keeps them for get_insert_candidates()."""
+    with _index_lock:
+        index = _load_index(check_deletions=False)
+        matches = index.query(name, exclude=node_id) if index is not None else []
+    if matches:
+        app_logger.info(f"New node '{name}' ({node_id}) may duplicate nodes {[match['id'] for match in matches]}.")
+        _recent_candidates.append({"id": node_id, "name": name, "matches": matches})
+
+def install_insert_hook() -> None:
+    register_node_insert_hook(check_new_node)
+
+def uninstall_insert_hook() -> None:
+    unregister_node_insert_hook(check_new_node)
+
+def get_insert_candidates() -> List[Dict[str, Any]]:
+    """Possible duplicates found by check_new_node for the most recently created nodes, oldest first."""
+    return list(_recent_candidates)
+
+def merge_node_ids(keep_id: int, duplicate_ids: List[int]) -> Dict[str, Any]:
+    """
+    Merges the duplicate nodes into keep_id in one transaction: their edges are rewritten to keep_id,
+    edges that become identical are collapsed into the oldest one (which inherits their sources),
+    edges between the merged nodes are dropped, and the duplicates are deleted. keep_id takes the
+    first duplicate's label if it has none.
+    """
+    duplicate_ids = [node_id for node_id in dict.fromkeys(duplicate_ids) if node_id != keep_id]
+    group = [keep_id] + duplicate_ids
+    group_set = set(group)
+    try:
+        with _write_transaction() as conn:
+            nodes = {row[0]: row[1] for row in conn.execute("SELECT n.id, n.label FROM json_each(?) j JOIN nodes n ON n.id = j.value", (json.dumps(group),))}
+            missing = [node_id for node_id in group if node_id not in nodes]
+            if missing:
+                return {"status": "error", "error": f"Nodes not found: {missing}. Nothing was merged."}
+            edges = conn.execute(
+                "SELECT e.id, e.source_id, e.target_id, e.label FROM edges e WHERE e.source_id IN (SELECT value FROM json_each(?1)) "
+                "UNION SELECT e.id, e.source_id, e.target_id, e.label FROM edges e WHERE e.target_id IN (SELECT value FROM json_each(?1)) ORDER BY 1",
+                (json.dumps(group),),
+            ).fetchall()
+            survivors: Dict[Tuple, int] = {}
+            rewired: List[Tuple[int, int, int]] = []
+            collapsed: List[Tuple[int, int]] = [] # (duplicate edge, surviving edge)
+            dropped: List[int] = []
+            for edge_id, source_id, target_id, label in edges:
+                new_source = keep_id if source_id in group_set else source_id
+                new_target = keep_id if target_id in group_set else target_id
+                if new_source == new_target and source_id != target_id: # A link between two of the merged nodes
+                    dropped.append(edge_id)
+                    continue
+                key = (new_source, new_target, label)
+                if key in survivors:
+                    collapsed.append((edge_id, survivors[key]))
+                    continue
+                survivors[key] = edge_id
+                if (new_source, new_target) != (source_id, target_id):
+                    rewired.append((new_source, new_target, edge_id))
+            conn.executemany(
+                "INSERT OR IGNORE INTO source_edges (source_id, edge_id) SELECT source_id, ? FROM source_edges WHERE edge_id = ?",
+                [(survivor, duplicate) for duplicate, survivor in collapsed],
+            )
+            removed = dropped + [duplicate for duplicate, _ in collapsed]
+            conn.execute("DELETE FROM edges WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(removed),))
+            conn.executemany("UPDATE edges SET source_id = ?, target_id = ? WHERE id = ?", rewired)
+            label = nodes[keep_id] or next((nodes[node_id] for node_id in duplicate_ids if nodes[node_id]), None)
+            if label != nodes[keep_id]:
+                conn.execute("UPDATE nodes SET label = ? WHERE id = ?", (label, keep_id))
+            for table, column in (("nodes", "id"), ("node_positions", "node_id"), ("node_metrics", "node_id")):
+                conn.execute(f"DELETE FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))", (json.dumps(duplicate_ids),))
+    except sqlite3.Error as e:
+        app_logger.error(f"SQLite error merging nodes {duplicate_ids} into {keep_id}: {e}")
+        return {"status": "error", "error": f"SQLite error: {e}. Nothing was merged."}
+    with _index_lock:
+        if _index is not None:
+            _index.discard(duplicate_ids)
+    app_logger.info(f"Merged nodes {duplicate_ids} into {keep_id}: {len(rewired)} edges rewritten, {len(removed)} removed.")
+    return {"status": "success", "kept": keep_id, "merged": duplicate_ids, "rewired_edges": len(rewired), "removed_edges": len(removed)}
+
+def resolve_duplicates(threshold: float = DUPLICATE_THRESHOLD, apply: bool = False, include_acronyms: bool = False) -> List[Dict[str, Any]]:
+    """
+    Groups duplicate candidates into clusters (connected pairs) and, with apply, merges every cluster
+    into its node with the most edges (the oldest on ties). Acronym matches are only used with
+    include_acronyms, since short names are ambiguous. Returns the clusters as
+    {"keep", "merge", "names"} dicts, with the merge results when applied.
+    """
+    parent: Dict[int, int] = {}
+    def find(node_id: int) -> int:
+        while parent.setdefault(node_id, node_id) != node_id:
+            parent[node_id] = parent[parent[node_id]]
+            node_id = parent[node_id]
+        return node_id
+    for pair in find_duplicate_candidates(threshold):
+        if pair["reason"] == "similar_name" or include_acronyms:
+            parent[find(pair["ids"][0])] = find(pair["ids"][1])
+    clusters: Dict[int, List[int]] = {}
+    for node_id in list(parent):
+        clusters.setdefault(find(node_id), []).append(node_id)
+    members = sorted(itertools.chain.from_iterable(clusters.values()))
+    if not members:
+        return []
+    stats = execute_sql(
+        "SELECT j.value, n.name, (SELECT count(*) FROM edges WHERE source_id = j.value) + (SELECT count(*) FROM edges WHERE target_id = j.value) "
+        "FROM json_each(?) j JOIN nodes n ON n.id = j.value;",
+        [json.dumps(members)],
+    )
+    if isinstance(stats, str):
+        app_logger.error(f"Error fetching duplicate cluster details: {stats}")
+        return []
+    names = {row[0]: row[1] for row in stats}
+    degrees = {row[0]: row[2] for row in stats}
+    results = []
+    for cluster in sorted(clusters.values(), key=min):
+        cluster = sorted(node_id for node_id in cluster if node_id in names)
+        if len(cluster) < 2:
+            continue
+        keep = max(cluster, key=lambda node_id: (degrees[node_id], -node_id))
+        result = {"keep": keep, "merge": [node_id for node_id in cluster if node_id != keep], "names": [names[node_id] for node_id in cluster]}
+        if apply:
+            result["result"] = merge_node_ids(keep, result["merge"])
+        results.append(result)
+    return results
+
+def find_duplicate_nodes(limit: int = 50) -> Dict[str, Any]:
+    """
+    Lists pairs of nodes whose names probably denote the same entity, such as "new york city" and
+    "new-york city" (similar names) or "nyc" and "new york city" (acronyms). Review them and merge
+    real duplicates with merge_nodes.
+
+    Args:
+        limit: Maximum number of pairs to return, most similar first.
+
+    Returns:
+        A dict with "status" and "pairs", a list of {"names", "similarity", "reason"} dicts, where
+        similarity is between 0 and 1 and reason is "similar_name" or "acronym".
+    """
+    if not RESOLUTION_AVAILABLE:
+        return {"status": "error", "error": "Entity resolution needs NumPy, which is not installed."}
+    pairs = find_duplicate_candidates()[:max(limit, 0)]
+    ids = sorted({node_id for pair in pairs for node_id in pair["ids"]})
+    result = execute_sql("SELECT n.id, n.name FROM json_each(?) j JOIN nodes n ON n.id = j.value;", [json.dumps(ids)])
+    if isinstance(result, str):
+        return {"status": "error", "error": result}
+    names = dict(result)
+    return {
+        "status": "success",
+        "pairs": [
+            {"names": [names.get(node_id) for node_id in pair["ids"]], "similarity": pair["similarity"], "reason": pair["reason"]}
+            for pair in pairs
+        ],
+    }
+
+def merge_nodes(canonical_name: str, duplicate_names: List[str]) -> Dict[str, Any]:
+    """
+    Merges nodes that denote the same entity into one. Every edge of the duplicates is moved to the
+    canonical node, and the duplicate nodes are deleted.
+
+    Args:
+        canonical_name: Name of the node to keep.
+        duplicate_names: Names of the nodes to merge into it.
+
+    Returns:
+        A dict with "status" ("success" or "error"), the "kept" and "merged" node ids and the numbers
+        of "rewired_edges" and "removed_edges" (edges that became duplicates), or an "error" message.
+    """
+    names = [_normalize_text(name) for name in [canonical_name] + list(duplicate_names)]
+    result = execute_sql("SELECT j.value, min(n.id) FROM json_each(?) j JOIN nodes n ON n.name_key = j.value GROUP BY j.value;", [json.dumps(names)])
+    if isinstance(result, str):
+        return {"status": "error", "error": result}
+    ids = dict(result)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        return {"status": "error", "error": f"Nodes not found: {missing}. Nothing was merged."}
+    return merge_node_ids(ids[names[0]], [ids[name] for name in names[1:]])
+
+if __name__ == "__main__":
+    from linkbase.db_tools import initialize_database
+
+    parser = argparse.ArgumentParser(description="Find (and optionally merge) near-duplicate nodes in the graph.")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD, help="minimum 3-gram Jaccard similarity of names")
+    parser.add_argument("--acronyms", action="store_true", help="also merge acronyms into the names they abbreviate")
+    parser.add_argument("--apply", action="store_true", help="merge the clusters found instead of only listing them")
+    args = parser.parse_args()
+    initialize_database()
+    print(json.dumps(resolve_duplicates(args.threshold, apply=args.apply, include_acronyms=args.acronyms), indent=2))
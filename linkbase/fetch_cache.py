@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from linkbase.db_tools import _get_connection
+from linkbase.logger_config import app_logger
+
+# Persistent cache of fetched pages for web_tools: raw body, extracted text and validators (ETag,
+# Last-Modified, content hash), so unchanged pages are revalidated with a conditional GET instead of
+# being downloaded and parsed again. It lives in its own SQLite file so that cache writes don't
+# change the graph database's data_version (and with it every graph ETag and response cache entry).
+FETCH_CACHE_FILE = os.environ.get("LINKBASE_FETCH_CACHE_FILE", "linkbase_fetch_cache.db")
+FETCH_CACHE_MAX_BYTES = int(float(os.environ.get("LINKBASE_FETCH_CACHE_MB", "256")) * 1024 * 1024) # 0 disables the cache
+# Entries younger than this are served without contacting the server at all.
+FETCH_CACHE_FRESH_SECONDS = float(os.environ.get("LINKBASE_FETCH_CACHE_FRESH_SECONDS", "300"))
+# Entries not revalidated for this long are evicted.
+FETCH_CACHE_MAX_AGE_SECONDS = float(os.environ.get("LINKBASE_FETCH_CACHE_MAX_AGE_DAYS", "30")) * 86400
+FETCH_CACHE_ENABLED = FETCH_CACHE_MAX_BYTES > 0
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS fetch_cache (
+        url TEXT PRIMARY KEY,
+        body BLOB NOT NULL,
+        text TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        content_hash TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        fetched_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_fetch_cache_last_access ON fetch_cache(last_access)",
+)
+_initialized_paths = set()
+
+def _connection() -> sqlite3.Connection:
+    conn = _get_connection(FETCH_CACHE_FILE)
+    db_path = os.path.abspath(FETCH_CACHE_FILE)
+    if db_path not in _initialized_paths:
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        _initialized_paths.add(db_path)
+    return conn
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+def get_entry(url: str) -> Optional[Dict[str, Any]]:
+    """Returns the cached entry for url (without its body) and marks it as recently used, or None."""
+    if not FETCH_CACHE_ENABLED:
+        return None
+    try:
+        conn = _connection()
+        with conn:
+            row = conn.execute(
+                "SELECT text, etag, last_modified, content_hash, fetched_at FROM fetch_cache WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE fetch_cache SET last_access = ? WHERE url = ?", (time.time(), url))
+    except sqlite3.Error as e:
+        app_logger.warning(f"Fetch cache lookup failed for {url}: {e}")
+        return None
+    return {"text": row[0], "etag": row[1], "last_modified": row[2], "content_hash": row[3], "fetched_at": row[4]}
+
+def is_fresh(entry: Dict[str, Any]) -> bool:
+    return time.time() - entry["fetched_at"] < FETCH_CACHE_FRESH_SECONDS
+
+def mark_revalidated(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+    """Records that the server confirmed the cached copy (a 304, or a 200 with an identical body)."""
+    if not FETCH_CACHE_ENABLED:
+        return
+    try:
+        conn = _connection()
+        with conn:
+            conn.execute(
+                "UPDATE fetch_cache SET fetched_at = ?, etag = coalesce(?, etag), last_modified = coalesce(?, last_modified) WHERE url = ?",
+                (time.time(), etag, last_modified, url)
+            )
+    except sqlite3.Error as e:
+        app_logger.warning(f"Fetch cache update failed for {url}: {e}")
+
+def store(url: str, body: bytes, text: str, etag: Optional[str], last_modified: Optional[str], body_hash: Optional[str] = None) -> None:
+    """Stores a freshly fetched page, then evicts expired and least recently used entries over the size cap."""
+    size = len(body) + len(text.encode("utf-8"))
+    if not FETCH_CACHE_ENABLED or size > FETCH_CACHE_MAX_BYTES:
+        return
+    now = time.time()
+    try:
+        conn = _connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fetch_cache (url, body, text, etag, last_modified, content_hash, size, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body, text, etag, last_modified, body_hash or content_hash(body), size, now, now)
+            )
+            conn.execute("DELETE FROM fetch_cache WHERE fetched_at < ?", (now - FETCH_CACHE_MAX_AGE_SECONDS,))
+            # Keep the most recently used entries whose running total fits the cap
+            evicted = conn.execute(
+                "DELETE FROM fetch_cache WHERE url IN (SELECT url FROM (SELECT url, sum(size) OVER (ORDER BY last_access DESC, url) AS running FROM fetch_cache) WHERE running > ?)",
+                (FETCH_CACHE_MAX_BYTES,)
+            ).rowcount
+        if evicted:
+            app_logger.info(f"Evicted {evicted} least recently used pages from the fetch cache.")
+    except sqlite3.Error as e:
+        app_logger.warning(f"Fetch cache store failed for {url}: {e}")
@@ -0,0 +1,166 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError: # Analytics are optional; without NumPy no metrics are computed
+    np = None
+
+from linkbase.db_tools import execute_sql, streaming_connection, _write_transaction, get_graph_change, GRAPH_UNCHANGED
+from linkbase.db_executor import BackgroundJob
+from linkbase.logger_config import app_logger
+
+# Whole-graph node metrics (degrees, PageRank, weakly connected components), computed with vectorized
+# NumPy passes over the edge list and materialized in node_metrics, where graph_tools and /api/graph
+# use them as sort and filter keys. PageRank and components are global, so any change to the graph
+# recomputes everything; ensure_metrics() only checks cheap watermarks when nothing changed. It
+# always runs on a background thread, on a schedule (METRICS_REFRESH_SECONDS) started by the web
+# server and whenever request_metrics_refresh() is called, so requests never wait for it.
+ANALYTICS_AVAILABLE = np is not None
+METRIC_FIELDS = ("in_degree", "out_degree", "degree", "pagerank", "component", "component_size")
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-8 # L1 change between iterations below which PageRank has converged
+PAGERANK_MAX_ITERATIONS = 100
+METRICS_REFRESH_SECONDS = float(os.environ.get("LINKBASE_METRICS_REFRESH_SECONDS", "60")) # 0: only when requested
+
+_metrics_lock = threading.Lock()
+
+def _load_graph_arrays():
+    """Node ids (sorted) and edge endpoints as node indexes, read in one transaction without per-row objects."""
+    with streaming_connection() as conn:
+        node_ids = np.fromiter(itertools.chain.from_iterable(conn.execute("SELECT id FROM nodes ORDER BY id")), dtype=np.int64)
+        endpoints = np.fromiter(itertools.chain.from_iterable(conn.execute("SELECT source_id, target_id FROM edges")), dtype=np.int64)
+    sources = np.searchsorted(node_ids, endpoints[0::2]); targets = np.searchsorted(node_ids, endpoints[1::2])
+    # Edges whose endpoint is missing from nodes (searchsorted lands on another id or past the end) are dropped
+    valid = (sources < len(node_ids)) & (targets < len(node_ids))
+    valid[valid] &= (node_ids[sources[valid]] == endpoints[0::2][valid]) & (node_ids[targets[valid]] == endpoints[1::2][valid])
+    return node_ids, sources[valid], targets[valid]
+
+def _pagerank(n: int, sources, targets, out_degree):
+    if n == 0:
+        return np.zeros(0)
+    rank = np.full(n, 1.0 / n)
+    inverse_out = np.divide(1.0, out_degree, out=np.zeros(n), where=out_degree > 0)
+    dangling = out_degree == 0
+    for _ in range(PAGERANK_MAX_ITERATIONS):
+        incoming = np.bincount(targets, weights=(rank * inverse_out)[sources], minlength=n)
+        # Rank of nodes without outgoing edges is spread evenly over all nodes
+        new_rank = (1.0 - PAGERANK_DAMPING) / n + PAGERANK_DAMPING * (incoming + rank[dangling].sum() / n)
+        converged = np.abs(new_rank - rank).sum() < PAGERANK_TOLERANCE
+        rank = new_rank
+        if converged:
+            break
+    return rank
+
+def _weak_components(n: int, sources, targets):
+    """Label of every node: the smallest node index in its weakly connected component."""
+    labels = np.arange(n)
+    while True:
+        smaller = np.minimum(labels[sources], labels[targets])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, sources, smaller); np.minimum.at(new_labels, targets, smaller)
+        while True: # Pointer jumping: follow labels to their own label until nothing changes
+            jumped = new_labels[new_labels]
+            if np.array_equal(jumped, new_labels):
+                break
+            new_labels = jumped
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+def _compute_metrics(state) -> Optional[int]:
+    started = time.monotonic()
+    try:
+        node_ids, sources, targets = _load_graph_arrays()
+    except sqlite3.Error as e:
+        app_logger.error(f"Cannot compute graph metrics: failed to fetch graph data: {e}")
+        return None
+    n = len(node_ids)
+    in_degree = np.bincount(targets, minlength=n); out_degree = np.bincount(sources, minlength=n)
+    pagerank = _pagerank(n, sources, targets, out_degree)
+    labels = _weak_components(n, sources, targets)
+    component_size = np.bincount(labels, minlength=n)[labels]
+    rows = zip(
+        node_ids.tolist(), in_degree.tolist(), out_degree.tolist(), (in_degree + out_degree).tolist(),
+        pagerank.tolist(), node_ids[labels].tolist(), component_size.tolist()
+    )
+    with _write_transaction() as conn:
+        conn.execute("DELETE FROM node_metrics")
+        conn.executemany(
+            "INSERT INTO node_metrics (node_id, in_degree, out_degree, degree, pagerank, component, component_size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        row = conn.execute("SELECT metrics_version FROM metrics_state WHERE id = 1").fetchone()
+        metrics_version = (row[0] if row else 0) + 1
+        conn.execute(
+            "INSERT OR REPLACE INTO metrics_state (id, metrics_version, node_watermark, node_count, edge_watermark, edge_count, edge_updates, computed_at) "
+            "VALUES (1, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            (metrics_version, *state)
+        )
+    app_logger.info(
+        f"Computed graph metrics version {metrics_version} for {n} nodes and {len(sources)} edges "
+        f"({len(np.unique(labels))} components) in {time.monotonic() - started:.3f}s."
+    )
+    return metrics_version
+
+def ensure_metrics() -> Optional[int]:
+    """
+    Recomputes node_metrics if the graph changed since they were computed and returns the metrics
+    version, or None if analytics are unavailable (NumPy missing) or the computation failed.
+    """
+    if not ANALYTICS_AVAILABLE:
+        return None
+    with _metrics_lock:
+        # Metrics are global, so appends need a full recomputation as well
+        change = get_graph_change("metrics_state", "metrics_version", detect_appends=False)
+        if change is None:
+            return None
+        kind, stored, current, _ = change
+        if kind == GRAPH_UNCHANGED:
+            return stored[0]
+        return _compute_metrics(current)
+
+def get_node_metrics_version() -> Optional[int]:
+    """Version of the stored node_metrics (possibly stale), or None if they were never computed."""
+    result = execute_sql("SELECT metrics_version FROM metrics_state WHERE id = 1;", [])
+    if isinstance(result, str):
+        app_logger.error(f"Error fetching graph metrics version: {result}")
+        return None
+    return result[0][0] if result else None
+
+def get_node_metrics(node_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """Stored METRIC_FIELDS of the given nodes; nodes without computed metrics are left out."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return {}
+    result = execute_sql(
+        f"SELECT m.node_id, {', '.join('m.' + f for f in METRIC_FIELDS)} FROM json_each(?) AS j JOIN node_metrics m ON m.node_id = j.value;",
+        [json.dumps(node_ids)]
+    )
+    if isinstance(result, str):
+        app_logger.error(f"Error fetching node metrics: {result}")
+        return {}
+    return {row[0]: dict(zip(METRIC_FIELDS, row[1:])) for row in result}
+
+_metrics_job = BackgroundJob("linkbase-metrics", ensure_metrics)
+
+def start_metrics_scheduler(interval: float = METRICS_REFRESH_SECONDS) -> None:
+    """Starts a daemon thread that brings node_metrics up to date now and every interval seconds."""
+    if not ANALYTICS_AVAILABLE or interval <= 0:
+        return
+    _metrics_job.start(interval)
+    _metrics_job.request() # First run now rather than one interval after startup
+    app_logger.info(f"Graph metrics scheduler started (every {interval:g}s).")
+
+def request_metrics_refresh() -> None:
+    """Brings node_metrics up to date in the background as soon as possible; returns at once."""
+    if ANALYTICS_AVAILABLE:
+        _metrics_job.request()
+
+def stop_metrics_scheduler() -> None:
+    _metrics_job.stop()
@@ -0,0 +1,83 @@
+import sqlite3
+import sys
+from array import array
+from typing import Dict, Optional
+
+from linkbase.db_tools import streaming_connection, iter_rows
+from linkbase.logger_config import app_logger
+
+# Compact binary encoding of the full graph, decoded by graph_view.html straight into typed arrays.
+# Every integer is a little-endian uint32 and sections follow each other without padding:
+#
+#   magic               4 bytes, b"LBG1"
+#   node_count N, edge_count E, label_count L
+#   node_ids            [N]   database ids
+#   node_labels         [N]   index into the label table, NO_LABEL for none
+#   edge_ids            [E]   database ids
+#   edge_sources        [E]   index into the node arrays (not a database id)
+#   edge_targets        [E]   index into the node arrays
+#   edge_labels         [E]   index into the label table, NO_LABEL for none
+#   name_offsets        [N+1] node i's name is strings[name_offsets[i]:name_offsets[i+1]]
+#   label_offsets       [L+1] label j is strings[label_offsets[j]:label_offsets[j+1]]
+#   strings             UTF-8 bytes of all names, then all labels
+#
+# Node and edge labels share one label table, so each distinct label is sent once.
+BINARY_GRAPH_MAGIC = b"LBG1"
+BINARY_GRAPH_MEDIA_TYPE = "application/x-linkbase-graph"
+NO_LABEL = 0xFFFFFFFF
+
+_NODES_SQL = "SELECT id, name, label FROM nodes ORDER BY id;"
+_EDGES_SQL = "SELECT id, source_id, target_id, label FROM edges ORDER BY id;"
+
+def _uint32_array() -> array:
+    arr = array("I")
+    if arr.itemsize != 4:
+        arr = array("L")
+    return arr
+
+def encode_graph_binary() -> Optional[bytes]:
+    """Encodes every node and edge in the format described above; returns None on a database error."""
+    node_ids = _uint32_array(); node_labels = _uint32_array()
+    edge_ids = _uint32_array(); edge_sources = _uint32_array(); edge_targets = _uint32_array(); edge_labels = _uint32_array()
+    name_offsets = _uint32_array(); name_offsets.append(0)
+    names = bytearray()
+    label_codes: Dict[str, int] = {}
+    node_index: Dict[int, int] = {}
+
+    def label_code(label: Optional[str]) -> int:
+        if label is None:
+            return NO_LABEL
+        code = label_codes.get(label)
+        if code is None:
+            code = label_codes[label] = len(label_codes)
+        return code
+
+    try:
+        with streaming_connection() as conn: # One read transaction, so edges only reference nodes we sent
+            for node_id, name, label in iter_rows(conn, _NODES_SQL):
+                node_index[node_id] = len(node_ids)
+                node_ids.append(node_id); node_labels.append(label_code(label))
+                names += name.encode("utf-8"); name_offsets.append(len(names))
+            for edge_id, source_id, target_id, label in iter_rows(conn, _EDGES_SQL):
+                source = node_index.get(source_id); target = node_index.get(target_id)
+                if source is None or target is None:
+                    continue # Dangling edge
+                edge_ids.append(edge_id); edge_sources.append(source); edge_targets.append(target)
+                edge_labels.append(label_code(label))
+    except sqlite3.Error as e:
+        app_logger.error(f"Cannot encode binary graph: failed to fetch graph data: {e}")
+        return None
+
+    strings = names
+    label_offsets = _uint32_array(); label_offsets.append(len(strings))
+    for label in label_codes: # dicts keep insertion order, i.e. code order
+        strings += label.encode("utf-8"); label_offsets.append(len(strings))
+
+    header = _uint32_array(); header.extend((len(node_ids), len(edge_ids), len(label_codes)))
+    sections = (header, node_ids, node_labels, edge_ids, edge_sources, edge_targets, edge_labels, name_offsets, label_offsets)
+    if sys.byteorder == "big":
+        for section in sections:
+            section.byteswap()
+    payload = BINARY_GRAPH_MAGIC + b"".join(section.tobytes() for section in sections) + bytes(strings)
+    app_logger.info(f"Encoded binary graph with {len(node_ids)} nodes and {len(edge_ids)} edges ({len(payload)} bytes).")
+    return payload
@@ -0,0 +1,186 @@
+import json
+import threading
+from typing import List, Tuple, Dict, Optional, Iterable
+
+try:
+    import numpy as np
+except ImportError: # Layouts are optional; without NumPy the API simply serves no coordinates
+    np = None
+
+from linkbase.db_tools import execute_sql, _write_transaction, get_graph_change, GRAPH_UNCHANGED, GRAPH_CHANGED
+from linkbase.graph_tools import get_all_nodes_and_edges
+from linkbase.db_executor import BackgroundJob
+from linkbase.logger_config import app_logger
+
+# Server-side force-directed layout (Fruchterman-Reingold, vectorized with NumPy), computed once for
+# the whole graph and stored in node_positions so every view and client reuses the same coordinates.
+# Appended nodes are placed incrementally around their already-placed neighbours; deletions, edge
+# updates or large batches of new nodes trigger a full recomputation. Requests never compute a
+# layout themselves: they serve the stored positions and call request_layout_refresh(), which runs
+# ensure_layout() on a background thread.
+LAYOUT_AVAILABLE = np is not None
+_FULL_ITERATIONS = 80
+_INCREMENTAL_ITERATIONS = 40
+_EXACT_REPULSION_LIMIT = 2048 # Above this many nodes, repulsion is estimated from a random sample
+_REPULSION_SAMPLE = 256
+_ROW_BLOCK = 2048 # Rows per repulsion block, bounding the temporary (block x pivots) arrays
+_INCREMENTAL_MAX_RATIO = 0.2 # More new nodes than this fraction of the laid-out graph: recompute fully
+_INCREMENTAL_MIN_NODES = 100
+_SEED = 7
+
+_layout_lock = threading.Lock()
+
+def _force_layout(positions, sources, targets, movable, iterations: int, rng, k: Optional[float] = None):
+    """
+    Runs Fruchterman-Reingold iterations in place on positions (n x 2), moving only the rows where
+    movable is True. sources/targets are edge endpoint indexes into positions; k is the ideal edge
+    length, by default the one for n nodes in a unit area.
+    """
+    n = len(positions)
+    if n == 0:
+        return positions
+    if k is None:
+        k = 1.0 / np.sqrt(n)
+    rows = np.flatnonzero(movable)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        pivots = np.arange(n) if n <= _EXACT_REPULSION_LIMIT else rng.choice(n, _REPULSION_SAMPLE, replace=False)
+        scale = n / len(pivots) # Extrapolates the sampled repulsion to the full sum
+        pivot_x = positions[pivots, 0]; pivot_y = positions[pivots, 1]
+        force = np.zeros((len(rows), 2))
+        for start in range(0, len(rows), _ROW_BLOCK):
+            block = rows[start:start + _ROW_BLOCK]
+            dx = positions[block, 0][:, None] - pivot_x[None, :]
+            dy = positions[block, 1][:, None] - pivot_y[None, :]
+            weight = (k * k * scale) / (dx * dx + dy * dy + 1e-9)
+            force[start:start + _ROW_BLOCK, 0] = (dx * weight).sum(axis=1)
+            force[start:start + _ROW_BLOCK, 1] = (dy * weight).sum(axis=1)
+        if len(sources):
+            delta = positions[sources] - positions[targets]
+            dist = np.sqrt(np.einsum("ij,ij->i", delta, delta)) + 1e-9
+            pull = delta * (dist / k)[:, None]
+            attraction = np.zeros((n, 2))
+            np.subtract.at(attraction, sources, pull); np.add.at(attraction, targets, pull)
+            force += attraction[rows]
+        length = np.sqrt(np.einsum("ij,ij->i", force, force)) + 1e-9
+        positions[rows] += force * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+    return positions
+
+def _store_layout(positions: Dict[int, Tuple[float, float]], state: Tuple[int, int, int, int, int], replace_all: bool) -> int:
+    node_watermark, node_count, edge_watermark, edge_count, edge_updates = state
+    with _write_transaction() as conn:
+        if replace_all:
+            conn.execute("DELETE FROM node_positions")
+        conn.executemany("INSERT OR REPLACE INTO node_positions (node_id, x, y) VALUES (?, ?, ?)", [(node_id, x, y) for node_id, (x, y) in positions.items()])
+        row = conn.execute("SELECT layout_version FROM layout_state WHERE id = 1").fetchone()
+        layout_version = (row[0] if row else 0) + (1 if positions or replace_all else 0)
+        conn.execute(
+            "INSERT OR REPLACE INTO layout_state (id, layout_version, node_watermark, node_count, edge_watermark, edge_count, edge_updates, updated_at) "
+            "VALUES (1, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            (layout_version, node_watermark, node_count, edge_watermark, edge_count, edge_updates)
+        )
+    return layout_version
+
+def _compute_full_layout(edge_updates: int) -> Optional[int]:
+    nodes, edges = get_all_nodes_and_edges()
+    if nodes is None or edges is None:
+        app_logger.error("Cannot compute graph layout: failed to fetch graph data.")
+        return None
+    index = {node['id']: i for i, node in enumerate(nodes)}
+    pairs = [(index[e['source_id']], index[e['target_id']]) for e in edges if e['source_id'] in index and e['target_id'] in index]
+    sources = np.fromiter((s for s, _ in pairs), dtype=np.int64, count=len(pairs))
+    targets = np.fromiter((t for _, t in pairs), dtype=np.int64, count=len(pairs))
+    rng = np.random.default_rng(_SEED)
+    positions = _force_layout(rng.random((len(nodes), 2)), sources, targets, np.ones(len(nodes), dtype=bool), _FULL_ITERATIONS, rng)
+    if len(nodes):
+        positions -= positions.mean(axis=0)
+        positions /= max(np.abs(positions).max(), 1e-9) # Fit into [-1, 1]
+    state = (max(index, default=0), len(nodes), max((e['id'] for e in edges), default=0), len(edges), edge_updates)
+    layout_version = _store_layout({node['id']: (float(x), float(y)) for node, (x, y) in zip(nodes, positions)}, state, replace_all=True)
+    app_logger.info(f"Computed full graph layout version {layout_version} for {len(nodes)} nodes and {len(edges)} edges.")
+    return layout_version
+
+def _compute_incremental_layout(stored: Tuple, current: Tuple) -> Optional[int]:
+    """Places nodes appended since the stored layout around their neighbours, keeping all existing positions."""
+    _, node_watermark, _, edge_watermark, _, _ = stored
+    new_nodes = execute_sql("SELECT id FROM nodes WHERE id > CAST(? AS INTEGER) ORDER BY id;", [str(node_watermark)])
+    new_edges = execute_sql("SELECT source_id, target_id FROM edges WHERE id > CAST(? AS INTEGER);", [str(edge_watermark)])
+    if isinstance(new_nodes, str) or isinstance(new_edges, str):
+        app_logger.error(f"Cannot update graph layout: {new_nodes if isinstance(new_nodes, str) else new_edges}")
+        return None
+    new_ids = [row[0] for row in new_nodes]
+    if not new_ids: # Only edges between already-placed nodes were added
+        return _store_layout({}, current, replace_all=False)
+
+    new_id_set = set(new_ids)
+    anchor_ids = {node_id for edge in new_edges for node_id in edge if node_id not in new_id_set}
+    anchors = get_node_positions(anchor_ids)
+    local_ids = new_ids + list(anchors)
+    index = {node_id: i for i, node_id in enumerate(local_ids)}
+    pairs = [(index[s], index[t]) for s, t in new_edges if s in index and t in index]
+    sources = np.array([s for s, _ in pairs], dtype=np.int64); targets = np.array([t for _, t in pairs], dtype=np.int64)
+
+    rng = np.random.default_rng(_SEED + len(new_ids))
+    positions = np.zeros((len(local_ids), 2))
+    for i, node_id in enumerate(local_ids[len(new_ids):], start=len(new_ids)):
+        positions[i] = anchors[node_id]
+    # Start each new node at the centroid of its placed neighbours (or anywhere when it has none)
+    sums = np.zeros((len(local_ids), 2)); counts = np.zeros(len(local_ids))
+    for s, t in pairs:
+        for node, other in ((s, t), (t, s)):
+            if node < len(new_ids) and other >= len(new_ids):
+                sums[node] += positions[other]; counts[node] += 1
+    k = 2.0 / np.sqrt(max(current[1], 1)) # Ideal edge length of the whole graph, whose full layout is scaled to [-1, 1]
+    for i in range(len(new_ids)):
+        positions[i] = sums[i] / counts[i] if counts[i] else rng.uniform(-1.0, 1.0, 2)
+    positions[:len(new_ids)] += rng.normal(0.0, k, (len(new_ids), 2))
+
+    movable = np.zeros(len(local_ids), dtype=bool); movable[:len(new_ids)] = True
+    _force_layout(positions, sources, targets, movable, _INCREMENTAL_ITERATIONS, rng, k)
+    layout_version = _store_layout({node_id: (float(positions[i][0]), float(positions[i][1])) for i, node_id in enumerate(new_ids)}, current, replace_all=False)
+    app_logger.info(f"Placed {len(new_ids)} new nodes incrementally in graph layout version {layout_version}.")
+    return layout_version
+
+def ensure_layout() -> Optional[int]:
+    """
+    Brings node_positions up to date with the graph and returns the layout version, or None if
+    layouts are unavailable (NumPy missing) or the computation failed.
+    """
+    if not LAYOUT_AVAILABLE:
+        return None
+    with _layout_lock:
+        change = get_graph_change("layout_state", "layout_version")
+        if change is None:
+            return None
+        kind, stored, current, new_nodes = change
+        if kind == GRAPH_UNCHANGED:
+            return stored[0]
+        if kind == GRAPH_CHANGED or new_nodes > max(_INCREMENTAL_MIN_NODES, _INCREMENTAL_MAX_RATIO * stored[2]):
+            return _compute_full_layout(current[4])
+        return _compute_incremental_layout(stored, current)
+
+_layout_job = BackgroundJob("linkbase-layout", ensure_layout)
+
+def request_layout_refresh() -> None:
+    """Brings node_positions up to date in the background (a no-op check when nothing changed); returns at once."""
+    if LAYOUT_AVAILABLE:
+        _layout_job.request()
+
+def stop_layout_refresh() -> None:
+    _layout_job.stop()
+
+def get_node_positions(node_ids: Iterable[int]) -> Dict[int, Tuple[float, float]]:
+    """Stored (x, y) of the given nodes; nodes without a position are left out."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return {}
+    result = execute_sql(
+        "SELECT p.node_id, p.x, p.y FROM json_each(?) AS j JOIN node_positions p ON p.node_id = j.value;",
+        [json.dumps(node_ids)]
+    )
+    if isinstance(result, str):
+        app_logger.error(f"Error fetching node positions: {result}")
+        return {}
+    return {row[0]: (row[1], row[2]) for row in result}
@@ -0,0 +1,302 @@
+import os
+import threading
+import time
+from array import array
+from typing import List, Tuple, Dict, Any, Optional, Iterable
+from linkbase.db_tools import _get_connection, get_data_version, _normalize_text
+from linkbase.logger_config import app_logger
+
+# The snapshot is opt-in: set LINKBASE_GRAPH_SNAPSHOT=1 (or call enable_snapshot()) to serve
+# graph_tools reads from memory instead of SQLite.
+SNAPSHOT_ENABLED = os.environ.get("LINKBASE_GRAPH_SNAPSHOT", "").lower() in ("1", "true", "yes")
+# Edges appended since the last CSR build live in small per-node delta lists; once they exceed
+# this fraction of the CSR the arrays are rebuilt.
+_DELTA_COMPACTION_RATIO = 0.1
+_NO_LABEL = -1
+
+class _SnapshotState:
+    """
+    One immutable generation of the snapshot. Refreshes build a new state and swap it in, so
+    readers that grabbed a state keep a consistent view without locking.
+
+    Nodes and edges are stored by dense index in id order. Edge labels are integer codes into
+    label_names. Adjacency is CSR: the outgoing edge indexes of node i are
+    out_edges[out_offsets[i]:out_offsets[i + 1]] (likewise for incoming), plus any edges appended
+    after the CSR was built, which sit in the delta_out/delta_in lists.
+    """
+    __slots__ = (
+        "data_version", "node_ids", "node_names", "node_labels", "index_by_id", "index_by_name",
+        "edge_ids", "edge_src", "edge_dst", "edge_label", "label_names", "label_codes",
+        "out_offsets", "out_edges", "in_offsets", "in_edges", "csr_edge_count", "delta_out", "delta_in",
+        "skipped_edges", "edge_watermark", "node_updates", "edge_updates",
+    )
+
+    def __init__(self):
+        self.data_version: Optional[int] = None
+        self.node_ids = array("q"); self.node_names: List[str] = []; self.node_labels: List[Optional[str]] = []
+        self.index_by_id: Dict[int, int] = {}; self.index_by_name: Dict[str, int] = {}
+        self.edge_ids = array("q"); self.edge_src = array("l"); self.edge_dst = array("l"); self.edge_label = array("l")
+        self.label_names: List[Optional[str]] = []; self.label_codes: Dict[str, int] = {}
+        self.out_offsets = array("l", [0]); self.out_edges = array("l")
+        self.in_offsets = array("l", [0]); self.in_edges = array("l")
+        self.csr_edge_count = 0
+        self.delta_out: Dict[int, List[int]] = {}; self.delta_in: Dict[int, List[int]] = {}
+        self.skipped_edges = 0 # Edge rows whose source or target node does not exist
+        self.edge_watermark = 0 # Highest edge id read, including skipped rows
+        # change_counters values (bumped by UPDATE triggers) the state was loaded at.
+        self.node_updates: Optional[int] = None; self.edge_updates: Optional[int] = None
+
+    def copy(self) -> "_SnapshotState":
+        """Copies everything a refresh may append to (arrays are copied at C speed)."""
+        state = _SnapshotState()
+        state.data_version = self.data_version
+        state.node_ids = array("q", self.node_ids); state.node_names = list(self.node_names); state.node_labels = list(self.node_labels)
+        state.index_by_id = dict(self.index_by_id); state.index_by_name = dict(self.index_by_name)
+        state.edge_ids = array("q", self.edge_ids); state.edge_src = array("l", self.edge_src)
+        state.edge_dst = array("l", self.edge_dst); state.edge_label = array("l", self.edge_label)
+        state.label_names = list(self.label_names); state.label_codes = dict(self.label_codes)
+        # The CSR arrays are never mutated after a build, so they can be shared.
+        state.out_offsets = self.out_offsets; state.out_edges = self.out_edges
+        state.in_offsets = self.in_offsets; state.in_edges = self.in_edges
+        state.csr_edge_count = self.csr_edge_count
+        state.delta_out = {k: list(v) for k, v in self.delta_out.items()}
+        state.delta_in = {k: list(v) for k, v in self.delta_in.items()}
+        state.skipped_edges = self.skipped_edges; state.edge_watermark = self.edge_watermark
+        state.node_updates = self.node_updates; state.edge_updates = self.edge_updates
+        return state
+
+    def load_nodes(self, rows: Iterable[Tuple[int, str, str, Optional[str]]], whole_table: bool = False) -> None:
+        """
+        Appends nodes with new ids and overwrites name/label of known ones. Rows must be in id order.
+        With whole_table=True (rows cover every node) the name index is rebuilt from scratch.
+        """
+        if whole_table:
+            self.index_by_name = {}
+        for node_id, name, name_key, label in rows:
+            index = self.index_by_id.get(node_id)
+            if index is None:
+                index = len(self.node_ids)
+                self.node_ids.append(node_id); self.node_names.append(name); self.node_labels.append(label)
+                self.index_by_id[node_id] = index
+            else:
+                self.node_names[index] = name; self.node_labels[index] = label
+            self.index_by_name.setdefault(name_key, index) # Oldest node wins, as in get_node_by_name
+
+    def append_edges(self, rows: Iterable[Tuple[int, int, int, Optional[str]]]) -> None:
+        """Appends edges to the delta lists. Edges referencing unknown nodes are counted and skipped."""
+        for edge_id, source_id, target_id, label in rows:
+            self.edge_watermark = max(self.edge_watermark, edge_id)
+            source_index = self.index_by_id.get(source_id); target_index = self.index_by_id.get(target_id)
+            if source_index is None or target_index is None:
+                self.skipped_edges += 1
+                continue
+            if label is None:
+                code = _NO_LABEL
+            else:
+                code = self.label_codes.get(label)
+                if code is None:
+                    code = self.label_codes[label] = len(self.label_names); self.label_names.append(label)
+            edge_index = len(self.edge_ids)
+            self.edge_ids.append(edge_id); self.edge_src.append(source_index)
+            self.edge_dst.append(target_index); self.edge_label.append(code)
+            self.delta_out.setdefault(source_index, []).append(edge_index)
+            self.delta_in.setdefault(target_index, []).append(edge_index)
+
+    def build_csr(self) -> None:
+        """Rebuilds both CSR adjacencies from all edges with a counting sort and clears the deltas."""
+        node_count = len(self.node_ids); edge_count = len(self.edge_ids)
+        for endpoints, attr in ((self.edge_src, "out"), (self.edge_dst, "in")):
+            counts = array("l", bytes(array("l").itemsize * (node_count + 1)))
+            for node_index in endpoints:
+                counts[node_index + 1] += 1
+            for i in range(node_count):
+                counts[i + 1] += counts[i]
+            offsets = array("l", counts)
+            cursor = array("l", counts)
+            slots = array("l", bytes(array("l").itemsize * edge_count))
+            for edge_index, node_index in enumerate(endpoints):
+                slots[cursor[node_index]] = edge_index; cursor[node_index] += 1
+            setattr(self, f"{attr}_offsets", offsets); setattr(self, f"{attr}_edges", slots)
+        self.csr_edge_count = edge_count
+        self.delta_out = {}; self.delta_in = {}
+
+    def edges_of(self, node_index: int, direction: str) -> List[int]:
+        """Edge indexes leaving (direction="out") or entering (direction="in") a node."""
+        offsets, slots, delta = (self.out_offsets, self.out_edges, self.delta_out) if direction == "out" else (self.in_offsets, self.in_edges, self.delta_in)
+        result: List[int] = []
+        if node_index + 1 < len(offsets):
+            result.extend(slots[offsets[node_index]:offsets[node_index + 1]])
+        extra = delta.get(node_index)
+        if extra:
+            result.extend(extra)
+        return result
+
+    def node_dict(self, node_index: int) -> Dict[str, Any]:
+        return {"id": self.node_ids[node_index], "name": self.node_names[node_index], "label": self.node_labels[node_index]}
+
+    def edge_dict(self, edge_index: int) -> Dict[str, Any]:
+        code = self.edge_label[edge_index]
+        return {
+            "id": self.edge_ids[edge_index],
+            "source_id": self.node_ids[self.edge_src[edge_index]],
+            "target_id": self.node_ids[self.edge_dst[edge_index]],
+            "label": self.label_names[code] if code != _NO_LABEL else None,
+        }
+
+class GraphSnapshot:
+    """
+    In-process, array-backed copy of the nodes and edges tables serving neighborhood, path and
+    full-graph reads without touching SQLite. Every read calls refresh(), which costs one
+    PRAGMA data_version check when nothing changed and otherwise loads only rows past the
+    id watermarks. In-place updates are detected through the change_counters table: updated
+    nodes trigger a reload of node rows only, updated edges a full rebuild.
+    """
+
+    def __init__(self):
+        self._state = _SnapshotState()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, full: bool = False) -> _SnapshotState:
+        """Brings the snapshot up to date with the database and returns the current state."""
+        version = get_data_version()
+        state = self._state
+        if not full and state.data_version == version:
+            return state
+        with self._refresh_lock:
+            state = self._state
+            if not full and state.data_version == version:
+                return state # Another thread refreshed while we waited
+            conn = _get_connection()
+            conn.execute("BEGIN") # One read transaction, so counts and rows come from the same database state
+            try:
+                counters = dict(conn.execute("SELECT name, value FROM change_counters"))
+                if full or state.data_version is None or counters.get("edge_updates") != state.edge_updates:
+                    new_state = self._load_full(conn)
+                else:
+                    new_state = self._load_incremental(conn, state, reload_nodes=counters.get("node_updates") != state.node_updates)
+                    # Counts that disagree after loading the appended rows mean rows were deleted.
+                    node_count, = conn.execute("SELECT COUNT(*) FROM nodes").fetchone()
+                    edge_count, = conn.execute("SELECT COUNT(*) FROM edges").fetchone()
+                    if len(new_state.node_ids) != node_count or len(new_state.edge_ids) + new_state.skipped_edges != edge_count:
+                        new_state = self._load_full(conn)
+            finally:
+                conn.commit()
+            new_state.node_updates = counters.get("node_updates"); new_state.edge_updates = counters.get("edge_updates")
+            new_state.data_version = version
+            self._state = new_state
+            return new_state
+
+    def _load_full(self, conn) -> _SnapshotState:
+        started = time.monotonic()
+        state = _SnapshotState()
+        state.load_nodes(conn.execute("SELECT id, name, name_key, label FROM nodes ORDER BY id"))
+        state.append_edges(conn.execute("SELECT id, source_id, target_id, label FROM edges ORDER BY id"))
+        state.build_csr()
+        app_logger.info(
+            f"Graph snapshot rebuilt: {len(state.node_ids)} nodes, {len(state.edge_ids)} edges, "
+            f"{len(state.label_names)} edge labels in {time.monotonic() - started:.3f}s"
+            + (f" ({state.skipped_edges} edges with missing endpoints skipped)." if state.skipped_edges else ".")
+        )
+        return state
+
+    def _load_incremental(self, conn, state: _SnapshotState, reload_nodes: bool) -> _SnapshotState:
+        new_state = state.copy()
+        node_count_before = len(new_state.node_ids); edge_count_before = len(new_state.edge_ids)
+        if reload_nodes:
+            # Some node row was updated in place (usually a label): re-read names and labels, keeping edges.
+            new_state.load_nodes(conn.execute("SELECT id, name, name_key, label FROM nodes ORDER BY id"), whole_table=True)
+        else:
+            node_watermark = state.node_ids[-1] if state.node_ids else 0
+            new_state.load_nodes(conn.execute("SELECT id, name, name_key, label FROM nodes WHERE id > ? ORDER BY id", [node_watermark]))
+        new_state.append_edges(conn.execute("SELECT id, source_id, target_id, label FROM edges WHERE id > ? ORDER BY id", [state.edge_watermark]))
+        delta_edges = len(new_state.edge_ids) - new_state.csr_edge_count
+        if delta_edges > max(1, int(new_state.csr_edge_count * _DELTA_COMPACTION_RATIO)):
+            new_state.build_csr()
+        app_logger.debug(
+            "Graph snapshot refreshed incrementally: +%d nodes, +%d edges%s.",
+            len(new_state.node_ids) - node_count_before, len(new_state.edge_ids) - edge_count_before,
+            ", node rows reloaded" if reload_nodes else ""
+        )
+        return new_state
+
+    # --- Queries. Each returns the same shapes as the SQL-backed graph_tools functions. ---
+
+    def get_node_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        state = self.refresh()
+        normalized_name = _normalize_text(name)
+        node_index = state.index_by_name.get(normalized_name) if normalized_name else None
+        return state.node_dict(node_index) if node_index is not None else None
+
+    def get_nodes_by_ids(self, node_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        state = self.refresh()
+        return [state.node_dict(state.index_by_id[node_id]) for node_id in node_ids if node_id in state.index_by_id]
+
+    def get_all_nodes_and_edges(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        state = self.refresh()
+        return [state.node_dict(i) for i in range(len(state.node_ids))], [state.edge_dict(i) for i in range(len(state.edge_ids))]
+
+    def get_node_centric_data(self, center_node_name: str, depth: int = 1) -> Tuple[Optional[Dict[str, Any]], Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]:
+        """Undirected BFS to `depth`: every edge touching a node closer than `depth`, plus its endpoints."""
+        state = self.refresh()
+        normalized_name = _normalize_text(center_node_name)
+        center_index = state.index_by_name.get(normalized_name) if normalized_name else None
+        if center_index is None:
+            return None, None, None
+        visited = bytearray(len(state.node_ids)); visited[center_index] = 1
+        frontier = [center_index]
+        edge_indexes = set(); node_indexes = {center_index}
+        for _ in range(max(depth, 0)):
+            next_frontier = []
+            for node_index in frontier:
+                for edge_index in state.edges_of(node_index, "out"):
+                    edge_indexes.add(edge_index)
+                    neighbor = state.edge_dst[edge_index]
+                    if not visited[neighbor]:
+                        visited[neighbor] = 1; next_frontier.append(neighbor)
+                for edge_index in state.edges_of(node_index, "in"):
+                    edge_indexes.add(edge_index)
+                    neighbor = state.edge_src[edge_index]
+                    if not visited[neighbor]:
+                        visited[neighbor] = 1; next_frontier.append(neighbor)
+            frontier = next_frontier
+        for edge_index in edge_indexes:
+            node_indexes.add(state.edge_src[edge_index]); node_indexes.add(state.edge_dst[edge_index])
+        return state.node_dict(center_index), [state.edge_dict(e) for e in edge_indexes], [state.node_dict(n) for n in node_indexes]
+
+    def expand(self, node_ids, direction: str) -> Dict[int, List[Dict[str, Any]]]:
+        """Frontier adjacency loader with the same contract as graph_tools._load_adjacency, for find_paths."""
+        state = self.refresh()
+        adjacency: Dict[int, List[Dict[str, Any]]] = {}
+        for node_id in node_ids:
+            node_index = state.index_by_id.get(node_id)
+            if node_index is None:
+                continue
+            edge_indexes = state.edges_of(node_index, direction)
+            if edge_indexes:
+                adjacency[node_id] = [state.edge_dict(e) for e in edge_indexes]
+        return adjacency
+
+_snapshot: Optional[GraphSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+def enable_snapshot(enabled: bool = True) -> None:
+    """Turns the in-memory read path on or off at runtime (dropping the loaded arrays when off)."""
+    global SNAPSHOT_ENABLED, _snapshot
+    SNAPSHOT_ENABLED = enabled
+    if not enabled:
+        with _snapshot_lock:
+            _snapshot = None
+    app_logger.info(f"In-memory graph snapshot {'enabled' if enabled else 'disabled'}.")
+
+def get_snapshot() -> Optional[GraphSnapshot]:
+    """Returns the process-wide snapshot when enabled, creating it on first use; None when disabled."""
+    global _snapshot
+    if not SNAPSHOT_ENABLED:
+        return None
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = GraphSnapshot()
+            snapshot = _snapshot
+    return snapshot
@@ -1,8 +1,20 @@
-from typing import List, Tuple, Dict, Any, Optional
-from linkbase.db_tools import execute_sql, get_node_by_name, _normalize_text
+import heapq
+import json
+import sqlite3
+import time
+from collections import deque
+from typing import List, Tuple, Dict, Any, Optional, Iterable, Iterator
+from linkbase.db_tools import execute_sql, get_node_by_name, _normalize_text, streaming_connection, iter_rows
 from linkbase.logger_config import app_logger
+from linkbase.graph_snapshot import get_snapshot
+from linkbase.db_executor import is_task_cancelled
+from linkbase.graph_analytics import METRIC_FIELDS
+from linkbase import instrumentation
 
 def get_all_nodes_and_edges() -> Tuple[Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]:
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_all_nodes_and_edges()
     nodes_data = []
     edges_data = []
     sql_nodes = "SELECT id, name, label FROM nodes;"
@@ -23,99 +35,237 @@ def get_all_nodes_and_edges() -> Tuple[Optional[List[Dict[str, Any]]], Optional[
         return nodes_data, None
     return nodes_data, edges_data
 
+# JSON layouts for serialized graph data: a list of row objects, or one object of parallel column arrays.
+GRAPH_LAYOUT_ROWS = "rows"
+GRAPH_LAYOUT_COLUMNS = "columns"
+GRAPH_LAYOUTS = (GRAPH_LAYOUT_ROWS, GRAPH_LAYOUT_COLUMNS)
+NODE_FIELDS = ("id", "name", "label")
+NODE_POSITION_FIELDS = NODE_FIELDS + ("x", "y") # With coordinates from graph_layout (null if not laid out)
+EDGE_FIELDS = ("id", "source_id", "target_id", "label")
+# Metrics from graph_analytics that ranked views can be sorted by, largest first
+METRIC_SORT_KEYS = ("pagerank", "degree", "in_degree", "out_degree", "component_size")
+
+def node_fields(with_positions: bool = False, with_metrics: bool = False) -> Tuple[str, ...]:
+    """Node fields of serialized graph data with optional layout coordinates and METRIC_FIELDS (null if not computed)."""
+    return (NODE_POSITION_FIELDS if with_positions else NODE_FIELDS) + (METRIC_FIELDS if with_metrics else ())
+
+def _node_page_sql(with_positions: bool, with_metrics: bool) -> str:
+    columns = ["n.id AS id", "n.name AS name", "n.label AS label"]
+    joins = []
+    if with_positions:
+        columns += ["p.x AS x", "p.y AS y"]; joins.append("LEFT JOIN node_positions p ON p.node_id = n.id")
+    if with_metrics:
+        columns += [f"m.{f} AS {f}" for f in METRIC_FIELDS]; joins.append("LEFT JOIN node_metrics m ON m.node_id = n.id")
+    return f"SELECT {', '.join(columns)} FROM nodes n {' '.join(joins)} WHERE n.id > CAST(? AS INTEGER) ORDER BY n.id LIMIT CAST(? AS INTEGER)"
+
+# Keyset pagination: "id > last_id ORDER BY id" walks the primary key index, so every page costs the same.
+_JSON_PAGE_SOURCES = {
+    **{
+        ("nodes", with_positions, with_metrics): (_node_page_sql(with_positions, with_metrics), node_fields(with_positions, with_metrics))
+        for with_positions in (False, True) for with_metrics in (False, True)
+    },
+    "edges": ("SELECT id, source_id, target_id, label FROM edges WHERE id > CAST(? AS INTEGER) ORDER BY id LIMIT CAST(? AS INTEGER)", EDGE_FIELDS),
+}
+
+def _json_page_sql(page_sql: str, fields: Tuple[str, ...], layout: str) -> str:
+    if layout == GRAPH_LAYOUT_COLUMNS:
+        aggregate = "json_object(" + ", ".join(f"'{f}', json_group_array({f})" for f in fields) + ")"
+    else:
+        aggregate = "json_group_array(json_object(" + ", ".join(f"'{f}', {f}" for f in fields) + "))"
+    return f"SELECT {aggregate}, count(*), max(id) FROM ({page_sql});"
+
+_JSON_PAGE_SQL = {(source, layout): _json_page_sql(page_sql, fields, layout) for source, (page_sql, fields) in _JSON_PAGE_SOURCES.items() for layout in GRAPH_LAYOUTS}
+
+def _get_json_page(source, after_id: int, limit: int, layout: str) -> Optional[Tuple[str, int, Optional[int]]]:
+    # SQLite encodes the rows itself, so no per-row Python objects are created at all.
+    result = execute_sql(_JSON_PAGE_SQL[(source, layout)], [str(after_id), str(limit)])
+    if isinstance(result, str):
+        app_logger.error(f"Error fetching {source} as JSON after id {after_id}: {result}")
+        return None
+    return result[0]
+
+def get_nodes_json(
+    after_id: int = 0, limit: int = -1, layout: str = GRAPH_LAYOUT_ROWS, with_positions: bool = False, with_metrics: bool = False
+) -> Optional[Tuple[str, int, Optional[int]]]:
+    """
+    Nodes with id > after_id (at most limit; -1 means all) as JSON text, plus the row count and last id.
+    with_positions adds the stored layout coordinates and with_metrics the stored metrics (see node_fields).
+    """
+    return _get_json_page(("nodes", with_positions, with_metrics), after_id, limit, layout)
+
+def get_edges_json(after_id: int = 0, limit: int = -1, layout: str = GRAPH_LAYOUT_ROWS) -> Optional[Tuple[str, int, Optional[int]]]:
+    """Edge counterpart of get_nodes_json."""
+    return _get_json_page("edges", after_id, limit, layout)
+
+def rows_to_json(rows: List[Dict[str, Any]], fields: Tuple[str, ...], layout: str = GRAPH_LAYOUT_ROWS) -> str:
+    """Encodes already-fetched row dicts in the given layout, matching get_nodes_json/get_edges_json output."""
+    if layout == GRAPH_LAYOUT_COLUMNS:
+        return json.dumps({f: [row.get(f) for row in rows] for f in fields}, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps([{f: row.get(f) for f in fields} for row in rows], ensure_ascii=False, separators=(",", ":"))
+
+def get_ranked_subgraph(sort_by: str = "pagerank", top_nodes: int = 100, component: Optional[int] = None) -> Tuple[Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]:
+    """
+    The top_nodes nodes with the highest sort_by metric (one of METRIC_SORT_KEYS), optionally only
+    from one weakly connected component, with their metrics and the edges among them.
+    Nodes without computed metrics are never included. Returns (None, None) on a database error.
+    """
+    if sort_by not in METRIC_SORT_KEYS:
+        raise ValueError(f"sort_by must be one of {', '.join(METRIC_SORT_KEYS)}.")
+    where = "WHERE m.component = CAST(? AS INTEGER) " if component is not None else ""
+    nodes_result = execute_sql(
+        f"SELECT n.id, n.name, n.label, {', '.join('m.' + f for f in METRIC_FIELDS)} FROM node_metrics m JOIN nodes n ON n.id = m.node_id "
+        f"{where}ORDER BY m.{sort_by} DESC, n.id LIMIT CAST(? AS INTEGER);",
+        ([str(component)] if component is not None else []) + [str(top_nodes)]
+    )
+    if isinstance(nodes_result, str):
+        app_logger.error(f"Error fetching top nodes by {sort_by}: {nodes_result}")
+        return None, None
+    nodes = [dict(zip(NODE_FIELDS + METRIC_FIELDS, row)) for row in nodes_result]
+    edges_result = execute_sql(
+        "SELECT e.id, e.source_id, e.target_id, e.label FROM edges e "
+        "WHERE e.source_id IN (SELECT value FROM json_each(?1)) AND e.target_id IN (SELECT value FROM json_each(?1)) ORDER BY e.id;",
+        [json.dumps([node["id"] for node in nodes])]
+    )
+    if isinstance(edges_result, str):
+        app_logger.error(f"Error fetching edges among top nodes: {edges_result}")
+        return None, None
+    return nodes, [dict(zip(EDGE_FIELDS, row)) for row in edges_result]
+
+EXPORT_CHUNK_SIZE = 64 * 1024 # Approximate characters per chunk yielded by the streaming exporters
+_EXPORT_NODES_SQL = "SELECT id, name, label FROM nodes ORDER BY id;"
+_EXPORT_EDGES_SQL = "SELECT id, source_id, target_id, label FROM edges ORDER BY id;"
+
+def _dot_lines(node_rows: Iterable[Tuple], edge_rows: Iterable[Tuple]) -> Iterator[str]:
+    yield "digraph KnowledgeGraph {"
+    yield "  rankdir=LR; // Left to Right layout"
+    for node_id, name, label in node_rows:
+        node_label_text = name # DOT still uses name + label
+        if label:
+            node_label_text += f"\\n({label})"
+        yield f'  n{node_id} [label="{node_label_text}"];'
+    for _, source_id, target_id, label in edge_rows:
+        yield f'  n{source_id} -> n{target_id} [label="{label or ""}"];'
+    yield "}"
+
+def _mermaid_lines(node_rows: Iterable[Tuple], edge_rows: Iterable[Tuple]) -> Iterator[str]:
+    yield "graph TD;"
+    for node_id, name, label in node_rows:
+        node_display_text = label if label else name # Prioritize label
+        yield f'  N{node_id}["{node_display_text}"];'
+    for _, source_id, target_id, label in edge_rows:
+        if label:
+            yield f'  N{source_id} --"{label}"--> N{target_id};'
+        else:
+            yield f'  N{source_id} --> N{target_id};'
+
+def _chunk_lines(lines: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """Joins lines with real newlines into chunks of roughly chunk_size characters."""
+    buffer: List[str] = []; buffered = 0
+    for line in lines:
+        buffer.append(line); buffered += len(line) + 1
+        if buffered >= chunk_size:
+            buffer.append(""); yield "\n".join(buffer)
+            buffer = []; buffered = 0
+    if buffer:
+        buffer.append(""); yield "\n".join(buffer)
+
+def iter_dot_graph(chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Streams the full graph as DOT text chunks, reading rows straight from a database cursor so that
+    neither the rows nor the output are ever held in memory as a whole.
+    """
+    with streaming_connection() as conn:
+        yield from _chunk_lines(_dot_lines(iter_rows(conn, _EXPORT_NODES_SQL), iter_rows(conn, _EXPORT_EDGES_SQL)), chunk_size)
+    app_logger.info("DOT graph export streamed successfully.")
+
+def iter_mermaid_graph(chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """Streaming counterpart of generate_mermaid_graph; see iter_dot_graph."""
+    with streaming_connection() as conn:
+        yield from _chunk_lines(_mermaid_lines(iter_rows(conn, _EXPORT_NODES_SQL), iter_rows(conn, _EXPORT_EDGES_SQL)), chunk_size)
+    app_logger.info("Mermaid graph export streamed successfully.")
+
 def generate_dot_graph() -> Optional[str]:
-    nodes, edges = get_all_nodes_and_edges()
-    if nodes is None:
-        app_logger.error("Cannot generate DOT graph: failed to fetch nodes.")
+    try:
+        with streaming_connection() as conn:
+            dot_graph = "\\n".join(_dot_lines(iter_rows(conn, _EXPORT_NODES_SQL), iter_rows(conn, _EXPORT_EDGES_SQL)))
+    except sqlite3.Error as e:
+        app_logger.error(f"Cannot generate DOT graph: failed to fetch graph data: {e}")
         return None
-    dot_lines = ["digraph KnowledgeGraph {", "  rankdir=LR; // Left to Right layout"]
-    for node in nodes:
-        node_id_str = f"n{node['id']}"
-        node_label_text = node['name'] # DOT still uses name + label
-        if node.get('label'):
-            node_label_text += f"\\n({node['label']})" 
-        dot_lines.append(f'  {node_id_str} [label="{node_label_text}"];')
-    if edges: 
-        for edge in edges:
-            source_node_id_str = f"n{edge['source_id']}"
-            target_node_id_str = f"n{edge['target_id']}"
-            edge_label = edge.get('label', '')
-            dot_lines.append(f'  {source_node_id_str} -> {target_node_id_str} [label="{edge_label}"];')
-    dot_lines.append("}")
     app_logger.info("DOT graph string generated successfully.")
-    return "\\n".join(dot_lines)
+    return dot_graph
 
 def generate_mermaid_graph() -> Optional[str]:
-    nodes, edges = get_all_nodes_and_edges()
-    if nodes is None:
-        app_logger.error("Cannot generate Mermaid graph: failed to fetch nodes.")
+    try:
+        with streaming_connection() as conn:
+            mermaid_graph = "\\n".join(_mermaid_lines(iter_rows(conn, _EXPORT_NODES_SQL), iter_rows(conn, _EXPORT_EDGES_SQL)))
+    except sqlite3.Error as e:
+        app_logger.error(f"Cannot generate Mermaid graph: failed to fetch graph data: {e}")
         return None
-    mermaid_lines = ["graph TD;"] 
-    for node in nodes:
-        node_mermaid_id = f"N{node['id']}"
-        node_display_text = node.get('label') if node.get('label') else node['name'] # Prioritize label
-        mermaid_lines.append(f'  {node_mermaid_id}["{node_display_text}"];')
-    if edges: 
-        for edge in edges:
-            source_mermaid_id = f"N{edge['source_id']}"
-            target_mermaid_id = f"N{edge['target_id']}"
-            edge_label = edge.get('label', '')
-            if edge_label:
-                mermaid_lines.append(f'  {source_mermaid_id} --"{edge_label}"--> {target_mermaid_id};')
-            else:
-                mermaid_lines.append(f'  {source_mermaid_id} --> {target_mermaid_id};')
     app_logger.info("Mermaid graph string generated successfully.")
-    return "\\n".join(mermaid_lines)
+    return mermaid_graph
+
+# Undirected breadth-first expansion around a node in a single statement. reach holds (node, depth)
+# pairs; UNION (not UNION ALL) drops repeated pairs, so each node is expanded at most once per depth.
+# Only nodes closer than the requested depth are expanded, so reach stops at depth - 1, and the result
+# is every edge touching an expanded node, exactly as the former per-node BFS collected them.
+# Parameters arrive as strings (see execute_sql), hence the CASTs: an integer compared with a
+# text value is always "less than" it and would make the recursion unbounded.
+_NEIGHBORHOOD_EDGES_SQL = """
+WITH RECURSIVE reach(node_id, depth) AS (
+    SELECT CAST(?1 AS INTEGER), 0
+    UNION
+    SELECT e.target_id, r.depth + 1 FROM reach r JOIN edges e ON e.source_id = r.node_id WHERE r.depth < CAST(?2 AS INTEGER)
+    UNION
+    SELECT e.source_id, r.depth + 1 FROM reach r JOIN edges e ON e.target_id = r.node_id WHERE r.depth < CAST(?2 AS INTEGER)
+),
+expanded(node_id) AS (SELECT DISTINCT node_id FROM reach)
+SELECT id, source_id, target_id, label FROM edges WHERE source_id IN expanded
+UNION
+SELECT id, source_id, target_id, label FROM edges WHERE target_id IN expanded;
+"""
+
+def _fetch_nodes_by_ids(node_ids) -> Optional[List[Dict[str, Any]]]:
+    """Fetches id/name/label for the given node IDs in one query, or None on error."""
+    sql_nodes = "SELECT id, name, label FROM nodes WHERE id IN (SELECT value FROM json_each(?));"
+    nodes_result = execute_sql(sql_nodes, [json.dumps(list(node_ids))])
+    if isinstance(nodes_result, str):
+        app_logger.error(f"Error fetching node details: {nodes_result}")
+        return None
+    return [{"id": row[0], "name": row[1], "label": row[2]} for row in nodes_result]
 
 def get_node_centric_data(center_node_name: str, depth: int = 1) -> Tuple[Optional[Dict[str, Any]], Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]:
     normalized_center_name = _normalize_text(center_node_name)
     if not normalized_center_name:
         app_logger.error("Center node name cannot be empty for node-centric graph.")
         return None, None, None
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        center_node, final_edges, final_nodes = snapshot.get_node_centric_data(normalized_center_name, depth)
+        if not center_node:
+            app_logger.warning(f"Center node '{normalized_center_name}' not found.")
+        else:
+            instrumentation.record_traversal("neighborhood", len(final_nodes or ()), len(final_edges or ()))
+        return center_node, final_edges, final_nodes
     center_node = get_node_by_name(normalized_center_name) 
     if not center_node:
         app_logger.warning(f"Center node '{normalized_center_name}' not found.")
         return None, None, None
     center_node_id = center_node['id']
-    app_logger.info(f"Fetching data for graph centered on node ID {center_node_id} ('{normalized_center_name}') up to depth {depth}.")
-    collected_nodes_map: Dict[int, Dict[str, Any]] = {center_node_id: center_node}
-    collected_edges_map: Dict[int, Dict[str, Any]] = {}
-    queue: List[Tuple[int, int]] = [(center_node_id, 0)]
-    visited_nodes_for_bfs = {center_node_id} 
-    head = 0
-    while head < len(queue):
-        current_bfs_node_id, current_depth = queue[head]; head += 1
-        if current_depth >= depth: continue
-        sql_out_edges = "SELECT id, source_id, target_id, label FROM edges WHERE source_id = ?;"
-        out_edges_res = execute_sql(sql_out_edges, [str(current_bfs_node_id)])
-        if isinstance(out_edges_res, list):
-            for row in out_edges_res:
-                edge = {"id": row[0], "source_id": row[1], "target_id": row[2], "label": row[3]}
-                if edge['id'] not in collected_edges_map: collected_edges_map[edge['id']] = edge
-                collected_nodes_map.setdefault(edge['target_id'], {}) 
-                if edge['target_id'] not in visited_nodes_for_bfs:
-                    visited_nodes_for_bfs.add(edge['target_id']); queue.append((edge['target_id'], current_depth + 1))
-        sql_in_edges = "SELECT id, source_id, target_id, label FROM edges WHERE target_id = ?;"
-        in_edges_res = execute_sql(sql_in_edges, [str(current_bfs_node_id)])
-        if isinstance(in_edges_res, list):
-            for row in in_edges_res:
-                edge = {"id": row[0], "source_id": row[1], "target_id": row[2], "label": row[3]}
-                if edge['id'] not in collected_edges_map: collected_edges_map[edge['id']] = edge
-                collected_nodes_map.setdefault(edge['source_id'], {}) 
-                if edge['source_id'] not in visited_nodes_for_bfs:
-                    visited_nodes_for_bfs.add(edge['source_id']); queue.append((edge['source_id'], current_depth + 1))
-    if collected_nodes_map:
-        node_ids_to_fetch = [nid for nid in collected_nodes_map.keys() if not collected_nodes_map[nid] or nid == center_node_id]
-        node_ids_to_fetch = list(set(node_ids_to_fetch))
-        if node_ids_to_fetch:
-            placeholders = ', '.join(['?'] * len(node_ids_to_fetch))
-            sql_nodes_details = f"SELECT id, name, label FROM nodes WHERE id IN ({placeholders});"
-            nodes_details_res = execute_sql(sql_nodes_details, [str(nid) for nid in node_ids_to_fetch])
-            if isinstance(nodes_details_res, list):
-                for row in nodes_details_res: collected_nodes_map[row[0]] = {"id": row[0], "name": row[1], "label": row[2]}
-            else: app_logger.error(f"Error fetching details for collected nodes: {nodes_details_res}")
-    final_edges = list(collected_edges_map.values())
-    final_nodes = [node_data for node_data in collected_nodes_map.values() if node_data.get('name')]
+    app_logger.info("Fetching data for graph centered on node ID %s ('%s') up to depth %s.", center_node_id, normalized_center_name, depth)
+    final_edges: List[Dict[str, Any]] = []
+    if depth > 0:
+        max_expanded_depth = depth - 1
+        edges_res = execute_sql(_NEIGHBORHOOD_EDGES_SQL, [str(center_node_id), str(max_expanded_depth)])
+        if isinstance(edges_res, list):
+            final_edges = [{"id": row[0], "source_id": row[1], "target_id": row[2], "label": row[3]} for row in edges_res]
+        else: app_logger.error(f"Error expanding neighborhood of node {center_node_id}: {edges_res}")
+    node_ids_to_fetch = {center_node_id}
+    for edge in final_edges:
+        node_ids_to_fetch.add(edge['source_id']); node_ids_to_fetch.add(edge['target_id'])
+    final_nodes = _fetch_nodes_by_ids(node_ids_to_fetch)
+    if final_nodes is None:
+        final_nodes = [center_node]
+    instrumentation.record_traversal("neighborhood", len(final_nodes), len(final_edges))
     return center_node, final_edges, final_nodes
 
 def generate_node_centric_dot_graph(center_node_name: str, depth: int = 1) -> Optional[str]:
@@ -168,62 +318,175 @@ def generate_node_centric_mermaid_graph(center_node_name: str, depth: int = 1) -
     app_logger.info(f"Node-centric Mermaid graph for '{center_node_name}' (depth {depth}) generated successfully.")
     return "\\n".join(mermaid_lines)
 
-def _find_all_paths_bfs(start_node_id: int, end_node_id: int, max_depth: int = 5) -> List[List[Dict[str, Any]]]:
-    app_logger.info(f"Finding paths from node {start_node_id} to {end_node_id} (max_depth={max_depth}).")
-    paths = []
-    queue: List[Tuple[int, List[Dict[str, Any]], set[int]]] = [(start_node_id, [], {start_node_id})]
-    while queue:
-        current_node_id, path_edges, visited_in_path = queue.pop(0)
-        if len(path_edges) >= max_depth: continue
-        sql_outgoing_edges = "SELECT id, source_id, target_id, label FROM edges WHERE source_id = ?;"
-        edges_result = execute_sql(sql_outgoing_edges, [str(current_node_id)])
-        if isinstance(edges_result, list):
-            for row in edges_result:
-                edge = {"id": row[0], "source_id": row[1], "target_id": row[2], "label": row[3]}
-                neighbor_node_id = edge["target_id"]
-                if neighbor_node_id == end_node_id:
-                    paths.append(path_edges + [edge])
-                elif neighbor_node_id not in visited_in_path:
-                    new_visited = visited_in_path.copy(); new_visited.add(neighbor_node_id)
-                    queue.append((neighbor_node_id, path_edges + [edge], new_visited))
-        elif isinstance(edges_result, str): app_logger.error(f"Error fetching edges for node {current_node_id} during pathfinding: {edges_result}")
-    app_logger.info(f"Found {len(paths)} paths from {start_node_id} to {end_node_id}.")
+PATH_MODE_SHORTEST = "shortest" # Only paths of minimum length
+PATH_MODE_K_SHORTEST = "k_shortest" # Simple paths in order of increasing length, up to max_depth
+PATH_MODES = (PATH_MODE_SHORTEST, PATH_MODE_K_SHORTEST)
+DEFAULT_MAX_PATHS = 25 # Hard cap on the number of paths returned
+DEFAULT_PATH_TIME_BUDGET_SECONDS = 5.0 # Search stops early and returns what it found so far
+_DEADLINE_CHECK_INTERVAL = 256 # Enumeration steps between clock reads
+
+def _load_adjacency(node_ids, direction: str) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Loads the outgoing (direction="out") or incoming (direction="in") edges of a whole frontier of
+    nodes in one query. Returns node id -> edges; nodes without edges in that direction are absent.
+    """
+    column = "source_id" if direction == "out" else "target_id"
+    sql = f"SELECT id, source_id, target_id, label FROM edges WHERE {column} IN (SELECT value FROM json_each(?));"
+    edges_result = execute_sql(sql, [json.dumps(list(node_ids))])
+    adjacency: Dict[int, List[Dict[str, Any]]] = {}
+    if isinstance(edges_result, str):
+        app_logger.error(f"Error loading '{direction}' adjacency for {len(node_ids)} nodes during pathfinding: {edges_result}")
+        return adjacency
+    key = "source_id" if direction == "out" else "target_id"
+    for row in edges_result:
+        edge = {"id": row[0], "source_id": row[1], "target_id": row[2], "label": row[3]}
+        adjacency.setdefault(edge[key], []).append(edge)
+    return adjacency
+
+def _discover_path_subgraph(start_node_id: int, end_node_id: int, max_depth: int, deadline: float, stop_on_meet: bool, expand) -> Tuple[Dict[int, List[Dict[str, Any]]], bool]:
+    """
+    Bidirectional breadth-first discovery: grows a forward ball around the start and a backward ball
+    around the end, one whole level per query, always expanding the smaller frontier. Once the two
+    radii add up to max_depth (or the balls meet, with stop_on_meet), every path of that length
+    lies within the discovered edges, so enumeration can run in memory.
+
+    Returns the discovered edges as source id -> outgoing edges, and whether the deadline was hit.
+    """
+    out_edges: Dict[int, List[Dict[str, Any]]] = {}
+    seen_edge_ids = set()
+    forward_seen = {start_node_id}; backward_seen = {end_node_id}
+    forward_frontier = [start_node_id]; backward_frontier = [end_node_id]
+    forward_radius = 0; backward_radius = 0
+    expanded_nodes = 0; timed_out = False
+
+    def keep(edge):
+        if edge['id'] not in seen_edge_ids:
+            seen_edge_ids.add(edge['id']); out_edges.setdefault(edge['source_id'], []).append(edge)
+
+    while forward_radius + backward_radius < max_depth and forward_frontier and backward_frontier:
+        if time.monotonic() > deadline or is_task_cancelled():
+            timed_out = True; break
+        if len(forward_frontier) <= len(backward_frontier):
+            expanded_nodes += len(forward_frontier)
+            adjacency = expand(forward_frontier, "out"); next_frontier = []
+            for node_id in forward_frontier:
+                for edge in adjacency.get(node_id, ()):
+                    keep(edge)
+                    if edge['target_id'] not in forward_seen:
+                        forward_seen.add(edge['target_id']); next_frontier.append(edge['target_id'])
+            forward_frontier = next_frontier; forward_radius += 1
+            met = any(node_id in backward_seen for node_id in next_frontier)
+        else:
+            expanded_nodes += len(backward_frontier)
+            adjacency = expand(backward_frontier, "in"); next_frontier = []
+            for node_id in backward_frontier:
+                for edge in adjacency.get(node_id, ()):
+                    keep(edge)
+                    if edge['source_id'] not in backward_seen:
+                        backward_seen.add(edge['source_id']); next_frontier.append(edge['source_id'])
+            backward_frontier = next_frontier; backward_radius += 1
+            met = any(node_id in forward_seen for node_id in next_frontier)
+        if met and stop_on_meet:
+            break
+    instrumentation.record_traversal("path_discovery", expanded_nodes, len(seen_edge_ids))
+    return out_edges, timed_out
+
+def _distances_to_target(out_edges: Dict[int, List[Dict[str, Any]]], end_node_id: int) -> Dict[int, int]:
+    """Exact hop distance from every node of the discovered subgraph to the end node (reverse BFS in memory)."""
+    in_edges: Dict[int, List[int]] = {}
+    for source_id, edges in out_edges.items():
+        for edge in edges:
+            in_edges.setdefault(edge['target_id'], []).append(source_id)
+    distances = {end_node_id: 0}
+    frontier = deque([end_node_id])
+    while frontier:
+        node_id = frontier.popleft()
+        for source_id in in_edges.get(node_id, ()):
+            if source_id not in distances:
+                distances[source_id] = distances[node_id] + 1; frontier.append(source_id)
+    return distances
+
+def find_paths(start_node_id: int, end_node_id: int, max_depth: int = 5, mode: str = PATH_MODE_K_SHORTEST, max_paths: int = DEFAULT_MAX_PATHS, time_budget: float = DEFAULT_PATH_TIME_BUDGET_SECONDS, expand=None) -> List[List[Dict[str, Any]]]:
+    """
+    Finds directed simple paths (as lists of edge dicts) from start_node_id to end_node_id.
+
+    mode=PATH_MODE_SHORTEST returns only minimum-length paths; PATH_MODE_K_SHORTEST returns paths of
+    length <= max_depth in order of increasing length. At most max_paths paths are returned, and the
+    search stops after time_budget seconds with whatever it has found so far.
+    expand(node_ids, direction) loads adjacency for a frontier; it defaults to bulk SQL queries.
+    """
+    if mode not in PATH_MODES:
+        app_logger.error(f"Unknown path mode '{mode}'. Expected one of {PATH_MODES}.")
+        return []
+    app_logger.info("Finding %s paths from node %s to %s (max_depth=%s, max_paths=%s).", mode, start_node_id, end_node_id, max_depth, max_paths)
+    if max_depth <= 0 or max_paths <= 0:
+        return []
+    deadline = time.monotonic() + time_budget
+    out_edges, timed_out = _discover_path_subgraph(start_node_id, end_node_id, max_depth, deadline, mode == PATH_MODE_SHORTEST, expand or _load_adjacency)
+    distances = _distances_to_target(out_edges, end_node_id)
+
+    # Best-first enumeration ordered by (edges so far + exact remaining distance). That bound never
+    # overestimates, so complete paths are produced shortest first, and any branch that cannot reach
+    # the end within the depth limit is never pushed. Paths are edge tuples no longer than max_depth,
+    # so the simple-path check scans them instead of copying a visited set per expansion.
+    paths: List[List[Dict[str, Any]]] = []
+    length_limit = max_depth
+    if start_node_id == end_node_id:
+        start_bound = 1 if start_node_id in out_edges else None # Only cycles back to the start count
+    else:
+        start_bound = distances.get(start_node_id)
+    heap = [(start_bound, 0, start_node_id, ())] if start_bound is not None and start_bound <= max_depth else []
+    counter = 1; steps = 0
+    while heap and not timed_out:
+        bound, _, node_id, path = heapq.heappop(heap)
+        if bound > length_limit:
+            break
+        if path and node_id == end_node_id:
+            paths.append(list(path))
+            if len(paths) >= max_paths:
+                break
+            if mode == PATH_MODE_SHORTEST:
+                length_limit = len(path) # Any later path would be longer
+            continue
+        steps += 1
+        if steps % _DEADLINE_CHECK_INTERVAL == 0 and (time.monotonic() > deadline or is_task_cancelled()):
+            timed_out = True; break
+        for edge in out_edges.get(node_id, ()):
+            neighbor_id = edge['target_id']
+            remaining = distances.get(neighbor_id)
+            if remaining is None or len(path) + 1 + remaining > length_limit:
+                continue
+            if neighbor_id != end_node_id and (neighbor_id == start_node_id or any(e['target_id'] == neighbor_id for e in path)):
+                continue
+            heapq.heappush(heap, (len(path) + 1 + remaining, counter, neighbor_id, path + (edge,))); counter += 1
+    instrumentation.record_traversal("path_enumeration", steps, counter - 1)
+    if timed_out:
+        app_logger.warning(f"Path search from {start_node_id} to {end_node_id} exceeded its {time_budget}s budget; returning {len(paths)} paths found so far.")
+    app_logger.info("Found %d paths from %s to %s.", len(paths), start_node_id, end_node_id)
     return paths
 
-def get_path_graph_data(start_node_name: str, end_node_name: str, max_depth: int = 5) -> Tuple[Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]], Optional[int], Optional[int]]:
+def get_path_graph_data(start_node_name: str, end_node_name: str, max_depth: int = 5, mode: str = PATH_MODE_K_SHORTEST, max_paths: int = DEFAULT_MAX_PATHS) -> Tuple[Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]], Optional[int], Optional[int]]:
     norm_start_name = _normalize_text(start_node_name); norm_end_name = _normalize_text(end_node_name)
     if not norm_start_name or not norm_end_name: return None, None, None, None
-    start_node_obj = get_node_by_name(norm_start_name); end_node_obj = get_node_by_name(norm_end_name)
+    snapshot = get_snapshot()
+    find_node = snapshot.get_node_by_name if snapshot is not None else get_node_by_name
+    start_node_obj = find_node(norm_start_name); end_node_obj = find_node(norm_end_name)
     if not start_node_obj: return None, None, None, None
     if not end_node_obj: return None, None, start_node_obj['id'] if start_node_obj else None, None
     start_id = start_node_obj['id']; end_id = end_node_obj['id']
-    all_paths_edges = _find_all_paths_bfs(start_id, end_id, max_depth)
-    if not all_paths_edges:
-        nodes_to_fetch_ids = {start_id, end_id}; nodes_in_paths_list = []
-        if nodes_to_fetch_ids:
-            placeholders = ', '.join(['?'] * len(nodes_to_fetch_ids))
-            sql_nodes = f"SELECT id, name, label FROM nodes WHERE id IN ({placeholders});"
-            nodes_result = execute_sql(sql_nodes, [str(nid) for nid in nodes_to_fetch_ids])
-            if isinstance(nodes_result, list):
-                for row in nodes_result: nodes_in_paths_list.append({"id": row[0], "name": row[1], "label": row[2]})
-        return nodes_in_paths_list, [], start_id, end_id
+    all_paths_edges = find_paths(start_id, end_id, max_depth, mode=mode, max_paths=max_paths, expand=snapshot.expand if snapshot is not None else None)
     unique_node_ids_in_paths = {start_id, end_id}; unique_edges_in_paths_map: Dict[int, Dict[str, Any]] = {}
     for path in all_paths_edges:
         for edge in path:
             unique_node_ids_in_paths.add(edge['source_id']); unique_node_ids_in_paths.add(edge['target_id'])
             if edge['id'] not in unique_edges_in_paths_map: unique_edges_in_paths_map[edge['id']] = edge
-    edges_in_paths_list = list(unique_edges_in_paths_map.values()); nodes_in_paths_list = []
-    if unique_node_ids_in_paths:
-        placeholders = ', '.join(['?'] * len(unique_node_ids_in_paths))
-        sql_nodes = f"SELECT id, name, label FROM nodes WHERE id IN ({placeholders});"
-        nodes_result = execute_sql(sql_nodes, [str(nid) for nid in unique_node_ids_in_paths])
-        if isinstance(nodes_result, list):
-            for row in nodes_result: nodes_in_paths_list.append({"id": row[0], "name": row[1], "label": row[2]})
-        elif isinstance(nodes_result, str): return None, edges_in_paths_list, start_id, end_id
+    edges_in_paths_list = list(unique_edges_in_paths_map.values())
+    nodes_in_paths_list = snapshot.get_nodes_by_ids(unique_node_ids_in_paths) if snapshot is not None else _fetch_nodes_by_ids(unique_node_ids_in_paths)
+    if nodes_in_paths_list is None: return None, edges_in_paths_list, start_id, end_id
     return nodes_in_paths_list, edges_in_paths_list, start_id, end_id
 
-def generate_paths_dot_graph(start_node_name: str, end_node_name: str, max_depth: int = 5) -> Optional[str]:
-    nodes, edges, start_id, end_id = get_path_graph_data(start_node_name, end_node_name, max_depth)
+def generate_paths_dot_graph(start_node_name: str, end_node_name: str, max_depth: int = 5, mode: str = PATH_MODE_K_SHORTEST, max_paths: int = DEFAULT_MAX_PATHS) -> Optional[str]:
+    nodes, edges, start_id, end_id = get_path_graph_data(start_node_name, end_node_name, max_depth, mode=mode, max_paths=max_paths)
     norm_start = _normalize_text(start_node_name) or "unk_start"; norm_end = _normalize_text(end_node_name) or "unk_end"
     if nodes is None: return f"// Error: Could not fetch data for path graph between '{start_node_name}' and '{end_node_name}'. Ensure nodes exist."
     if not edges:
@@ -243,8 +506,8 @@ def generate_paths_dot_graph(start_node_name: str, end_node_name: str, max_depth
     for e in edges: lines.append(f"  n{e['source_id']} -> n{e['target_id']} [label=\"{e.get('label', '')}\"];")
     lines.append("}"); return "\\n".join(lines)
 
-def generate_paths_mermaid_graph(start_node_name: str, end_node_name: str, max_depth: int = 5) -> Optional[str]:
-    nodes, edges, start_id, end_id = get_path_graph_data(start_node_name, end_node_name, max_depth)
+def generate_paths_mermaid_graph(start_node_name: str, end_node_name: str, max_depth: int = 5, mode: str = PATH_MODE_K_SHORTEST, max_paths: int = DEFAULT_MAX_PATHS) -> Optional[str]:
+    nodes, edges, start_id, end_id = get_path_graph_data(start_node_name, end_node_name, max_depth, mode=mode, max_paths=max_paths)
     if nodes is None: return f"%% Error: Could not fetch data for path graph between '{start_node_name}' and '{end_node_name}'. Ensure nodes exist. %%"
     if not edges:
         s_found = any(n['id'] == start_id for n in nodes) if start_id else False; e_found = any(n['id'] == end_id for n in nodes) if end_id else False
@@ -0,0 +1,204 @@
+import bisect
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from linkbase.logger_config import app_logger
+
+# In-process counters and histograms for the hot paths (SQL statements, pooled connections, graph
+# traversals, page fetches and HTML parsing), rendered in the Prometheus text format by /metrics.
+# Every series lives in this process only and starts from zero on restart, as Prometheus expects of
+# counters. With LINKBASE_INSTRUMENTATION=0 the record_* calls return before taking any lock, and
+# with LINKBASE_SLOW_QUERY_MS=0 as well execute_sql does not even read the clock.
+ENABLED = os.environ.get("LINKBASE_INSTRUMENTATION", "1") != "0"
+# Statements at least this slow are logged with their SQL text, whether or not ENABLED is set (0 disables)
+SLOW_QUERY_SECONDS = float(os.environ.get("LINKBASE_SLOW_QUERY_MS", "250")) / 1000
+TIMING_ENABLED = ENABLED or SLOW_QUERY_SECONDS > 0
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """Monotonic total per label values."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in values]
+
+class Gauge(_Metric):
+    """Value read from function() at every scrape, e.g. the size of a pool."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def _samples(self) -> List[str]:
+        if self.function is None:
+            return []
+        try:
+            return [f"{self.name} {_format_value(self.function())}"]
+        except Exception as e:
+            app_logger.error(f"Cannot read gauge {self.name}: {e}")
+            return []
+
+class Histogram(_Metric):
+    """Observation counts per bucket (upper bounds, inclusive) plus their sum, per label values."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (the last one is +Inf), sum]; made cumulative when rendered
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bound_label = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, bound_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+SQL_STATEMENT_SECONDS = Histogram(
+    "linkbase_sql_statement_duration_seconds", "Time to execute, fetch and commit a statement run through execute_sql.", ("statement",)
+)
+SQL_ROWS = Counter("linkbase_sql_rows_total", "Rows returned by queries or affected by DML statements.", ("statement",))
+SQL_ERRORS = Counter("linkbase_sql_errors_total", "Statements that failed.", ("statement",))
+SQL_SLOW_STATEMENTS = Counter("linkbase_sql_slow_statements_total", "Statements slower than LINKBASE_SLOW_QUERY_MS.", ("statement",))
+SQL_CONNECTIONS_OPENED = Counter("linkbase_sqlite_connections_opened_total", "SQLite connections opened, by kind (pooled or streaming).", ("kind",))
+SQL_POOLED_CONNECTIONS = Gauge("linkbase_sqlite_pooled_connections", "Pooled SQLite connections currently open.")
+TRAVERSAL_NODES = Histogram(
+    "linkbase_traversal_nodes", "Nodes expanded per graph traversal.", ("operation",), SIZE_BUCKETS
+)
+TRAVERSAL_EDGES = Histogram(
+    "linkbase_traversal_edges", "Edges loaded or followed per graph traversal.", ("operation",), SIZE_BUCKETS
+)
+FETCH_SECONDS = Histogram(
+    "linkbase_fetch_duration_seconds", "Time to fetch a URL (including retries and waiting for the host's slot), by outcome.", ("outcome",)
+)
+FETCH_BYTES = Counter("linkbase_fetch_bytes_total", "Response body bytes downloaded.")
+PARSE_SECONDS = Histogram("linkbase_html_parse_duration_seconds", "Time to extract the text of an HTML document, by parser.", ("parser",))
+
+# execute_sql runs arbitrary SQL, so statements are labelled by their leading keyword and first table
+# (e.g. "select nodes"): parameters and literals never become label values, and the number of series
+# stays bounded by the schema. Labels of repeated statement strings are memoized.
+_STATEMENT_KEYWORD_RE = re.compile(r"\s*(\w+)")
+_STATEMENT_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN|TABLE)\s+([A-Za-z_]\w*)\b(?!\s*\()", re.IGNORECASE)
+_STATEMENT_LABEL_CACHE_SIZE = 4096
+_statement_labels: Dict[str, str] = {}
+
+def statement_label(sql_command: str) -> str:
+    label = _statement_labels.get(sql_command)
+    if label is None:
+        keyword = _STATEMENT_KEYWORD_RE.match(sql_command)
+        table = _STATEMENT_TABLE_RE.search(sql_command)
+        label = " ".join(part.group(1).lower() for part in (keyword, table) if part) or "other"
+        if len(_statement_labels) < _STATEMENT_LABEL_CACHE_SIZE:
+            _statement_labels[sql_command] = label
+    return label
+
+def record_statement(sql_command: str, seconds: float, rows: int, failed: bool = False) -> None:
+    """Records one execute_sql statement; logs it as a slow query if it took SLOW_QUERY_SECONDS or longer."""
+    slow = 0 < SLOW_QUERY_SECONDS <= seconds
+    if not ENABLED and not slow:
+        return
+    statement = statement_label(sql_command)
+    if ENABLED:
+        SQL_STATEMENT_SECONDS.observe(seconds, statement)
+        if failed:
+            SQL_ERRORS.inc(1, statement)
+        else:
+            SQL_ROWS.inc(rows, statement)
+    if slow:
+        if ENABLED:
+            SQL_SLOW_STATEMENTS.inc(1, statement)
+        app_logger.warning("Slow SQL statement (%.1f ms, %d rows): %s", seconds * 1000, rows, " ".join(sql_command.split()))
+
+def record_connection_opened(kind: str) -> None:
+    if ENABLED:
+        SQL_CONNECTIONS_OPENED.inc(1, kind)
+
+def record_traversal(operation: str, nodes: int, edges: int) -> None:
+    if ENABLED:
+        TRAVERSAL_NODES.observe(nodes, operation)
+        TRAVERSAL_EDGES.observe(edges, operation)
+
+def record_fetch(outcome: str, seconds: float, size: int = 0) -> None:
+    if ENABLED:
+        FETCH_SECONDS.observe(seconds, outcome)
+        if size:
+            FETCH_BYTES.inc(size)
+
+def record_parse(parser: str, seconds: float) -> None:
+    if ENABLED:
+        PARSE_SECONDS.observe(seconds, parser)
+
+def render_metrics() -> str:
+    """Every registered metric in the Prometheus text exposition format (version 0.0.4)."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
@@ -1,46 +1,118 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+from typing import Optional
 
 LOG_FILE_NAME = "linkbase.log"
 LOG_DIR = os.path.dirname(os.path.abspath(__file__)) # Logs in the same directory as this config
 LOG_FILE_PATH = os.path.join(LOG_DIR, LOG_FILE_NAME)
+LOG_LEVEL = os.environ.get("LINKBASE_LOG_LEVEL", "INFO").upper()
+# The log file is rotated once it reaches LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT older files (linkbase.log.1, ...)
+LOG_MAX_BYTES = int(float(os.environ.get("LINKBASE_LOG_MAX_MB", "10")) * 1024 * 1024)
+LOG_BACKUP_COUNT = int(os.environ.get("LINKBASE_LOG_BACKUPS", "5"))
+LOG_FORMAT = os.environ.get("LINKBASE_LOG_FORMAT", "text") # "text" or "json" (one JSON object per line)
 
-def setup_global_logger(log_level=logging.INFO):
+# Records are handed to a queue and written by a background listener thread, so logging never
+# blocks the caller on file I/O (or on a rollover). Records below the logger's level are dropped
+# before their message is formatted; hot paths pass %-style arguments so that costs nothing.
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object: time, level, logger, thread, message and any exception."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Unlike QueueHandler, hands records over with only their message merged and their traceback
+    rendered as exc_text (the parts that must not be deferred to another thread); the listener's
+    formatter does the rest, so a JSON formatter still gets the traceback as its own field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _new_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+    return logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+def setup_global_logger(log_level=LOG_LEVEL, log_format: str = LOG_FORMAT):
     """
-    Sets up the root logger to write to a file.
-    This will capture logs from all modules using Python's standard logging.
+    Sets up the root logger to write to a size-rotated file through a queue and a background
+    listener thread. This will capture logs from all modules using Python's standard logging.
     """
+    global _listener
     # Get the root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level) # Set the minimum level for the root logger
 
     # Prevent adding multiple handlers if already configured (e.g., by other parts of an app)
-    # Check specifically for our file handler to avoid removing other desired handlers.
-    # A more robust check might involve handler names or types if more complex setups are expected.
-    has_our_file_handler = any(isinstance(h, logging.FileHandler) and h.baseFilename == LOG_FILE_PATH for h in root_logger.handlers)
-
-    if not has_our_file_handler:
-        # Create formatter
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Check specifically for our queue handler to avoid removing other desired handlers.
+    has_our_handler = any(getattr(h, "linkbase_log_file", None) == LOG_FILE_PATH for h in root_logger.handlers)
 
-        # File Handler - writes logs to a file
-        file_handler = logging.FileHandler(LOG_FILE_PATH, mode='a') # Use 'a' to append
+    if not has_our_handler:
+        # File Handler - rotates the log file by size; only the listener thread writes to it
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE_PATH, mode='a', maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
         file_handler.setLevel(log_level) # Set level for this handler
-        file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        file_handler.setFormatter(_new_formatter(log_format))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.linkbase_log_file = LOG_FILE_PATH
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_global_logger) # Writes out queued records before the interpreter exits
+        root_logger.addHandler(queue_handler)
         
         # Optionally, add a console handler to the root logger as well
         # console_handler = logging.StreamHandler()
         # console_handler.setLevel(logging.DEBUG) # Or your preferred console level
-        # console_handler.setFormatter(formatter)
+        # console_handler.setFormatter(_new_formatter(log_format))
         # root_logger.addHandler(console_handler)
         
-        root_logger.info(f"Global file logger initialized. Logging to: {LOG_FILE_PATH}")
+        root_logger.info("Global file logger initialized. Logging to: %s (%s format).", LOG_FILE_PATH, log_format)
     else:
-        root_logger.info(f"Global file logger to {LOG_FILE_PATH} seems to be already configured.")
+        root_logger.info("Global file logger to %s seems to be already configured.", LOG_FILE_PATH)
 
     return root_logger # Return the configured root logger
 
+def stop_global_logger() -> None:
+    """Writes out every queued record, then stops the listener thread and detaches its queue handler."""
+    global _listener
+    root_logger = logging.getLogger()
+    for handler in [h for h in root_logger.handlers if getattr(h, "linkbase_log_file", None) == LOG_FILE_PATH]:
+        root_logger.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 # Configure the global logger when this module is imported.
 # Any module can then get a logger instance via logging.getLogger(__name__)
 # and its messages (at or above the root_logger's level) will be handled.
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from linkbase.db_tools import add_graph_batch, add_source_graph_batch, get_source, _normalize_text
+from linkbase.logger_config import app_logger
+from linkbase.web_tools import get_text_from_url
+
+# Ingestion pipeline for long texts: the text is split into token-bounded, overlapping chunks,
+# near-duplicate chunks (repeated boilerplate, mirrored sections) are dropped, entities and relations
+# are extracted from the remaining chunks concurrently, and everything is merged into a single
+# add_graph_batch write.
+#
+# An extractor is any callable taking a chunk of text and returning {"entities": [...], "relations": [...]}
+# in add_graph_batch's format. The default one prompts an LLM through litellm; tests and local runs can
+# pass their own, or make_llm_extractor(completion=...) with a fake completion function.
+CHUNK_TOKENS = int(os.environ.get("LINKBASE_CHUNK_TOKENS", "1500"))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("LINKBASE_CHUNK_OVERLAP_TOKENS", "150"))
+CHUNK_DUPLICATE_THRESHOLD = 0.9 # Jaccard similarity of word shingles above which a chunk is a duplicate
+EXTRACTION_MAX_WORKERS = int(os.environ.get("LINKBASE_EXTRACTION_WORKERS", "4"))
+EXTRACTION_MODEL = os.environ.get("LINKBASE_EXTRACTION_MODEL", "gemini/gemini-2.5-pro-preview-05-06")
+
+Extractor = Callable[[str], Dict[str, List[Dict[str, Any]]]]
+
+# Words and individual punctuation marks, a close enough stand-in for model tokens without a tokenizer
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SHINGLE_SIZE = 5
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+_EXTRACTION_PROMPT = """Extract the named entities and the relationships between them from the text below.
+Answer with a single JSON object and nothing else, in this format:
+{"entities": [{"name": "Marie Curie", "label": "Person"}],
+ "relations": [{"source": "Marie Curie", "target": "Radium", "label": "discovered"}]}
+Use short, canonical entity names, a type as each entity's label and a short verb phrase as each relation's label.
+Only include relationships stated or clearly implied by the text.
+
+Text:
+"""
+
+def split_into_chunks(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """Splits text into chunks of at most max_tokens tokens, each sharing overlap_tokens with the previous one."""
+    spans = [match.span() for match in _TOKEN_RE.finditer(text)]
+    if not spans:
+        return []
+    stride = max(max_tokens - overlap_tokens, 1)
+    chunks = []
+    for start in range(0, len(spans), stride):
+        end = min(start + max_tokens, len(spans))
+        chunks.append(text[spans[start][0]:spans[end - 1][1]])
+        if end == len(spans):
+            break
+    return chunks
+
+def _shingles(chunk: str) -> set:
+    words = [word.lower() for word in re.findall(r"\w+", chunk)]
+    if len(words) <= _SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + _SHINGLE_SIZE]) for i in range(len(words) - _SHINGLE_SIZE + 1)}
+
+def dedupe_chunks(chunks: List[str], threshold: float = CHUNK_DUPLICATE_THRESHOLD) -> List[str]:
+    """Drops chunks that are identical (ignoring case and whitespace) or near-identical to an earlier kept chunk."""
+    kept: List[str] = []
+    kept_shingles: List[set] = []
+    seen_digests = set()
+    for chunk in chunks:
+        digest = hashlib.sha1(" ".join(chunk.lower().split()).encode("utf-8")).digest()
+        if digest in seen_digests:
+            continue
+        shingles = _shingles(chunk)
+        if any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            continue
+        seen_digests.add(digest)
+        kept.append(chunk)
+        kept_shingles.append(shingles)
+    return kept
+
+def _parse_extraction(content: str) -> Dict[str, List[Dict[str, Any]]]:
+    data = json.loads(_FENCE_RE.sub("", content.strip()))
+    if not isinstance(data, dict):
+        raise ValueError("Extraction result is not a JSON object.")
+    entities = data.get("entities") or []
+    relations = data.get("relations") or []
+    if not isinstance(entities, list) or not isinstance(relations, list):
+        raise ValueError("'entities' and 'relations' must be lists.")
+    return {"entities": entities, "relations": relations}
+
+def make_llm_extractor(model: str = EXTRACTION_MODEL, completion: Optional[Callable[..., Any]] = None) -> Extractor:
+    """
+    Returns an extractor that prompts model through litellm. completion replaces litellm.completion
+    (same arguments and response shape), e.g. with a local fake model.
+    """
+    def extract(chunk: str) -> Dict[str, List[Dict[str, Any]]]:
+        complete = completion
+        if complete is None:
+            import litellm # Imported on first use; it is slow to import and not needed with a custom extractor
+            complete = litellm.completion
+        response = complete(model=model, messages=[{"role": "user", "content": _EXTRACTION_PROMPT + chunk}], temperature=0)
+        return _parse_extraction(response.choices[0].message.content)
+    return extract
+
+def _merge_extractions(extractions: List[Dict[str, List[Dict[str, Any]]]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    # Entities are keyed by normalized name, keeping the first label found; relations by normalized triple
+    entities: Dict[str, Dict[str, Any]] = {}
+    relations: Dict[Tuple, Dict[str, Any]] = {}
+    for extraction in extractions:
+        for entity in extraction["entities"]:
+            if not isinstance(entity, dict) or not isinstance(entity.get("name"), str):
+                continue
+            key = _normalize_text(entity["name"])
+            if not key:
+                continue
+            merged = entities.setdefault(key, {"name": entity["name"]})
+            if entity.get("label") and not merged.get("label"):
+                merged["label"] = entity["label"]
+        for relation in extraction["relations"]:
+            if not isinstance(relation, dict) or not isinstance(relation.get("source"), str) or not isinstance(relation.get("target"), str):
+                continue
+            label = relation.get("label")
+            key = (_normalize_text(relation["source"]), _normalize_text(relation["target"]), _normalize_text(str(label)) if label is not None else None)
+            if key[0] and key[1]:
+                relations.setdefault(key, {"source": relation["source"], "target": relation["target"], "label": label})
+    return list(entities.values()), list(relations.values())
+
+def ingest_text(
+    text: str, extractor: Optional[Extractor] = None, max_workers: int = EXTRACTION_MAX_WORKERS,
+    max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS, source_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Chunks text, extracts entities and relations from the chunks concurrently with extractor
+    (default: make_llm_extractor()) and stores the merged result with one add_graph_batch call.
+    With source_url, nothing is done if the source was already extracted from identical text;
+    otherwise the result replaces the source's previous edges (see add_source_graph_batch).
+    """
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if source_url is not None:
+        previous = get_source(source_url)
+        if previous is not None and previous["content_hash"] == text_hash:
+            app_logger.info(f"Source '{source_url}' is unchanged since {previous['extracted_at']}; skipping extraction.")
+            return {"status": "unchanged", "edges": previous["edge_count"], "extracted_at": previous["extracted_at"]}
+    extractor = extractor or make_llm_extractor()
+    chunks = split_into_chunks(text, max_tokens, overlap_tokens)
+    unique_chunks = dedupe_chunks(chunks)
+    app_logger.info(f"Extracting from {len(unique_chunks)} chunks ({len(chunks) - len(unique_chunks)} duplicates dropped) with {max_workers} workers.")
+
+    def extract(index_and_chunk: Tuple[int, str]) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        index, chunk = index_and_chunk
+        try:
+            return extractor(chunk)
+        except Exception as e:
+            app_logger.error(f"Extraction failed for chunk {index}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="linkbase-extract") as executor:
+        results = list(executor.map(extract, enumerate(unique_chunks)))
+    extractions = [result for result in results if result is not None]
+    entities, relations = _merge_extractions(extractions)
+
+    summary: Dict[str, Any] = {
+        "chunks": len(chunks), "duplicate_chunks": len(chunks) - len(unique_chunks),
+        "failed_chunks": len(results) - len(extractions), "entities": len(entities), "relations": len(relations),
+    }
+    if not entities and not relations and (source_url is None or summary["failed_chunks"]):
+        summary["status"] = "error" if summary["failed_chunks"] else "success"
+        return summary
+    if source_url is None:
+        batch = add_graph_batch(entities, relations)
+    else:
+        # A partial extraction only adds links, and leaves no hash so the source is extracted again next time
+        complete = not summary["failed_chunks"]
+        batch = add_source_graph_batch(source_url, text_hash if complete else None, entities, relations, replace=complete)
+        if "source" in batch:
+            summary["removed_edges"] = batch["source"]["removed_edges"]
+    summary["status"] = batch["status"]
+    if "error" in batch:
+        summary["error"] = batch["error"]
+    skipped = [
+        {"kind": kind, **result} for kind in ("entities", "relations")
+        for result in batch[kind] if result["status"] == "skipped"
+    ]
+    if skipped:
+        summary["skipped"] = skipped
+    app_logger.info(f"Ingested {len(entities)} entities and {len(relations)} relations from {len(extractions)} chunks.")
+    return summary
+
+def ingest_url(url: str) -> Dict[str, Any]:
+    """
+    Fetches a webpage and builds graph entries from its whole text: the text is split into chunks
+    that are processed in parallel, and all extracted entities and relations are stored at once.
+    Prefer this over reading long pages yourself. Pages whose text is unchanged since they were last
+    ingested are skipped, and edges no longer found on a changed page are removed.
+
+    Args:
+        url: The URL of the webpage to ingest.
+
+    Returns:
+        A dict with "status" ("success", "unchanged" or "error") and counts of "chunks", "duplicate_chunks",
+        "failed_chunks", "entities", "relations" and "removed_edges". "skipped" lists items that could not be
+        stored and "error" describes a failure.
+    """
+    text = get_text_from_url(url)
+    if text.startswith(f"Error fetching URL {url}") or text.startswith(f"An unexpected error occurred while processing {url}"):
+        return {"status": "error", "error": text}
+    return ingest_text(text, source_url=url)
@@ -1,11 +1,15 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, PlainTextResponse # Added PlainTextResponse
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse # Added PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import json
 import os
 import sys
+import threading
+import uuid
+from collections import OrderedDict
 
 # Add project root to sys.path to allow imports from linkbase module
 # This assumes web_server.py is in the linkbase directory, and linkbase is in the project root.
@@ -24,11 +28,33 @@ try:
     from linkbase.graph_tools import (
         get_all_nodes_and_edges,
         get_node_centric_data,
-        get_path_graph_data
+        get_path_graph_data,
+        PATH_MODE_K_SHORTEST,
+        PATH_MODES,
+        DEFAULT_MAX_PATHS,
+        get_nodes_json,
+        get_edges_json,
+        rows_to_json,
+        node_fields,
+        EDGE_FIELDS,
+        METRIC_SORT_KEYS,
+        get_ranked_subgraph,
+        GRAPH_LAYOUT_ROWS,
+        GRAPH_LAYOUTS,
+        iter_dot_graph,
+        iter_mermaid_graph
         # Mermaid generation will now happen client-side
     )
-    from linkbase.db_tools import initialize_database # _normalize_text not directly used here
+    from linkbase.db_tools import initialize_database, close_all_connections, get_data_version, search_nodes, _normalize_text
+    from linkbase.db_executor import run_db_task, RequestCancelled, shutdown_db_executor, is_task_cancelled
+    from linkbase.graph_binary import encode_graph_binary, BINARY_GRAPH_MEDIA_TYPE
+    from linkbase.graph_layout import request_layout_refresh, stop_layout_refresh, get_node_positions
+    from linkbase.graph_analytics import (
+        request_metrics_refresh, get_node_metrics, get_node_metrics_version, start_metrics_scheduler, stop_metrics_scheduler,
+        METRICS_REFRESH_SECONDS, ANALYTICS_AVAILABLE
+    )
     from linkbase.logger_config import app_logger
+    from linkbase import instrumentation
 except ImportError as e:
     # This fallback is for cases where the script might be run directly
     # and the parent directory isn't automatically in sys.path.
@@ -40,10 +66,32 @@ except ImportError as e:
     from linkbase.graph_tools import (
         get_all_nodes_and_edges,
         get_node_centric_data,
-        get_path_graph_data
+        get_path_graph_data,
+        PATH_MODE_K_SHORTEST,
+        PATH_MODES,
+        DEFAULT_MAX_PATHS,
+        get_nodes_json,
+        get_edges_json,
+        rows_to_json,
+        node_fields,
+        EDGE_FIELDS,
+        METRIC_SORT_KEYS,
+        get_ranked_subgraph,
+        GRAPH_LAYOUT_ROWS,
+        GRAPH_LAYOUTS,
+        iter_dot_graph,
+        iter_mermaid_graph
+    )
+    from linkbase.db_tools import initialize_database, close_all_connections, get_data_version, search_nodes, _normalize_text
+    from linkbase.db_executor import run_db_task, RequestCancelled, shutdown_db_executor, is_task_cancelled
+    from linkbase.graph_binary import encode_graph_binary, BINARY_GRAPH_MEDIA_TYPE
+    from linkbase.graph_layout import request_layout_refresh, stop_layout_refresh, get_node_positions
+    from linkbase.graph_analytics import (
+        request_metrics_refresh, get_node_metrics, get_node_metrics_version, start_metrics_scheduler, stop_metrics_scheduler,
+        METRICS_REFRESH_SECONDS, ANALYTICS_AVAILABLE
     )
-    from linkbase.db_tools import initialize_database # _normalize_text not used here by web_server
     from linkbase.logger_config import app_logger
+    from linkbase import instrumentation
 
 
 app = FastAPI()
@@ -52,6 +100,117 @@ app = FastAPI()
 initialize_database()
 app_logger.info("Database initialized by web_server.py on startup.")
 
+@app.on_event("startup")
+def start_background_jobs():
+    start_metrics_scheduler()
+
+@app.on_event("shutdown")
+def close_database_connections():
+    # Database work runs on the executor's threads (and FastAPI's threadpool for streaming exports),
+    # each worker thread holding a pooled connection.
+    stop_metrics_scheduler()
+    stop_layout_refresh()
+    shutdown_db_executor()
+    close_all_connections()
+    app_logger.info("Pooled database connections closed on shutdown.")
+
+@app.exception_handler(RequestCancelled)
+async def request_cancelled_handler(request: Request, exc: RequestCancelled):
+    # The client is gone, so nobody reads this; 499 (client closed request) keeps access logs honest.
+    return Response(status_code=499)
+
+# --- Pagination and conditional GET ---
+MAX_PAGE_SIZE = 50000
+# get_data_version() values are only comparable within one process, so ETags also carry a per-process nonce.
+_ETAG_EPOCH = uuid.uuid4().hex[:12]
+
+def _etag_for_version(version: int) -> str:
+    # Every response is derived from the database alone, so one version-based tag validates any URL.
+    return f'W/"{_ETAG_EPOCH}-{version}"'
+
+def _current_etag() -> str:
+    return _etag_for_version(get_data_version())
+
+def _is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def _validate_page_size(limit: Optional[int]) -> None:
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+
+# --- Response cache ---
+class GraphResponseCache:
+    """
+    LRU cache of serialized /api/graph bodies, bounded by entry count and total bytes. Entries are
+    only valid for the data_version they were computed at; the first lookup or store at a newer
+    version drops them all.
+    """
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync_version(self, version: int) -> None:
+        # Caller holds the lock.
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear(); self._total_bytes = 0
+            self._version = version
+
+    def get(self, key: Tuple, version: int) -> Optional[bytes]:
+        with self._lock:
+            self._sync_version(version)
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Tuple, version: int, body: bytes) -> None:
+        if self.max_entries <= 0 or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._sync_version(version)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= len(previous)
+            self._entries[key] = body; self._total_bytes += len(body)
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted); self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries), "bytes": self._total_bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes,
+                "data_version": self._version, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+            }
+
+graph_response_cache = GraphResponseCache(
+    max_entries=int(os.environ.get("LINKBASE_RESPONSE_CACHE_ENTRIES", "128")),
+    max_bytes=int(float(os.environ.get("LINKBASE_RESPONSE_CACHE_MB", "64")) * 1024 * 1024)
+)
+
 # --- Pydantic Models for Request/Response (Optional but good practice) ---
 class GraphParams(BaseModel):
     center_node: Optional[str] = None
@@ -64,6 +223,18 @@ class NodeInfo(BaseModel):
     name: str
     label: Optional[str] = None
 
+class GraphNodeInfo(NodeInfo):
+    # Only with with_positions=true; null until the node has been laid out
+    x: Optional[float] = None
+    y: Optional[float] = None
+    # Only with with_metrics=true or in ranked views (see graph_analytics.py); null until computed
+    in_degree: Optional[int] = None
+    out_degree: Optional[int] = None
+    degree: Optional[int] = None
+    pagerank: Optional[float] = None
+    component: Optional[int] = None
+    component_size: Optional[int] = None
+
 class EdgeInfo(BaseModel):
     id: int
     source_id: int
@@ -71,48 +242,46 @@ class EdgeInfo(BaseModel):
     label: Optional[str] = None
 
 class GraphDataResponse(BaseModel):
-    nodes: List[NodeInfo]
+    nodes: List[GraphNodeInfo]
     edges: List[EdgeInfo]
     # Optional fields for context, like which node was centered or path start/end
     center_node_id: Optional[int] = None
     start_node_id: Optional[int] = None
     end_node_id: Optional[int] = None
     error_message: Optional[str] = None
+    # Keyset cursors for paginated full-graph requests; pass them back as after_node_id/after_edge_id while has_more
+    next_node_cursor: Optional[int] = None
+    next_edge_cursor: Optional[int] = None
+    has_more: bool = False
+    layout: str = "rows"
 
 
 # --- API Endpoints ---
-@app.get("/api/graph", response_model=GraphDataResponse) # Changed response model
-async def get_graph_data_endpoint(
-    center_node: Optional[str] = None,
-    start_node: Optional[str] = None,
-    end_node: Optional[str] = None,
-    # 'depth' is used for node-centric, 'max_depth' for pathfinding.
-    # FastAPI will map query param 'depth' to this if present, else default.
-    # For pathfinding, we use 'max_depth' as the parameter name.
-    # For node-centric, we'll use 'depth' as the parameter name.
-    # Let's rename max_depth to path_max_depth for clarity and add a new 'depth' for node-centric.
-    path_max_depth: int = 5, 
-    node_centric_depth: int = 1 
-):
-    """
-    Generates and returns a Mermaid graph string.
-    - If center_node is provided, a node-centric graph is generated up to node_centric_depth.
-    - If start_node and end_node are provided, a path graph is generated up to path_max_depth.
-    - Otherwise, the full graph is generated.
-    """
-    app_logger.info(
-        f"API /api/graph called with: center='{center_node}', start='{start_node}', "
-        f"end='{end_node}', node_centric_depth={node_centric_depth}, path_max_depth={path_max_depth}"
-    )
-    
+def _graph_json_body(nodes_json: str, edges_json: str, **context) -> bytes:
+    # nodes_json/edges_json are already encoded (often by SQLite itself), so they are spliced in verbatim
+    # instead of being parsed into GraphDataResponse models and serialized a second time.
+    return ('{"nodes":' + nodes_json + ',"edges":' + edges_json + "," + json.dumps(context, ensure_ascii=False, separators=(",", ":"))[1:]).encode("utf-8")
+
+def _compute_graph_data(
+    center_node: Optional[str], start_node: Optional[str], end_node: Optional[str],
+    path_max_depth: int, node_centric_depth: int, path_mode: str, max_paths: int,
+    limit: Optional[int], after_node_id: int, after_edge_id: int, layout: str, with_positions: bool,
+    with_metrics: bool, sort_by: str, top_nodes: Optional[int], component: Optional[int]
+) -> bytes:
     nodes: Optional[List[Dict[str, Any]]] = None
     edges: Optional[List[Dict[str, Any]]] = None
+    # Full-graph views are encoded by SQLite directly into these instead of going through nodes/edges
+    nodes_json: Optional[str] = None
+    edges_json: Optional[str] = None
     
     # Variables to pass context to the frontend if needed (e.g. for highlighting)
     response_center_node_id: Optional[int] = None
     response_start_node_id: Optional[int] = None
     response_end_node_id: Optional[int] = None
     error_msg: Optional[str] = None
+    next_node_cursor: Optional[int] = None
+    next_edge_cursor: Optional[int] = None
+    has_more = False
 
     if center_node:
         # get_node_centric_data returns (center_node_obj, edges_list, nodes_list)
@@ -126,7 +295,7 @@ async def get_graph_data_endpoint(
             nodes, edges = [], [] # Return empty lists on error
     elif start_node and end_node:
         # get_path_graph_data returns (nodes_list, edges_list, start_node_id, end_node_id)
-        nodes_list, edges_list, s_id, e_id = get_path_graph_data(start_node, end_node, max_depth=path_max_depth)
+        nodes_list, edges_list, s_id, e_id = get_path_graph_data(start_node, end_node, max_depth=path_max_depth, mode=path_mode, max_paths=max_paths)
         if nodes_list is not None: # Can be empty list if nodes found but no path
             nodes = nodes_list
             edges = edges_list if edges_list is not None else []
@@ -140,32 +309,197 @@ async def get_graph_data_endpoint(
         else: # nodes_list is None, critical error in fetching
             error_msg = f"Error fetching data for path between '{start_node}' and '{end_node}'."
             nodes, edges = [], []
+    elif top_nodes is not None or component is not None:
+        # Ranked view: the top nodes by a materialized metric, which are always included
+        with_metrics = True
+        nodes, edges = get_ranked_subgraph(sort_by, top_nodes if top_nodes is not None else MAX_PAGE_SIZE, component)
+        if nodes is None:
+            error_msg = "Failed to fetch ranked nodes."
+            nodes, edges = [], []
+        elif not nodes and get_node_metrics_version() is None:
+            # _build_graph_data has requested a refresh; its write changes the version, so this isn't cached for long
+            if ANALYTICS_AVAILABLE:
+                error_msg = "Graph metrics are still being computed; retry shortly."
+            else:
+                error_msg = "Graph metrics have not been computed (NumPy is required)."
     else:
-        nodes, edges = get_all_nodes_and_edges()
-
-    if nodes is None: # Should generally not happen if logic above is correct, but as a fallback
-        app_logger.error("Fallback: Nodes data is None.")
-        nodes = []
-        error_msg = error_msg or "Failed to fetch node data."
-    if edges is None:
-        app_logger.info("Edges data is None, defaulting to empty list.")
-        edges = []
-        # error_msg = error_msg or "Failed to fetch edge data." # Less critical if nodes are present
-
-    return GraphDataResponse(
-        nodes=[NodeInfo(**n) for n in nodes], 
-        edges=[EdgeInfo(**e) for e in edges],
+        # limit=-1 is SQLite for "no limit", i.e. the whole graph in one page
+        page_size = limit if limit is not None else -1
+        node_page = get_nodes_json(after_node_id, page_size, layout, with_positions=with_positions, with_metrics=with_metrics)
+        remaining = (page_size - node_page[1] if page_size > 0 else -1) if node_page is not None else 0
+        edge_page = get_edges_json(after_edge_id, remaining, layout) if remaining != 0 else (rows_to_json([], EDGE_FIELDS, layout), 0, None)
+        if node_page is not None and edge_page is not None:
+            nodes_json, node_count, last_node_id = node_page
+            edges_json, edge_count, last_edge_id = edge_page
+            if limit is not None:
+                next_node_cursor = last_node_id if last_node_id is not None else after_node_id
+                next_edge_cursor = last_edge_id if last_edge_id is not None else after_edge_id
+                has_more = node_count + edge_count == limit
+        else:
+            error_msg = "Failed to fetch a page of graph data." if limit is not None else "Failed to fetch node data."
+
+    if nodes_json is None:
+        if nodes is None: # Should generally not happen if logic above is correct, but as a fallback
+            app_logger.error("Fallback: Nodes data is None.")
+            nodes = []
+            error_msg = error_msg or "Failed to fetch node data."
+        if edges is None:
+            app_logger.info("Edges data is None, defaulting to empty list.")
+            edges = []
+            # error_msg = error_msg or "Failed to fetch edge data." # Less critical if nodes are present
+        if with_positions:
+            positions = get_node_positions(node['id'] for node in nodes)
+            # Nodes without a position get null x/y from rows_to_json
+            nodes = [dict(node, x=positions[node['id']][0], y=positions[node['id']][1]) if node['id'] in positions else node for node in nodes]
+        if with_metrics and not (nodes and "pagerank" in nodes[0]):
+            metrics = get_node_metrics(node['id'] for node in nodes)
+            nodes = [dict(node, **metrics[node['id']]) if node['id'] in metrics else node for node in nodes]
+        nodes_json = rows_to_json(nodes, node_fields(with_positions, with_metrics), layout)
+        edges_json = rows_to_json(edges, EDGE_FIELDS, layout)
+
+    return _graph_json_body(
+        nodes_json, edges_json,
         center_node_id=response_center_node_id,
         start_node_id=response_start_node_id,
         end_node_id=response_end_node_id,
-        error_message=error_msg
+        error_message=error_msg,
+        next_node_cursor=next_node_cursor,
+        next_edge_cursor=next_edge_cursor,
+        has_more=has_more,
+        layout=layout
     )
 
-@app.get("/api/nodes", response_model=List[NodeInfo])
-async def get_nodes_for_dropdown():
+def _graph_cache_key(
+    center_node: Optional[str], start_node: Optional[str], end_node: Optional[str],
+    path_max_depth: int, node_centric_depth: int, path_mode: str, max_paths: int,
+    limit: Optional[int], after_node_id: int, after_edge_id: int, layout: str, with_positions: bool,
+    with_metrics: bool, sort_by: str, top_nodes: Optional[int], component: Optional[int]
+) -> Tuple:
+    # Only the parameters the selected view actually uses, with names normalized like the lookups do.
+    if center_node:
+        return ("center", _normalize_text(center_node), node_centric_depth, layout, with_positions, with_metrics)
+    if start_node and end_node:
+        return ("path", _normalize_text(start_node), _normalize_text(end_node), path_max_depth, path_mode, max_paths, layout, with_positions, with_metrics)
+    if top_nodes is not None or component is not None:
+        return ("ranked", sort_by, top_nodes, component, layout, with_positions)
+    if limit is not None:
+        return ("page", limit, after_node_id, after_edge_id, layout, with_positions, with_metrics)
+    return ("full", layout, with_positions, with_metrics)
+
+def _build_graph_data(
+    request: Request, center_node: Optional[str], start_node: Optional[str], end_node: Optional[str],
+    path_max_depth: int, node_centric_depth: int, path_mode: str, max_paths: int,
+    limit: Optional[int], after_node_id: int, after_edge_id: int, layout: str, with_positions: bool,
+    with_metrics: bool, sort_by: str, top_nodes: Optional[int], component: Optional[int]
+) -> Response:
+    # Blocking part of /api/graph; runs on the database executor.
+    # Positions are served as stored (null for nodes not laid out yet); a layout that is missing or
+    # stale is recomputed in the background, and its write changes the version and the ETag then.
+    if with_positions:
+        request_layout_refresh()
+    if with_metrics or top_nodes is not None or component is not None:
+        # The scheduler keeps metrics fresh; without it (or before its first run) they are refreshed in the
+        # background too, and this request serves what is stored
+        if METRICS_REFRESH_SECONDS <= 0 or get_node_metrics_version() is None:
+            request_metrics_refresh()
+    version = get_data_version()
+    etag = _etag_for_version(version)
+    if _is_not_modified(request, etag):
+        return _not_modified_response(etag)
+    params = (
+        center_node, start_node, end_node, path_max_depth, node_centric_depth, path_mode, max_paths,
+        limit, after_node_id, after_edge_id, layout, with_positions, with_metrics, sort_by, top_nodes, component
+    )
+    cache_key = _graph_cache_key(*params)
+    body = graph_response_cache.get(cache_key, version)
+    if body is None:
+        body = _compute_graph_data(*params)
+        if not is_task_cancelled(): # A cancelled path search returns truncated results
+            graph_response_cache.put(cache_key, version, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/api/graph", response_model=GraphDataResponse) # Changed response model
+async def get_graph_data_endpoint(
+    request: Request,
+    center_node: Optional[str] = None,
+    start_node: Optional[str] = None,
+    end_node: Optional[str] = None,
+    # 'depth' is used for node-centric, 'max_depth' for pathfinding.
+    # FastAPI will map query param 'depth' to this if present, else default.
+    # For pathfinding, we use 'max_depth' as the parameter name.
+    # For node-centric, we'll use 'depth' as the parameter name.
+    # Let's rename max_depth to path_max_depth for clarity and add a new 'depth' for node-centric.
+    path_max_depth: int = 5, 
+    node_centric_depth: int = 1,
+    # 'shortest' returns only minimum-length paths, 'k_shortest' up to max_paths paths by increasing length.
+    path_mode: str = PATH_MODE_K_SHORTEST,
+    max_paths: int = DEFAULT_MAX_PATHS,
+    # Full graph only: page size and keyset cursors. Nodes are paged first, then edges fill the remaining page.
+    limit: Optional[int] = None,
+    after_node_id: int = 0,
+    after_edge_id: int = 0,
+    # 'rows' (a list of objects, as described by GraphDataResponse) or 'columns' (parallel arrays per field)
+    layout: str = GRAPH_LAYOUT_ROWS,
+    # Adds server-computed layout coordinates x, y to every node (see graph_layout.py)
+    with_positions: bool = False,
+    # Adds the materialized metrics (degrees, pagerank, component) to every node (see graph_analytics.py)
+    with_metrics: bool = False,
+    # Ranked view instead of the full graph: the top_nodes nodes by sort_by (restricted to one weakly
+    # connected component if component is given) and the edges among them
+    sort_by: str = "pagerank",
+    top_nodes: Optional[int] = None,
+    component: Optional[int] = None
+):
     """
-    Returns a list of all nodes for populating dropdowns in the UI.
+    Generates and returns a Mermaid graph string.
+    - If center_node is provided, a node-centric graph is generated up to node_centric_depth.
+    - If start_node and end_node are provided, a path graph is generated up to path_max_depth,
+      using path_mode and keeping at most max_paths paths.
+    - If top_nodes or component is provided, the highest ranked nodes by sort_by are returned with
+      the edges among them.
+    - Otherwise, the full graph is generated, one page of at most limit nodes and edges at a time if
+      limit is given.
+    Responses carry an ETag tied to the database version; a matching If-None-Match yields 304.
+    Serialized responses are cached per view until the database changes (see /api/cache/stats).
     """
+    app_logger.info(
+        "API /api/graph called with: center='%s', start='%s', end='%s', node_centric_depth=%s, path_max_depth=%s, "
+        "path_mode='%s', max_paths=%s",
+        center_node, start_node, end_node, node_centric_depth, path_max_depth, path_mode, max_paths
+    )
+    if path_mode not in PATH_MODES:
+        raise HTTPException(status_code=400, detail=f"path_mode must be one of {', '.join(PATH_MODES)}.")
+    if layout not in GRAPH_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout must be one of {', '.join(GRAPH_LAYOUTS)}.")
+    if sort_by not in METRIC_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {', '.join(METRIC_SORT_KEYS)}.")
+    _validate_page_size(limit)
+    if top_nodes is not None and not 1 <= top_nodes <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"top_nodes must be between 1 and {MAX_PAGE_SIZE}.")
+    return await run_db_task(
+        request, _build_graph_data, request, center_node, start_node, end_node,
+        path_max_depth, node_centric_depth, path_mode, max_paths, limit, after_node_id, after_edge_id, layout, with_positions,
+        with_metrics, sort_by, top_nodes, component
+    )
+
+def _build_node_list(request: Request, response: Response, limit: Optional[int], after_id: int):
+    # Blocking part of /api/nodes; runs on the database executor.
+    etag = _current_etag()
+    if _is_not_modified(request, etag):
+        return _not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+    if limit is not None:
+        page = get_nodes_json(after_id, limit)
+        if page is None:
+            raise HTTPException(status_code=500, detail="Failed to fetch node list.")
+        page_json, count, last_id = page
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if count == limit:
+            headers["X-Next-Cursor"] = str(last_id)
+        return Response(content=page_json.encode("utf-8"), media_type="application/json", headers=headers)
+
     nodes_data, _ = get_all_nodes_and_edges()
     if nodes_data is None:
         app_logger.error("Failed to fetch nodes for dropdown.")
@@ -176,6 +510,100 @@ async def get_nodes_for_dropdown():
     sorted_nodes = sorted(nodes_data, key=lambda x: x.get('name', '').lower())
     return sorted_nodes
 
+def _build_graph_binary(request: Request) -> Response:
+    # Blocking part of /api/graph/binary; runs on the database executor.
+    version = get_data_version()
+    etag = _etag_for_version(version)
+    if _is_not_modified(request, etag):
+        return _not_modified_response(etag)
+    body = graph_response_cache.get(("binary",), version)
+    if body is None:
+        body = encode_graph_binary()
+        if body is None:
+            raise HTTPException(status_code=500, detail="Failed to encode graph data.")
+        graph_response_cache.put(("binary",), version, body)
+    return Response(content=body, media_type=BINARY_GRAPH_MEDIA_TYPE, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/api/graph/binary")
+async def get_graph_binary_endpoint(request: Request):
+    """
+    Returns the full graph in the compact typed-array format described in graph_binary.py, for
+    clients that render large graphs. Same ETag/304 and response caching behavior as /api/graph.
+    """
+    return await run_db_task(request, _build_graph_binary, request)
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters and current size of the /api/graph response cache."""
+    return graph_response_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """SQL, connection, traversal, fetch and parse instrumentation in the Prometheus text format."""
+    if not instrumentation.ENABLED:
+        raise HTTPException(status_code=404, detail="Instrumentation is disabled (LINKBASE_INSTRUMENTATION=0).")
+    return PlainTextResponse(instrumentation.render_metrics(), media_type=instrumentation.PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/api/nodes", response_model=List[NodeInfo])
+async def get_nodes_for_dropdown(request: Request, response: Response, limit: Optional[int] = None, after_id: int = 0):
+    """
+    Returns a list of all nodes (the UI's node pickers search with /api/nodes/search instead).
+    If limit is given, returns one page of nodes with id > after_id in id order instead; the
+    X-Next-Cursor header then holds the after_id of the next page and is absent on the last page.
+    Responses carry an ETag tied to the database version; a matching If-None-Match yields 304.
+    """
+    _validate_page_size(limit)
+    return await run_db_task(request, _build_node_list, request, response, limit, after_id)
+
+MAX_SEARCH_RESULTS = 100
+
+def _search_node_list(query: str, limit: int):
+    # Blocking part of /api/nodes/search; runs on the database executor.
+    nodes = search_nodes(query, limit)
+    if nodes is None:
+        raise HTTPException(status_code=500, detail="Failed to search nodes.")
+    return nodes
+
+@app.get("/api/nodes/search", response_model=List[NodeInfo])
+async def search_nodes_endpoint(request: Request, q: str, limit: int = 20):
+    """
+    Typeahead search: up to limit nodes whose name or label contains q (case-insensitive), best
+    matches first. Backed by the nodes_fts trigram index, so it stays fast on large graphs.
+    """
+    if limit < 1 or limit > MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SEARCH_RESULTS}.")
+    return await run_db_task(request, _search_node_list, q, limit)
+
+# Streaming exporters plus the media type and file extension of each export format
+EXPORT_FORMATS = {
+    "dot": (iter_dot_graph, "text/vnd.graphviz; charset=utf-8", "dot"),
+    "mermaid": (iter_mermaid_graph, "text/plain; charset=utf-8", "mmd"),
+}
+
+@app.get("/api/export")
+async def export_graph_endpoint(format: str = "dot"):
+    """
+    Downloads the full graph as DOT or Mermaid text. The body is streamed in chunks straight from a
+    database cursor, so large graphs are never materialized in the worker's memory.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}.")
+    exporter, media_type, extension = EXPORT_FORMATS[format]
+
+    def stream_export():
+        try:
+            yield from exporter()
+        except Exception as e: # The response has already started, so the download can only be cut short
+            app_logger.error(f"Streaming {format} export failed: {e}")
+            raise
+
+    app_logger.info(f"Streaming full graph export as {format}.")
+    return StreamingResponse(
+        stream_export(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="linkbase_graph.{extension}"'}
+    )
+
 
 # --- HTML Serving ---
 # Create a 'templates' directory in the same directory as web_server.py
@@ -1,44 +1,282 @@
+import codecs
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import zip_longest
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    from lxml import etree
+except ImportError: # lxml is optional; text is then extracted with the standard library parser
+    etree = None
+
+from linkbase import fetch_cache, instrumentation
 from linkbase.logger_config import app_logger
 
+FETCH_TIMEOUT_SECONDS = 10
+# Bodies are downloaded in chunks and cut off after this many bytes (the text of the part read is kept).
+FETCH_MAX_BYTES = int(float(os.environ.get("LINKBASE_FETCH_MAX_MB", "5")) * 1024 * 1024)
+# Name of the HTML text extractor in HTML_TEXT_EXTRACTORS; "auto" prefers lxml when it is installed.
+HTML_PARSER = os.environ.get("LINKBASE_HTML_PARSER", "auto")
+_STREAM_CHUNK_SIZE = 64 * 1024
+_SKIPPED_TAGS = frozenset(("script", "style"))
+_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+# Concurrency of fetch_urls, overall and per host (so one site is never hit by every worker at once).
+FETCH_MAX_WORKERS = int(os.environ.get("LINKBASE_FETCH_WORKERS", "8"))
+FETCH_PER_HOST_LIMIT = int(os.environ.get("LINKBASE_FETCH_PER_HOST", "4"))
+# Connection errors and throttling/5xx responses are retried with exponential backoff
+# (0.5s, 1s, 2s), honouring Retry-After.
+FETCH_RETRY = Retry(
+    total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET"]), respect_retry_after_header=True, raise_on_status=False
+)
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    """Returns the shared session, whose keep-alive connection pools are reused across fetches and threads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_MAX_WORKERS, pool_maxsize=FETCH_MAX_WORKERS, max_retries=FETCH_RETRY)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc.lower()
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = _host_semaphores[host] = threading.BoundedSemaphore(FETCH_PER_HOST_LIMIT)
+        return semaphore
+
+class _TextCollector:
+    """Parser target that keeps the character data outside <script> and <style> elements."""
+    def __init__(self):
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def start(self, tag, attrib):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        if tag in _SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def close(self) -> str:
+        return "".join(self.parts)
+
+class _StdlibTextExtractor(HTMLParser):
+    """Incremental extractor on html.parser's tokenizer; no document tree is built."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._collector = _TextCollector()
+
+    def handle_starttag(self, tag, attrs):
+        self._collector.start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self._collector.end(tag)
+
+    def handle_data(self, data):
+        self._collector.data(data)
+
+    def close(self) -> str:
+        super().close()
+        return self._collector.close()
+
+def _lxml_text_extractor():
+    # lxml's feed parser calls the target's methods as it tokenizes, so it builds no tree either
+    return etree.HTMLParser(target=_TextCollector(), remove_comments=True, remove_pis=True)
+
+# Extractor factories by name. Each returned object takes decoded HTML through feed(str) and
+# returns the raw document text from close().
+HTML_TEXT_EXTRACTORS: Dict[str, Callable[[], object]] = {"html.parser": _StdlibTextExtractor}
+if etree is not None:
+    HTML_TEXT_EXTRACTORS["lxml"] = _lxml_text_extractor
+
+def _resolve_parser(parser: Optional[str]) -> str:
+    name = parser or HTML_PARSER
+    if name == "auto":
+        name = "lxml" if "lxml" in HTML_TEXT_EXTRACTORS else "html.parser"
+    if name not in HTML_TEXT_EXTRACTORS:
+        app_logger.warning(f"Unknown HTML parser '{name}', falling back to html.parser.")
+        name = "html.parser"
+    return name
+
+def _new_text_extractor(parser: Optional[str]):
+    return HTML_TEXT_EXTRACTORS[_resolve_parser(parser)]()
+
+def _normalize_text(text: str) -> str:
+    # One line per line or multi-space-separated phrase, stripped, without blank lines
+    return "\n".join(phrase for line in text.splitlines() for phrase in map(str.strip, line.split("  ")) if phrase)
+
+def sniff_encoding(head: bytes, content_type: Optional[str] = None) -> str:
+    """Guesses a document's encoding from its Content-Type charset, BOM or <meta charset>, defaulting to UTF-8."""
+    candidates = []
+    if content_type:
+        match = re.search(r"charset=[\"']?([A-Za-z0-9_.:-]+)", content_type, re.IGNORECASE)
+        if match:
+            candidates.append(match.group(1))
+    if head.startswith(codecs.BOM_UTF8):
+        candidates.append("utf-8-sig")
+    match = _CHARSET_RE.search(head[:4096])
+    if match:
+        candidates.append(match.group(1).decode("ascii"))
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+def extract_text(chunks: Iterable[bytes], encoding: str = "utf-8", parser: Optional[str] = None) -> str:
+    """
+    Extracts the visible text of an HTML document given as byte chunks, decoding and parsing each
+    chunk as it comes, with the extractor named by parser (default HTML_PARSER).
+    """
+    started = time.perf_counter()
+    parser = _resolve_parser(parser)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    extractor = HTML_TEXT_EXTRACTORS[parser]()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            extractor.feed(text)
+    extractor.feed(decoder.decode(b"", final=True))
+    text = _normalize_text(extractor.close())
+    instrumentation.record_parse(parser, time.perf_counter() - started)
+    return text
+
+def _read_body(response: requests.Response, max_bytes: int) -> Tuple[List[bytes], bool]:
+    """Reads a streamed response in chunks, stopping after max_bytes; also returns whether it was cut off."""
+    chunks: List[bytes] = []
+    size = 0
+    for chunk in response.iter_content(_STREAM_CHUNK_SIZE):
+        if size + len(chunk) > max_bytes:
+            chunks.append(chunk[:max_bytes - size])
+            return chunks, True
+        chunks.append(chunk)
+        size += len(chunk)
+    return chunks, False
+
 def get_text_from_url(url: str) -> str:
     """
-    Fetches the plain text content of a webpage using requests and BeautifulSoup.
-    
+    Fetches the plain text content of a webpage. The body is streamed and cut off after FETCH_MAX_BYTES,
+    and its text is extracted incrementally with the HTML_PARSER extractor.
+    Pages are kept in the on-disk fetch cache and revalidated with a conditional GET, so unchanged
+    pages are neither downloaded nor parsed again.
+
     Args:
         url: The URL of the webpage to fetch.
-        
+
     Returns:
         The plain text content of the webpage, or an error message if fetching fails.
     """
+    started = time.perf_counter()
     try:
         app_logger.info(f"Attempting to fetch text content from URL: {url}")
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        app_logger.debug(f"Successfully fetched URL: {url}, status code: {response.status_code}")
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove script and style elements
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.decompose()
-            
-        # Get text
-        text = soup.get_text()
-        
-        # Break into lines and remove leading/trailing space on each
-        lines = (line.strip() for line in text.splitlines())
-        # Break multi-headlines into a line each
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        # Drop blank lines
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
+        cached = fetch_cache.get_entry(url)
+        if cached is not None and fetch_cache.is_fresh(cached):
+            app_logger.info(f"Serving recently fetched URL from the fetch cache: {url}")
+            instrumentation.record_fetch("cached", time.perf_counter() - started)
+            return cached["text"]
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        with _host_semaphore(url):
+            with _get_session().get(url, timeout=FETCH_TIMEOUT_SECONDS, headers=headers, stream=True) as response:
+                etag = response.headers.get("ETag"); last_modified = response.headers.get("Last-Modified")
+                if response.status_code == 304 and cached is not None:
+                    fetch_cache.mark_revalidated(url, etag, last_modified)
+                    app_logger.info(f"URL not modified, using cached text: {url}")
+                    instrumentation.record_fetch("not_modified", time.perf_counter() - started)
+                    return cached["text"]
+                response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
+                app_logger.debug("Successfully fetched URL: %s, status code: %s", url, response.status_code)
+                chunks, truncated = _read_body(response, FETCH_MAX_BYTES)
+        body = b"".join(chunks)
+        instrumentation.record_fetch("downloaded", time.perf_counter() - started, len(body))
+        if truncated:
+            app_logger.warning(f"Response from {url} exceeds {FETCH_MAX_BYTES} bytes; only the first {FETCH_MAX_BYTES} bytes are used.")
+
+        body_hash = fetch_cache.content_hash(body)
+        if cached is not None and cached["content_hash"] == body_hash: # Server sent no validators, but the page is unchanged
+            fetch_cache.mark_revalidated(url, etag, last_modified)
+            app_logger.info(f"URL content unchanged, using cached text: {url}")
+            return cached["text"]
+
+        text = extract_text(chunks, sniff_encoding(body[:4096], response.headers.get("Content-Type")))
+        fetch_cache.store(url, body, text, etag, last_modified, body_hash)
+
         app_logger.info(f"Successfully extracted text content from URL: {url}")
         return text
     except requests.exceptions.RequestException as e:
+        instrumentation.record_fetch("error", time.perf_counter() - started)
         app_logger.error(f"Error fetching URL {url}: {e}")
         return f"Error fetching URL {url}: {e}"
     except Exception as e:
         app_logger.error(f"An unexpected error occurred while processing {url}: {e}")
         return f"An unexpected error occurred while processing {url}: {e}"
+
+def _interleave_by_host(urls: Iterable[str]) -> List[str]:
+    # Round-robin over hosts, so workers waiting on one busy host's semaphore don't starve the others.
+    by_host: "OrderedDict[str, List[str]]" = OrderedDict()
+    for url in urls:
+        by_host.setdefault(urlsplit(url).netloc.lower(), []).append(url)
+    return [url for batch in zip_longest(*by_host.values()) for url in batch if url is not None]
+
+def fetch_urls(urls: Iterable[str], max_workers: int = FETCH_MAX_WORKERS) -> Iterator[Tuple[str, str]]:
+    """
+    Fetches many webpages concurrently through the pooled session and yields (url, text) pairs in
+    completion order, where text is what get_text_from_url returns (including its error messages).
+    At most max_workers pages are fetched at once, and at most FETCH_PER_HOST_LIMIT per host.
+    Duplicate URLs are fetched once.
+    """
+    ordered = _interleave_by_host(dict.fromkeys(urls))
+    if not ordered:
+        return
+    app_logger.info(f"Fetching {len(ordered)} URLs with {max_workers} workers.")
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="linkbase-fetch") as executor:
+        futures = {executor.submit(get_text_from_url, url): url for url in ordered}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures: # Stop queued fetches if the consumer stops iterating early
+                future.cancel()
+
+def get_text_from_urls(urls: List[str]) -> Dict[str, str]:
+    """
+    Fetches the plain text content of several webpages concurrently.
+
+    Args:
+        urls: The URLs of the webpages to fetch.
+
+    Returns:
+        A mapping of each URL to its plain text content, or to an error message if fetching it failed.
+    """
+    results = dict(fetch_urls(urls))
+    return {url: results[url] for url in dict.fromkeys(urls)}